@@ -0,0 +1,315 @@
+"""
+End-to-end benchmark against local stand-ins for websites, Sheets and OpenAI.
+
+Serves a synthetic corpus of org websites, a fake Sheets values API and a fake
+OpenAI chat-completions and Batch API from local servers (see
+benchmarks.stand_ins), then drives process_url, process_with_gpt,
+update_sheet_values, the streaming pipeline and the website_to_llm and
+website_to_llm_batch flows against them. Prints throughput, latency
+percentiles and peak memory per scenario as JSON. Each scenario runs in a
+fresh process with its own stand-ins, so its peak RSS isn't inflated by the
+scenarios before it.
+
+    python -m benchmarks.bench_end_to_end [--sites N] [--scenarios scrape,gpt,...] [--output FILE]
+
+Nothing leaves the machine: the OpenAI client is pointed at the stand-in through
+OPENAI_BASE_URL and the Sheets service through its api_endpoint. All fake sites
+share one local host, so robots.txt pacing is turned off and the per-host limit
+is raised to the scraper concurrency.
+"""
+import argparse
+import json
+import os
+import resource
+import tempfile
+import multiprocessing
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from benchmarks.stand_ins import CorpusServer, FakeSheetsServer, FakeOpenAIServer
+from utils import metrics
+
+SCENARIOS = ("scrape", "gpt", "sheets_write", "sheets_read", "pipeline", "website_to_llm", "batch")
+SPREADSHEET_ID = "bench-spreadsheet"
+BENCH_CREDENTIALS = "bench-credentials"
+API_KEY = "bench-key"
+
+
+def percentiles(samples):
+    """p50/p90/p99/max of latency samples, in milliseconds"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 2)
+
+    return {"p50_ms": pick(0.50), "p90_ms": pick(0.90), "p99_ms": pick(0.99), "max_ms": round(ordered[-1] * 1000, 2)}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux, and a high-water mark for the whole process
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run_timed_calls(fn, items, concurrency):
+    """
+    Call fn(item) for every item on `concurrency` threads.
+    Returns:
+        tuple: (results, latencies, wall_seconds); failed calls return their exception
+    """
+    def call(item):
+        started = time.perf_counter()
+        try:
+            result = fn(item)
+        except Exception as e:
+            result = e
+        return result, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(call, items))
+    wall = time.perf_counter() - started
+    return [result for result, _ in outcomes], [latency for _, latency in outcomes], wall
+
+
+def summarize(count, latencies, wall, **extra):
+    summary = {
+        "calls": count,
+        "seconds": round(wall, 3),
+        "per_second": round(count / wall, 2) if wall else None,
+        "latency": percentiles(latencies),
+    }
+    summary.update(extra)
+    return summary
+
+
+def scrape_outcome(result):
+    if isinstance(result, Exception):
+        return "exception"
+    value = str(result[0]) if result else ""
+    if value == "No content found":
+        return "no_content"
+    if value == "Invalid URL format":
+        return "invalid"
+    if value.startswith("Error:"):
+        return "error"
+    return "content"
+
+
+def bench_scrape(env, args):
+    from utils.helpers import process_url
+    urls = env["corpus"].site_urls()
+    results, latencies, wall = run_timed_calls(process_url, urls, args.concurrency)
+    outcomes = {}
+    for result in results:
+        outcome = scrape_outcome(result)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return summarize(len(urls), latencies, wall, outcomes=outcomes)
+
+
+def sample_contents(count):
+    return [
+        f"Person Name: Person {i}\n\nWebsite Content: We support families in our community through "
+        f"education and health programs. " * 3
+        for i in range(count)
+    ]
+
+
+def bench_gpt(env, args):
+    from llm_utils.gpt_connector import process_with_gpt
+    contents = sample_contents(args.llm_calls)
+    results, latencies, wall = run_timed_calls(lambda content: process_with_gpt(content, API_KEY), contents,
+                                               args.llm_concurrency)
+    errors = sum(isinstance(result, Exception) for result in results)
+    return summarize(len(contents), latencies, wall, errors=errors, server_throttled=env["openai"].throttled)
+
+
+def bench_sheets_write(env, args):
+    from data.google_sheet_parser import update_sheet_values
+    service = env["service"]
+    rows = list(range(2, args.sheet_writes + 2))
+
+    def write(row):
+        return update_sheet_values(service, SPREADSHEET_ID, f"Sheet1!N{row}:N{row}", [[f"value {row}"]])
+
+    results, latencies, wall = run_timed_calls(write, rows, args.concurrency)
+    errors = sum(isinstance(result, Exception) for result in results)
+    return summarize(len(rows), latencies, wall, errors=errors, server_throttled=env["sheets"].throttled)
+
+
+def seed_sheet(sheets, names, column, values):
+    sheets.write("Sheet1!A1", [["Name"]] + [[name] for name in names])
+    sheets.write(f"Sheet1!{column}1", [["Header"]] + [[value] for value in values])
+
+
+def bench_sheets_read(env, args):
+    from data.google_sheet_parser import get_sheet_columns
+    urls = env["corpus"].site_urls()
+    seed_sheet(env["sheets"], [f"Person {i}" for i in range(len(urls))], "F", urls)
+    reads = list(range(args.sheet_reads))
+    results, latencies, wall = run_timed_calls(
+        lambda _: get_sheet_columns(SPREADSHEET_ID, ["Sheet1!A1:A", "Sheet1!F1:F"], BENCH_CREDENTIALS),
+        reads, args.concurrency
+    )
+    rows = len(results[0]) if results and not isinstance(results[0], Exception) else 0
+    return summarize(len(reads), latencies, wall, rows_per_read=rows)
+
+
+def bench_pipeline(env, args):
+    from data.sheet_writer import SheetWriter
+    from utils.pipeline import run_pipeline
+    urls = env["corpus"].site_urls()
+    rows = [(i + 2, f"Person {i}", url) for i, url in enumerate(urls)]
+    started = time.perf_counter()
+    with SheetWriter(env["service"], SPREADSHEET_ID) as writer:
+        counts = run_pipeline(rows, API_KEY, writer, scrape_workers=args.concurrency, per_host=args.concurrency,
+                              llm_workers=args.llm_concurrency)
+    wall = time.perf_counter() - started
+    return {
+        "rows": len(rows),
+        "seconds": round(wall, 3),
+        "rows_per_second": round(len(rows) / wall, 2),
+        "counts": counts,
+        "write_failures": len(writer.failures),
+    }
+
+
+def bench_website_to_llm(env, args):
+    import main
+    from utils.config import load_config
+    contents = sample_contents(len(env["corpus"].sites))
+    seed_sheet(env["sheets"], [f"Person {i}" for i in range(len(contents))], "K", contents)
+    config = load_config(None)
+    config.update(credentials_file=BENCH_CREDENTIALS, spreadsheet_id=SPREADSHEET_ID)
+    config["llm"]["workers"] = args.llm_concurrency
+    started = time.perf_counter()
+    main.website_to_llm(config, use_llm_cache=False)
+    wall = time.perf_counter() - started
+    written = sum(1 for value in env["sheets"].column("N", first_row=2) if value)
+    return {"rows": len(contents), "seconds": round(wall, 3), "rows_per_second": round(len(contents) / wall, 2),
+            "rows_written": written}
+
+
+def bench_batch(env, args):
+    import main
+    from openai import OpenAI
+    from llm_utils.batch_runner import OpenAIBatchTransport
+    from utils.config import load_config
+    contents = sample_contents(len(env["corpus"].sites))
+    seed_sheet(env["sheets"], [f"Person {i}" for i in range(len(contents))], "K", contents)
+    config = load_config(None)
+    config.update(credentials_file=BENCH_CREDENTIALS, spreadsheet_id=SPREADSHEET_ID)
+    # A client of its own, so the transport is what gets exercised rather than the shared client
+    transport = OpenAIBatchTransport(OpenAI(api_key=API_KEY, base_url=env["openai"].base_url, max_retries=0))
+    with tempfile.TemporaryDirectory() as directory:
+        config["batch"]["request_path"] = os.path.join(directory, "batch_requests.jsonl")
+        if args.batch_max_requests:
+            config["batch"]["max_requests"] = args.batch_max_requests
+        started = time.perf_counter()
+        main.website_to_llm_batch(config, transport=transport, use_llm_cache=False)
+        wall = time.perf_counter() - started
+    written = sum(1 for value in env["sheets"].column("N", first_row=2) if value and not value.startswith("Error"))
+    return {"rows": len(contents), "seconds": round(wall, 3), "rows_per_second": round(len(contents) / wall, 2),
+            "rows_written": written, "batches": len(env["openai"].batches)}
+
+
+BENCHMARKS = {
+    "scrape": bench_scrape,
+    "gpt": bench_gpt,
+    "sheets_write": bench_sheets_write,
+    "sheets_read": bench_sheets_read,
+    "pipeline": bench_pipeline,
+    "website_to_llm": bench_website_to_llm,
+    "batch": bench_batch,
+}
+
+
+def configure_scraper(parse_workers=0):
+    """Keep runs independent and avoid pacing the single local host"""
+    from scraper.http_client import configure_response_cache
+    from scraper.politeness import configure_politeness
+    from scraper.dns_cache import configure_host_health
+    from scraper.parse_pool import configure_parse_pool
+    configure_response_cache(enabled=False)
+    configure_politeness(enabled=False)
+    configure_host_health(path=None)
+    configure_parse_pool(parse_workers)
+
+
+def run_scenario(name, args):
+    """
+    Run one scenario against fresh stand-ins.
+    Returns:
+        tuple: (site kinds in the corpus, scenario result, metrics summary)
+    """
+    with CorpusServer(sites=args.sites, seed=args.seed) as corpus, \
+            FakeSheetsServer(args.sheets_latency, args.sheets_rpm) as sheets, \
+            FakeOpenAIServer(args.llm_latency, args.llm_rpm) as openai_server:
+        os.environ["OPENAI_BASE_URL"] = openai_server.base_url
+        os.environ["OPENAI_API_KEY"] = API_KEY
+        configure_scraper(args.parse_workers)
+        from data.google_sheet_parser import register_sheets_service
+        service = sheets.service()
+        register_sheets_service(BENCH_CREDENTIALS, service)
+        env = {"corpus": corpus, "sheets": sheets, "openai": openai_server, "service": service}
+
+        site_kinds = {}
+        for site in corpus.sites.values():
+            site_kinds[site["kind"]] = site_kinds.get(site["kind"], 0) + 1
+        if args.tracemalloc:
+            tracemalloc.start()
+        result = BENCHMARKS[name](env, args)
+        if args.tracemalloc:
+            result["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+            tracemalloc.stop()
+        result["peak_rss_mb"] = peak_rss_mb()
+    return site_kinds, result, metrics.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sites", type=int, default=200, help="Org websites in the synthetic corpus")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=20, help="Scraper and Sheets threads")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Parse pool processes, 0 parses in the scraper threads")
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--llm-calls", type=int, default=100)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per fake chat completion")
+    parser.add_argument("--llm-rpm", type=int, default=None, help="Fake OpenAI requests per minute quota")
+    parser.add_argument("--sheets-latency", type=float, default=0.05, help="Seconds per fake Sheets request")
+    parser.add_argument("--sheets-rpm", type=int, default=None, help="Fake Sheets requests per minute quota")
+    parser.add_argument("--sheet-writes", type=int, default=100)
+    parser.add_argument("--sheet-reads", type=int, default=10)
+    parser.add_argument("--batch-max-requests", type=int, default=None,
+                        help="Requests per batch file, to split the batch scenario into several batches")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Also report the peak traced Python allocation per scenario (slows the run)")
+    parser.add_argument("--output", help="Write the JSON results to this file as well")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = {"sites": args.sites, "parse_workers": args.parse_workers, "scenarios": {}, "metrics": {}}
+    for name in scenarios:
+        # A spawned process per scenario, since ru_maxrss never goes down within a process
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            site_kinds, result, summary = pool.submit(run_scenario, name, args).result()
+        results["site_kinds"] = site_kinds
+        results["scenarios"][name] = result
+        # Per-stage breakdown from the built-in instrumentation
+        results["metrics"][name] = summary
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Micro-benchmark of the scraper's HTML parser backends.
+
+Compares link and paragraph extraction of every available backend against the
+original full-tree BeautifulSoup/html.parser code on a fixture corpus, and
+reports whether the outputs match and how long each backend takes.
+
+    python -m benchmarks.bench_html_parser [--corpus DIR] [--repeat N]
+
+Without --corpus the corpus is a deterministic set of synthetic marketing-style
+pages, the hand-written MALFORMED_PAGES and the saved pages in
+benchmarks/fixtures. Parity is reported per set, with the documents that
+differ listed by name. html.parser doesn't close an open <p> or <a> when the
+next one starts, so selectolax and lxml are expected to differ from the
+baseline on unclosed and nested paragraphs and links. selectolax follows the
+HTML5 tree-building rules and lxml (libxml2) doesn't, so the two can also
+disagree on unclosed <a> tags and on block markup inside an open <p>.
+
+legacy_tables.html shows all of these on a real page, and it is expected to
+differ for both fast backends. The unclosed "Events" link takes in the next
+link's text only in the baseline. A doctype-less page is parsed in quirks
+mode, where a <table> doesn't close an open <p>, so selectolax keeps the
+workshop table in the paragraph before it and lxml doesn't. The text inside
+<noscript> is dropped by every backend.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import time
+from bs4 import BeautifulSoup
+from scraper.html_parser import available_backends, parse_page
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+WORDS = ("community", "mission", "impact", "volunteer", "donate", "program", "support",
+         "families", "education", "health", "our", "the", "we", "and", "for", "with")
+
+
+def synthetic_page(seed, sections=40, links=150):
+    """Build a large homepage-like document with nav links, nested markup and paragraphs"""
+    rng = random.Random(seed)
+
+    def sentence(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+    nav = "".join(
+        f'<li><a href="/{rng.choice(WORDS)}-{i}">{sentence(2)}</a></li>' for i in range(links)
+    )
+    nav += '<li><a href="/about-us">About <span>Us</span></a></li>'
+    body = "".join(
+        f'<section class="s{i}"><h2>{sentence(4)}</h2>'
+        f'<p>{sentence(25)} <a href="/p/{i}">{sentence(2)}</a> <strong>{sentence(3)}</strong></p>'
+        f'<div><p>{sentence(15)}</p><p>   </p></div>'
+        f'<script>var x{i} = "{sentence(10)}";</script></section>'
+        for i in range(sections)
+    )
+    return f"<!DOCTYPE html><html><head><title>Org {seed}</title></head><body><nav><ul>{nav}</ul></nav>{body}</body></html>"
+
+
+# Markup the scraper meets on real sites that trips up naive parsers
+MALFORMED_PAGES = {
+    "unclosed_p": "<body><p>First paragraph<p>Second paragraph<p>Third <b>bold</b></body>",
+    "nested_p": "<p>Outer start <p>inner paragraph</p> outer end</p>",
+    "p_in_div_unclosed": "<div><p>Open paragraph<div>block inside</div>after the block</div>",
+    "unclosed_a": '<p>See <a href="/about">about us and more<p>Next paragraph</p>',
+    "a_wraps_p": '<a href="/about"><p>About our mission</p></a>',
+    "script_in_p": "<p>Before<script>var s = '<p>not text</p>';</script>after</p>",
+    "style_and_noscript": "<p>Kept<style>p { color: red }</style> text</p><p>Also<noscript> hidden</noscript> kept</p>",
+    "script_in_link": '<a href="/x">Link<script>track()</script> text</a>',
+    "entities_and_comments": "<p>Caf&eacute; &amp; bakery<!-- <p>commented</p> --> &#8212; since 1990</p>",
+    "stray_end_tags": "</p><p>Text</div></span> continues</p></p></a>",
+    "unquoted_attributes": "<a href=/about-us class=nav>About Us</a><p class=lead>Lead text",
+    "truncated": '<html><body><p>Cut off mid <a href="/donate">Don',
+}
+
+
+def load_corpus(directory):
+    """Return {set name: [(document name, html)]}"""
+    if directory:
+        return {"corpus": _read_html_files(directory)}
+    return {
+        "synthetic": [(f"synthetic_{seed}", synthetic_page(seed)) for seed in range(25)],
+        "malformed": sorted(MALFORMED_PAGES.items()),
+        "fixtures": _read_html_files(FIXTURES_DIR),
+    }
+
+
+def _read_html_files(directory):
+    documents = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            documents.append((os.path.basename(path), f.read()))
+    return documents
+
+
+def baseline(html):
+    """The original scraper code: full html.parser tree, then find_all, with <noscript> dropped like parse_page() does"""
+    soup = BeautifulSoup(html, "html.parser")
+    for element in soup.find_all("noscript"):
+        element.decompose()
+    links = [(a.text, a["href"]) for a in soup.find_all("a", href=True)]
+    paragraphs = [p.text.strip() for p in soup.find_all("p") if p.text.strip()]
+    return links, paragraphs
+
+
+def timed(fn, documents, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for html in documents:
+            fn(html)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="Directory of .html fixture files")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    documents = [html for named in corpus.values() for _, html in named]
+    backends = available_backends()
+    results = {
+        "documents": len(documents),
+        "bytes": sum(len(html.encode("utf-8")) for html in documents),
+        "baseline_seconds": timed(baseline, documents, args.repeat),
+        "backends": {
+            backend: {"seconds": timed(lambda html: parse_page(html, backend=backend), documents, args.repeat)}
+            for backend in backends
+        },
+    }
+    for set_name, named in corpus.items():
+        for backend in backends:
+            links_match = paragraphs_match = 0
+            differs = []
+            for name, html in named:
+                links, paragraphs = baseline(html)
+                parsed = parse_page(html, backend=backend)
+                same_links = parsed.links == links
+                same_paragraphs = " ".join(parsed.paragraphs) == " ".join(paragraphs)
+                links_match += same_links
+                paragraphs_match += same_paragraphs
+                if not (same_links and same_paragraphs):
+                    differs.append(name)
+            results["backends"][backend][set_name] = {
+                "links_match": f"{links_match}/{len(named)}",
+                "paragraphs_match": f"{paragraphs_match}/{len(named)}",
+                "differs_from_baseline": differs,
+            }
+        if len(backends) > 1:
+            # The fast backends replace each other when one isn't installed, so they should agree
+            first = backends[0]
+            results.setdefault("backend_disagreements", {})[set_name] = {
+                backend: [
+                    name for name, html in named
+                    if vars(parse_page(html, backend=backend)) != vars(parse_page(html, backend=first))
+                ]
+                for backend in backends[1:]
+            }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
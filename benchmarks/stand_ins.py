@@ -0,0 +1,501 @@
+"""
+Local stand-ins for the services the pipeline talks to.
+
+- CorpusServer serves a deterministic corpus of org websites with varied page
+  sizes, slow responses, redirects and broken About links. Dead sites point at
+  a closed port.
+- FakeSheetsServer implements the Sheets v4 `values` endpoints used by the repo
+  (get, batchGet, update, batchUpdate) over an in-memory grid.
+- FakeOpenAIServer implements chat completions and the files and batches
+  endpoints used by the Batch API runner.
+
+The Sheets and OpenAI stand-ins take a per-request latency and a requests per
+minute quota; requests over quota get a 429 with Retry-After like the real APIs.
+Every server runs on 127.0.0.1 in a daemon thread.
+"""
+import email.parser
+import json
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+from utils.rate_limit import TokenBucket
+
+WORDS = ("community", "mission", "impact", "volunteer", "donate", "program", "support",
+         "families", "education", "health", "our", "the", "we", "and", "for", "with")
+
+SITE_NORMAL = "normal"
+SITE_LARGE = "large"
+SITE_SLOW = "slow"
+SITE_REDIRECT = "redirect"
+SITE_BROKEN_ABOUT = "broken_about"
+SITE_DEAD = "dead"
+# Share of each site kind in the corpus, roughly what outreach sheets look like
+SITE_MIX = (
+    (SITE_NORMAL, 0.60),
+    (SITE_LARGE, 0.10),
+    (SITE_SLOW, 0.10),
+    (SITE_REDIRECT, 0.08),
+    (SITE_BROKEN_ABOUT, 0.07),
+    (SITE_DEAD, 0.05),
+)
+
+
+def closed_port():
+    """A local port with nothing listening on it, for dead links"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, payload, headers=None):
+        self.send_body(status, json.dumps(payload), "application/json", headers)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+
+class _LocalServer:
+    """A ThreadingHTTPServer on 127.0.0.1 that serves `handler` from a daemon thread"""
+
+    handler = _Handler
+
+    def __init__(self):
+        self.requests = 0
+        self.throttled = 0
+        self._counter_lock = threading.Lock()
+        handler = type("Handler", (self.handler,), {"stand_in": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def count(self, throttled=False):
+        with self._counter_lock:
+            self.requests += 1
+            self.throttled += throttled
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class _QuotaMixin:
+    """Latency and requests-per-minute quota shared by the API stand-ins"""
+
+    def setup_quota(self, latency, requests_per_minute):
+        self.latency = latency
+        self.quota = TokenBucket(requests_per_minute) if requests_per_minute else None
+
+    def admit(self):
+        """Sleep for the configured latency and return False when the request is over quota"""
+        if self.latency:
+            time.sleep(self.latency * random.uniform(0.8, 1.2))
+        allowed = self.quota is None or self.quota.try_acquire()
+        self.count(throttled=not allowed)
+        return allowed
+
+
+# ---------------------------------------------------------------------------
+# Org websites
+
+
+class _CorpusHandler(_Handler):
+    def do_GET(self):
+        self.stand_in.count()
+        path = urlsplit(self.path).path
+        match = re.match(r"^/site/(\d+)(/.*)?$", path)
+        site = self.stand_in.sites.get(int(match.group(1))) if match else None
+        if site is None:
+            self.send_body(404, "Not found")
+            return
+        page = match.group(2) or "/"
+        if site["kind"] == SITE_SLOW:
+            time.sleep(site["delay"])
+        if site["kind"] == SITE_REDIRECT and page == "/":
+            self.send_body(301, "", headers={"Location": f"/site/{site['id']}/home/"})
+        elif page in ("/", "/home/"):
+            self.send_body(200, site["homepage"])
+        elif page == "/about-us" and site["kind"] != SITE_BROKEN_ABOUT:
+            self.send_body(200, site["about"])
+        else:
+            self.send_body(404, "Not found")
+
+
+class CorpusServer(_LocalServer):
+    """
+    Serves `sites` synthetic org websites under /site/<n>/.
+    Each site has a homepage linking to /about-us; the mix of site kinds follows SITE_MIX.
+    """
+
+    handler = _CorpusHandler
+
+    def __init__(self, sites=200, seed=0, slow_delay=(0.2, 1.5)):
+        super().__init__()
+        rng = random.Random(seed)
+        kinds = [kind for kind, _ in SITE_MIX]
+        weights = [weight for _, weight in SITE_MIX]
+        self.sites = {}
+        for site_id in range(sites):
+            kind = rng.choices(kinds, weights)[0]
+            sections = rng.randint(80, 400) if kind == SITE_LARGE else rng.randint(3, 30)
+            self.sites[site_id] = {
+                "id": site_id,
+                "kind": kind,
+                "delay": rng.uniform(*slow_delay),
+                "homepage": self._homepage(rng, site_id, sections),
+                "about": self._about(rng, site_id, max(sections // 3, 2)),
+            }
+        self._dead_port = closed_port()
+
+    @staticmethod
+    def _sentence(rng, words):
+        return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    def _homepage(self, rng, site_id, sections):
+        nav = "".join(
+            f'<li><a href="/site/{site_id}/{rng.choice(WORDS)}-{i}">{self._sentence(rng, 2)}</a></li>'
+            for i in range(rng.randint(10, 60))
+        )
+        nav += f'<li><a href="/site/{site_id}/about-us">About Us</a></li>'
+        body = "".join(
+            f"<section><h2>{self._sentence(rng, 4)}</h2><p>{self._sentence(rng, 30)}</p>"
+            f"<div><p>{self._sentence(rng, 15)}</p></div><script>var x = 1;</script></section>"
+            for _ in range(sections)
+        )
+        return f"<!DOCTYPE html><html><head><title>Org {site_id}</title></head><body><nav><ul>{nav}</ul></nav>{body}</body></html>"
+
+    def _about(self, rng, site_id, sections):
+        body = "".join(f"<p>{self._sentence(rng, 40)}</p>" for _ in range(sections))
+        return f"<!DOCTYPE html><html><head><title>About Org {site_id}</title></head><body><main>{body}</main></body></html>"
+
+    def site_url(self, site_id):
+        if self.sites[site_id]["kind"] == SITE_DEAD:
+            return f"http://127.0.0.1:{self._dead_port}/site/{site_id}/"
+        return f"{self.url}/site/{site_id}/"
+
+    def site_urls(self):
+        return [self.site_url(site_id) for site_id in sorted(self.sites)]
+
+
+# ---------------------------------------------------------------------------
+# Google Sheets values API
+
+A1_RE = re.compile(r"^(?:(?P<sheet>[^!]+)!)?(?P<c1>[A-Z]+)(?P<r1>\d+)?(?::(?P<c2>[A-Z]+)(?P<r2>\d+)?)?$")
+
+
+def column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+def parse_a1(range_name):
+    """Parse "Sheet1!A2:C10" style ranges into (sheet, first_row, first_col, last_row, last_col); missing rows are None"""
+    match = A1_RE.match(unquote(range_name).replace("'", ""))
+    if match is None:
+        raise ValueError(f"Unsupported range {range_name}")
+    first_col = column_index(match.group("c1"))
+    last_col = column_index(match.group("c2") or match.group("c1"))
+    first_row = int(match.group("r1")) if match.group("r1") else 1
+    last_row = match.group("r2") or (match.group("r1") if not match.group("c2") else None)
+    return match.group("sheet") or "Sheet1", first_row, first_col, int(last_row) if last_row else None, last_col
+
+
+class _SheetsHandler(_Handler):
+    def _throttle(self):
+        self.send_json(429, {"error": {
+            "code": 429, "status": "RESOURCE_EXHAUSTED",
+            "message": "Quota exceeded for quota metric 'Write requests' and limit 'Write requests per minute per user'"
+        }}, headers={"Retry-After": "1"})
+
+    def _route(self):
+        parts = urlsplit(self.path)
+        match = re.match(r"^/v4/spreadsheets/([^/]+)/values(?:/([^:?]+)|:(batchGet|batchUpdate))$", parts.path)
+        if match is None:
+            self.send_json(404, {"error": {"code": 404, "message": "Not found"}})
+            return None
+        return match.group(2), match.group(3), parse_qs(parts.query)
+
+    def do_GET(self):
+        route = self._route()
+        if route is None:
+            return
+        if not self.stand_in.admit():
+            self._throttle()
+            return
+        range_name, action, query = route
+        dimension = query.get("majorDimension", ["ROWS"])[0]
+        if action == "batchGet":
+            ranges = query.get("ranges", [])
+            self.send_json(200, {"valueRanges": [
+                {"range": name, "majorDimension": dimension, "values": self.stand_in.read(name, dimension)}
+                for name in ranges
+            ]})
+        else:
+            self.send_json(200, {"range": range_name, "majorDimension": dimension,
+                                 "values": self.stand_in.read(range_name, dimension)})
+
+    def do_PUT(self):
+        route = self._route()
+        if route is None:
+            return
+        body = self.read_json()
+        if not self.stand_in.admit():
+            self._throttle()
+            return
+        range_name = route[0]
+        cells = self.stand_in.write(range_name, body.get("values", []))
+        self.send_json(200, {"updatedRange": unquote(range_name), "updatedCells": cells})
+
+    def do_POST(self):
+        route = self._route()
+        if route is None or route[1] != "batchUpdate":
+            self.send_json(404, {"error": {"code": 404, "message": "Not found"}})
+            return
+        body = self.read_json()
+        if not self.stand_in.admit():
+            self._throttle()
+            return
+        responses = []
+        for value_range in body.get("data", []):
+            cells = self.stand_in.write(value_range["range"], value_range.get("values", []))
+            responses.append({"updatedRange": value_range["range"], "updatedCells": cells})
+        self.send_json(200, {"totalUpdatedCells": sum(r["updatedCells"] for r in responses), "responses": responses})
+
+
+class FakeSheetsServer(_QuotaMixin, _LocalServer):
+    """In-memory Sheets v4 values API with a shared read/write quota"""
+
+    handler = _SheetsHandler
+
+    def __init__(self, latency=0.05, requests_per_minute=None):
+        super().__init__()
+        self.setup_quota(latency, requests_per_minute)
+        self.cells = {}
+        self._lock = threading.Lock()
+
+    def write(self, range_name, values):
+        sheet, first_row, first_col, _, _ = parse_a1(range_name)
+        written = 0
+        with self._lock:
+            for r, row in enumerate(values):
+                for c, value in enumerate(row):
+                    self.cells[(sheet, first_row + r, first_col + c)] = "" if value is None else str(value)
+                    written += 1
+        return written
+
+    def read(self, range_name, dimension="ROWS"):
+        sheet, first_row, first_col, last_row, last_col = parse_a1(range_name)
+        with self._lock:
+            if last_row is None:
+                last_row = max((row for s, row, _ in self.cells if s == sheet), default=0)
+            grid = [
+                [self.cells.get((sheet, row, col), "") for col in range(first_col, last_col + 1)]
+                for row in range(first_row, last_row + 1)
+            ]
+        if dimension == "COLUMNS":
+            grid = [list(column) for column in zip(*grid)] if grid else []
+        # Like the real API, trailing empty cells and rows are left out
+        grid = [row[:max((i + 1 for i, value in enumerate(row) if value != ""), default=0)] for row in grid]
+        while grid and not grid[-1]:
+            grid.pop()
+        return grid
+
+    def column(self, letter, first_row=1, sheet="Sheet1"):
+        """Values of one column from first_row down to the last non-empty row, for assertions and reports"""
+        return [row[0] if row else "" for row in self.read(f"{sheet}!{letter}{first_row}:{letter}")]
+
+    def service(self):
+        """A googleapiclient Sheets service pointed at this server"""
+        from google.auth.credentials import AnonymousCredentials
+        from data.google_sheet_parser import build_sheets_service
+        return build_sheets_service(AnonymousCredentials(), client_options={"api_endpoint": f"{self.url}/"})
+
+
+# ---------------------------------------------------------------------------
+# OpenAI chat completions
+
+
+COMPLETION_TEXT = "I was inspired to read about your work with families in our community."
+
+
+def chat_completion(request):
+    """A chat.completion response body for a chat request body"""
+    prompt_chars = sum(len(str(message.get("content", ""))) for message in request.get("messages", []))
+    prompt_tokens = prompt_chars // 4 + 1
+    completion_tokens = len(COMPLETION_TEXT) // 4 + 1
+    return {
+        "id": f"chatcmpl-{random.getrandbits(48):x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "gpt-4o-mini"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": COMPLETION_TEXT}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        },
+    }
+
+
+class _OpenAIHandler(_Handler):
+    def _not_found(self):
+        self.send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def _throttle(self):
+        self.send_json(429, {"error": {
+            "message": "Rate limit reached for requests per min (RPM). Please try again in 1s.",
+            "type": "requests", "code": "rate_limit_exceeded"
+        }}, headers={"Retry-After": "1"})
+
+    def _upload(self):
+        """multipart/form-data with `purpose` and `file` fields, as sent by client.files.create"""
+        length = int(self.headers.get("Content-Length") or 0)
+        head = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("latin-1")
+        message = email.parser.BytesParser().parsebytes(head + self.rfile.read(length))
+        fields = {part.get_param("name", header="content-disposition"): part for part in message.get_payload()}
+        upload = fields["file"]
+        purpose = fields["purpose"].get_payload(decode=True).decode("utf-8") if "purpose" in fields else "batch"
+        self.send_json(200, self.stand_in.add_file(upload.get_filename() or "upload.jsonl",
+                                                   upload.get_payload(decode=True), purpose))
+
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        match = re.match(r"^/v1/files/([^/]+)/content$", path)
+        if match is not None and match.group(1) in self.stand_in.files:
+            self.send_body(200, self.stand_in.files[match.group(1)]["content"], "application/octet-stream")
+            return
+        match = re.match(r"^/v1/batches/([^/]+)$", path)
+        if match is not None and match.group(1) in self.stand_in.batches:
+            self.send_json(200, self.stand_in.batch_status(match.group(1)))
+            return
+        self._not_found()
+
+    def do_POST(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/v1/files":
+            self._upload()
+            return
+        if path == "/v1/batches":
+            request = self.read_json()
+            if request.get("input_file_id") not in self.stand_in.files:
+                self.send_json(400, {"error": {"message": "Unknown input_file_id", "type": "invalid_request_error"}})
+                return
+            self.send_json(200, self.stand_in.create_batch(request))
+            return
+        if path != "/v1/chat/completions":
+            self._not_found()
+            return
+        request = self.read_json()
+        if not self.stand_in.admit():
+            self._throttle()
+            return
+        self.send_json(200, chat_completion(request))
+
+
+class FakeOpenAIServer(_QuotaMixin, _LocalServer):
+    """
+    Chat-completions endpoint returning a fixed personalized line, plus /v1/files
+    and /v1/batches for the Batch API; use `base_url` for the OpenAI client.
+    A batch reports in_progress until `batch_latency` seconds after it was
+    created, then completed with one chat completion per request line. Batch
+    requests don't count against the chat quota, like the real API.
+    """
+
+    handler = _OpenAIHandler
+
+    def __init__(self, latency=0.5, requests_per_minute=None, batch_latency=0.0):
+        super().__init__()
+        self.setup_quota(latency, requests_per_minute)
+        self.batch_latency = batch_latency
+        self.files = {}
+        self.batches = {}
+        self._store_lock = threading.RLock()
+
+    @property
+    def base_url(self):
+        return f"{self.url}/v1"
+
+    def add_file(self, filename, content, purpose):
+        self.count()
+        file_id = f"file-{random.getrandbits(48):x}"
+        record = {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                  "filename": filename, "purpose": purpose, "status": "processed"}
+        with self._store_lock:
+            self.files[file_id] = dict(record, content=content)
+        return record
+
+    def create_batch(self, request):
+        self.count()
+        batch_id = f"batch_{random.getrandbits(48):x}"
+        with self._store_lock:
+            self.batches[batch_id] = {
+                "id": batch_id, "object": "batch", "endpoint": request.get("endpoint"),
+                "input_file_id": request["input_file_id"], "completion_window": request.get("completion_window"),
+                "created_at": int(time.time()), "ready_at": time.monotonic() + self.batch_latency,
+                "status": "in_progress", "output_file_id": None, "error_file_id": None,
+            }
+        return self.batch_status(batch_id)
+
+    def _finish_batch(self, batch):
+        lines = []
+        for line in self.files[batch["input_file_id"]]["content"].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            lines.append(json.dumps({
+                "id": f"batch_req_{random.getrandbits(48):x}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": f"req_{random.getrandbits(48):x}",
+                             "body": chat_completion(request.get("body", {}))},
+                "error": None,
+            }))
+        output = self.add_file("batch_output.jsonl", ("\n".join(lines) + "\n").encode("utf-8"), "batch_output")
+        batch.update(status="completed", output_file_id=output["id"],
+                     request_counts={"total": len(lines), "completed": len(lines), "failed": 0})
+
+    def batch_status(self, batch_id):
+        self.count()
+        with self._store_lock:
+            batch = self.batches[batch_id]
+            if batch["status"] == "in_progress" and time.monotonic() >= batch["ready_at"]:
+                self._finish_batch(batch)
+            return {key: value for key, value in batch.items() if key != "ready_at"}
@@ -1,42 +1,132 @@
-import pandas as pd
 import logging
+import threading
+import httplib2
+import google_auth_httplib2
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+from utils import metrics
+from utils.resilience import retry_call, SHEETS_RETRY
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+_services = {}
+_services_lock = threading.Lock()
+_thread_local = threading.local()
+
+
+def _thread_http(credentials):
+    """Return an authorized httplib2 client owned by the calling thread"""
+    clients = getattr(_thread_local, 'clients', None)
+    if clients is None:
+        clients = _thread_local.clients = {}
+    http = clients.get(id(credentials))
+    if http is None:
+        http = clients[id(credentials)] = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+    return http
+
+
+def build_sheets_service(credentials, client_options=None):
+    """
+    Build a Sheets service that is safe to share between threads.
+    httplib2 is not thread-safe, so every request executes on an HTTP client
+    owned by the calling thread.
+    Args:
+        credentials: google-auth credentials
+        client_options (dict): Passed to googleapiclient, e.g. {"api_endpoint": ...}
+    """
+    def build_request(http, *args, **kwargs):
+        return HttpRequest(_thread_http(credentials), *args, **kwargs)
+
+    return build('sheets', 'v4', http=_thread_http(credentials), requestBuilder=build_request,
+                 client_options=client_options, cache_discovery=False)
+
+
+def get_sheets_service(credentials_file):
+    """
+    Return the process-wide Sheets service for a credentials file.
+    Credentials are loaded and the discovery document is built once per
+    credentials file.
+    """
+    with _services_lock:
+        service = _services.get(credentials_file)
+        if service is None:
+            credentials = service_account.Credentials.from_service_account_file(
+                credentials_file, scopes=SCOPES)
+            service = _services[credentials_file] = build_sheets_service(credentials)
+        return service
+
+
+def register_sheets_service(credentials_file, service):
+    """Make get_sheets_service return `service` for a credentials file, e.g. a service pointed at a stand-in API"""
+    with _services_lock:
+        _services[credentials_file] = service
 
 
 def get_sheet_data(spreadsheet_id, range_name, credentials_file):
+    # pandas is slow to import and only this helper needs it
+    import pandas as pd
     try:
-        # Authenticate with the service account
-        creds = service_account.Credentials.from_service_account_file(
-            credentials_file,
-            scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"]
-        )
-        # Build the Sheets API service
-        service = build('sheets', 'v4', credentials=creds)
+        # Reuse the cached Sheets API service
+        service = get_sheets_service(credentials_file)
         # Call the Sheets API
         sheet = service.spreadsheets()
-        result = sheet.values().get(spreadsheetId=spreadsheet_id, range=range_name).execute()
+        with metrics.timed("sheets_request_seconds", "Sheets API round trip", operation="get"):
+            result = retry_call(lambda: sheet.values().get(spreadsheetId=spreadsheet_id, range=range_name).execute(),
+                                "sheets", policy=SHEETS_RETRY)
         values = result.get('values', [])
         # Convert the data to a pandas DataFrame
         if not values:
-            print("No data found.")
+            logging.warning("No data found.")
             return pd.DataFrame()
         else:
             return pd.DataFrame(values[1:], columns=values[0])
     except Exception as e:
-        print(f"Error fetching data from Google Sheets: {e}")
+        logging.error(f"Error fetching data from Google Sheets: {e}")
         return pd.DataFrame()
 
+
+def get_sheet_columns(spreadsheet_id, ranges, credentials_file, skip_header=True):
+    """
+    Fetch several column ranges in a single values.batchGet call.
+    Args:
+        spreadsheet_id (str): ID of the spreadsheet
+        ranges (list): Column ranges such as ["Sheet1!A1:A", "Sheet1!K1:K"]
+        credentials_file (str): Path to the service account key
+        skip_header (bool): Drop the first row of every column
+    Returns:
+        list: One tuple per row with one value per column, padded with "" so
+              columns stay aligned when trailing cells are empty
+    """
+    try:
+        service = get_sheets_service(credentials_file)
+        with metrics.timed("sheets_request_seconds", "Sheets API round trip", operation="batch_get"):
+            result = retry_call(lambda: service.spreadsheets().values().batchGet(
+                spreadsheetId=spreadsheet_id,
+                ranges=ranges,
+                majorDimension='COLUMNS'
+            ).execute(), "sheets", policy=SHEETS_RETRY)
+        columns = []
+        for value_range in result.get('valueRanges', []):
+            values = value_range.get('values', [])
+            columns.extend(values if values else [[]])
+        if skip_header:
+            columns = [column[1:] for column in columns]
+        row_count = max((len(column) for column in columns), default=0)
+        return [
+            tuple(column[i] if i < len(column) else "" for column in columns)
+            for i in range(row_count)
+        ]
+    except Exception as e:
+        logging.error(f"Error fetching ranges {ranges} from Google Sheets: {str(e)}")
+        return []
+
     
 def setup_google_sheets_service(credentials_file):
     """Set up and return Google Sheets service with error handling"""
     try:
-        SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
-        credentials = service_account.Credentials.from_service_account_file(
-            credentials_file, scopes=SCOPES)
-        service = build('sheets', 'v4', credentials=credentials)
-        return service
+        return get_sheets_service(credentials_file)
     except FileNotFoundError:
         logging.error(f"Credentials file not found: {credentials_file}")
         raise
@@ -46,18 +136,21 @@ def setup_google_sheets_service(credentials_file):
 
 
 def update_sheet_values(service, spreadsheet_id, range_name, values):
-    """Update Google Sheet with error handling"""
+    """Update Google Sheet with error handling. 429s and 5xx responses are retried with backoff."""
     try:
         body = {'values': values}
-        result = service.spreadsheets().values().update(
-            spreadsheetId=spreadsheet_id,
-            range=range_name,
-            valueInputOption='RAW',
-            body=body
-        ).execute()
+        with metrics.timed("sheets_request_seconds", "Sheets API round trip", operation="update"):
+            result = retry_call(lambda: service.spreadsheets().values().update(
+                spreadsheetId=spreadsheet_id,
+                range=range_name,
+                valueInputOption='RAW',
+                body=body
+            ).execute(), "sheets", policy=SHEETS_RETRY)
+        metrics.inc("sheets_updated_cells", result.get('updatedCells', 0))
         logging.info(f"Updated {result.get('updatedCells')} cells in column J")
         return result
     except HttpError as e:
+        metrics.inc("sheets_errors", operation="update", status=e.resp.status)
         if e.resp.status == 403:
             logging.error("Permission denied. Make sure the service account has write access to the spreadsheet")
         elif e.resp.status == 404:
@@ -0,0 +1,14 @@
+from collections import namedtuple
+
+# Rows read per request or query when streaming a sheet or the local store
+DEFAULT_WINDOW = 5000
+
+
+class SheetRow(namedtuple("SheetRow", ["row_number", "values"])):
+    """
+    One sheet row: its 1-based row number and a tuple with one string per
+    requested column. Short rows are padded with "", so `values` always has
+    the same width.
+    """
+
+    __slots__ = ()
@@ -0,0 +1,90 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from data.google_sheet_parser import get_sheets_service
+from data.rows import SheetRow, DEFAULT_WINDOW
+from utils import metrics
+from utils.resilience import retry_call, SHEETS_RETRY
+
+
+def _window_ranges(sheet_name, columns, first_row, last_row):
+    return [f"{sheet_name}!{column}{first_row}:{column}{last_row}" for column in columns]
+
+
+def _fetch_window(service, spreadsheet_id, sheet_name, columns, first_row, window):
+    """Fetch rows first_row..first_row+window-1 of every column in one batchGet. Returns column value lists."""
+    ranges = _window_ranges(sheet_name, columns, first_row, first_row + window - 1)
+    with metrics.timed("sheets_request_seconds", "Sheets API round trip", operation="batch_get"):
+        result = retry_call(lambda: service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=ranges,
+            majorDimension='COLUMNS'
+        ).execute(), "sheets", policy=SHEETS_RETRY)
+    value_ranges = result.get('valueRanges', [])
+    columns_values = []
+    for value_range in value_ranges:
+        values = value_range.get('values', [])
+        columns_values.append(values[0] if values else [])
+    # A column missing from the response has no values in the window
+    columns_values.extend([] for _ in range(len(columns) - len(columns_values)))
+    return columns_values
+
+
+def _rows_from_columns(columns_values, first_row):
+    """Transpose column lists into padded SheetRows; the only place short rows are padded"""
+    row_count = max((len(values) for values in columns_values), default=0)
+    for offset in range(row_count):
+        yield SheetRow(first_row + offset, tuple(
+            str(values[offset]) if offset < len(values) else "" for values in columns_values
+        ))
+    metrics.inc("sheets_rows_read", row_count)
+
+
+def iter_sheet_rows(spreadsheet_id, columns, credentials_file=None, service=None, sheet_name="Sheet1",
+                    first_row=2, window=DEFAULT_WINDOW, prefetch=True):
+    """
+    Stream rows of a sheet in bounded windows.
+
+    Each window (e.g. A2:A5001 and F2:F5001) is fetched with one batchGet, and
+    the next window is fetched in the background while the current one is
+    consumed. Reading stops at the first window that comes back empty, so a
+    gap of `window` or more empty rows ends the sheet.
+    Args:
+        spreadsheet_id (str): ID of the spreadsheet
+        columns (list): Column letters to read, e.g. ["A", "F"]
+        credentials_file (str): Service account key, used when no service is given
+        service: Sheets service to use instead of the one for credentials_file
+        sheet_name (str): Sheet (tab) name
+        first_row (int): First row to read, 2 skips the header
+        window (int): Rows fetched per request
+        prefetch (bool): Fetch the next window while the current one is processed
+    Yields:
+        SheetRow: (row_number, values) with one value per column, in column order
+    Raises:
+        googleapiclient.errors.HttpError: When a window can't be fetched, so runs don't silently stop early
+    """
+    service = service or get_sheets_service(credentials_file)
+    columns = list(columns)
+
+    def fetch(start):
+        return _fetch_window(service, spreadsheet_id, sheet_name, columns, start, window)
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheet-prefetch") if prefetch else None
+    try:
+        start = first_row
+        pending = executor.submit(fetch, start) if executor else None
+        while True:
+            try:
+                columns_values = pending.result() if executor else fetch(start)
+            except Exception as e:
+                logging.error(f"Error fetching rows {start}-{start + window - 1} from Google Sheets: {str(e)}")
+                raise
+            if not any(columns_values):
+                return
+            next_start = start + window
+            if executor:
+                pending = executor.submit(fetch, next_start)
+            yield from _rows_from_columns(columns_values, start)
+            start = next_start
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,205 @@
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from googleapiclient.errors import HttpError
+from utils.rate_limit import TokenBucket
+from utils import metrics
+from utils.resilience import retry_call, CircuitOpen, SHEETS_RETRY
+
+# Sheets API default quota: 60 write requests per minute per user per project
+SHEETS_WRITES_PER_MINUTE = 60
+# Sheets rejects batchUpdate bodies above ~10MB, keep batches well below that
+DEFAULT_MAX_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 5.0
+SHUTDOWN_FLUSH_ATTEMPTS = 3
+
+
+class SheetWriter:
+    """
+    Buffers cell updates and sends them through spreadsheets.values.batchUpdate.
+    429s and 5xx responses are retried with backoff (honoring Retry-After) under
+    the shared "sheets" circuit breaker. A batch that still fails, or that finds
+    the breaker open, stays buffered for the next flush.
+
+    Updates are queued with update() and flushed when the buffer reaches
+    `max_batch_size` ranges, every `flush_interval` seconds, and on close() or
+    interpreter shutdown. Every batchUpdate call takes a token from a bucket
+    sized to the Sheets write quota. Ranges that could not be written are
+    recorded in `failures` and passed to `on_failure(range_name, error)`.
+
+    Usage:
+        with SheetWriter(service, spreadsheet_id) as writer:
+            writer.update("Sheet1!N2", [["..."]])
+    """
+
+    def __init__(self, service, spreadsheet_id, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, writes_per_minute=SHEETS_WRITES_PER_MINUTE,
+                 value_input_option='RAW', on_failure=None, retry_policy=SHEETS_RETRY):
+        self.service = service
+        self.spreadsheet_id = spreadsheet_id
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.value_input_option = value_input_option
+        self.on_failure = on_failure
+        self.retry_policy = retry_policy
+        self.failures = {}
+        self.updated_cells = 0
+        self._bucket = TokenBucket(writes_per_minute)
+        self._buffer = OrderedDict()
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._closed = False
+        self._timer = None
+        if flush_interval:
+            self._timer = threading.Thread(target=self._flush_periodically, name="sheet-writer", daemon=True)
+            self._timer.start()
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def update(self, range_name, values, on_written=None):
+        """
+        Queue a write of `values` (list of rows) to `range_name`. Later writes to the same range win.
+        `on_written(range_name)` is called once the write has been accepted by the API.
+        """
+        if self._closed:
+            raise RuntimeError("SheetWriter is closed")
+        with self._buffer_lock:
+            self._buffer.pop(range_name, None)
+            self._buffer[range_name] = (values, on_written)
+            full = len(self._buffer) >= self.max_batch_size
+        if full:
+            self.flush()
+
+    def pending(self):
+        """Number of ranges waiting to be written"""
+        with self._buffer_lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """
+        Send everything buffered so far.
+        Returns:
+            dict: Ranges that failed in this flush, mapped to their error message
+        """
+        with self._flush_lock:
+            failed = {}
+            while True:
+                with self._buffer_lock:
+                    if not self._buffer:
+                        break
+                    batch = []
+                    while self._buffer and len(batch) < self.max_batch_size:
+                        batch.append(self._buffer.popitem(last=False))
+                retry = self._send(batch, failed)
+                if retry:
+                    self._requeue(retry)
+                    break
+            return failed
+
+    def close(self):
+        """Stop the flush timer and write out anything still buffered"""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        if self._timer is not None and self._timer is not threading.current_thread():
+            self._timer.join()
+        self.flush()
+        for _ in range(SHUTDOWN_FLUSH_ATTEMPTS):
+            if not self.pending():
+                break
+            time.sleep(self.flush_interval or DEFAULT_FLUSH_INTERVAL)
+            self.flush()
+        with self._buffer_lock:
+            unsent = list(self._buffer)
+            self._buffer.clear()
+        for range_name in unsent:
+            self._record_failure(range_name, "Not written before shutdown", {})
+        atexit.unregister(self.close)
+        if self.failures:
+            logging.warning(f"{len(self.failures)} sheet ranges could not be written")
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Background sheet flush failed: {str(e)}")
+
+    def _requeue(self, batch):
+        """Put unsent updates back at the front of the buffer unless they were overwritten meanwhile"""
+        with self._buffer_lock:
+            for range_name, update in reversed(batch):
+                if range_name not in self._buffer:
+                    self._buffer[range_name] = update
+                    self._buffer.move_to_end(range_name, last=False)
+
+    def _record_failure(self, range_name, error, failed):
+        failed[range_name] = error
+        self.failures[range_name] = error
+        logging.error(f"Failed to update range {range_name}: {error}")
+        if self.on_failure is not None:
+            try:
+                self.on_failure(range_name, error)
+            except Exception as e:
+                logging.error(f"on_failure callback raised for {range_name}: {str(e)}")
+
+    def _execute_batch(self, batch):
+        body = {
+            'valueInputOption': self.value_input_option,
+            'data': [{'range': range_name, 'values': values} for range_name, (values, _) in batch]
+        }
+
+        def attempt():
+            self._bucket.acquire()
+            with metrics.timed("sheets_request_seconds", "Sheets API round trip", operation="batch_update"):
+                return self.service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=self.spreadsheet_id,
+                    body=body
+                ).execute()
+        return retry_call(attempt, "sheets", policy=self.retry_policy)
+
+    def _send(self, batch, failed):
+        """Write one batch. Returns the updates that should be retried on a later flush."""
+        try:
+            result = self._execute_batch(batch)
+        except HttpError as e:
+            status = e.resp.status
+            metrics.inc("sheets_errors", operation="batch_update", status=status)
+            if status == 429 or status >= 500:
+                logging.warning(f"Sheets batchUpdate returned {status}, keeping {len(batch)} updates for the next flush")
+                return batch
+            if status == 400 and len(batch) > 1:
+                # One bad range fails the whole batch; split it to find the offending ranges
+                middle = len(batch) // 2
+                return self._send(batch[:middle], failed) + self._send(batch[middle:], failed)
+            for range_name, _ in batch:
+                self._record_failure(range_name, f"HTTP {status}: {str(e)}", failed)
+            return []
+        except CircuitOpen as e:
+            logging.warning(f"{str(e)}, keeping {len(batch)} updates for the next flush")
+            return batch
+        except Exception as e:
+            for range_name, _ in batch:
+                self._record_failure(range_name, str(e), failed)
+            return []
+
+        updated_cells = result.get('totalUpdatedCells', 0)
+        self.updated_cells += updated_cells
+        metrics.inc("sheets_updated_cells", updated_cells)
+        logging.info(f"Updated {updated_cells} cells in {len(batch)} ranges")
+        for range_name, (_, on_written) in batch:
+            if on_written is not None:
+                try:
+                    on_written(range_name)
+                except Exception as e:
+                    logging.error(f"on_written callback raised for {range_name}: {str(e)}")
+        return []
@@ -0,0 +1,320 @@
+"""
+Row storage backends for campaign data.
+
+Both backends read rows as SheetRow records and write through a writer with
+the SheetWriter interface (update(range, values, on_written), flush(),
+close(), failures), so the scrape, generate and pipeline flows run unchanged
+on either:
+
+- SheetsStorage reads and writes the Google Sheet directly.
+- SQLiteStorage keeps every cell in a local SQLite file. Writes are bulk
+  inserts, long text is zlib-compressed, and there is no per-cell size limit
+  or API quota. export_csv() and sync_to_sheet() push the final columns out.
+"""
+import csv
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from data.rows import SheetRow, DEFAULT_WINDOW
+from utils import metrics
+from utils.sqlite import open_sqlite
+
+DEFAULT_STORAGE_PATH = "data/campaign.sqlite"
+DEFAULT_CSV_PATH = "data/output_emails.csv"
+# Values longer than this many bytes are stored zlib-compressed
+COMPRESS_THRESHOLD = 512
+DEFAULT_WRITE_BATCH = 500
+# Longest run of contiguous cells pushed to a sheet as a single range
+SYNC_RANGE_ROWS = 1000
+
+CELL_RANGE_RE = re.compile(r"^(?:(?P<sheet>[^!]+)!)?(?P<column>[A-Z]+)(?P<row>\d+)(?::[A-Z]+\d+)?$")
+
+
+def parse_cell_range(range_name, default_sheet="Sheet1"):
+    """
+    Top-left cell of an A1 range such as "Sheet1!N5:N5".
+    Returns:
+        tuple: (sheet_name, column_letters, row_number)
+    Raises:
+        ValueError: For ranges without an explicit start cell
+    """
+    match = CELL_RANGE_RE.match(range_name.replace("'", ""))
+    if match is None:
+        raise ValueError(f"Unsupported range {range_name}")
+    return match.group("sheet") or default_sheet, match.group("column"), int(match.group("row"))
+
+
+def column_offset(column, offset):
+    """Column letters `offset` columns to the right of `column`"""
+    index = 0
+    for letter in column:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    index += offset
+    letters = ""
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+class SheetsStorage:
+    """Campaign rows kept in the Google Sheet itself"""
+
+    def __init__(self, service, spreadsheet_id, sheet_name="Sheet1", read_window=DEFAULT_WINDOW):
+        self.service = service
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.read_window = read_window
+        # Identifies the campaign in checkpoints
+        self.run_key = spreadsheet_id
+
+    def iter_rows(self, columns, first_row=2):
+        from data.sheet_reader import iter_sheet_rows
+        return iter_sheet_rows(self.spreadsheet_id, columns, service=self.service, sheet_name=self.sheet_name,
+                               first_row=first_row, window=self.read_window)
+
+    def writer(self):
+        from data.sheet_writer import SheetWriter
+        return SheetWriter(self.service, self.spreadsheet_id)
+
+    def close(self):
+        pass
+
+
+class SQLiteStorage:
+    """
+    Campaign rows kept in a local SQLite file, one table row per non-empty cell.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path=DEFAULT_STORAGE_PATH, sheet_name="Sheet1", compress_threshold=COMPRESS_THRESHOLD,
+                 read_window=DEFAULT_WINDOW):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.compress_threshold = compress_threshold
+        self.read_window = read_window
+        self.run_key = os.path.abspath(path)
+        self._lock = threading.Lock()
+        self._conn = open_sqlite(path, synchronous="NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cells ("
+            "sheet TEXT NOT NULL, row_number INTEGER NOT NULL, column_name TEXT NOT NULL, "
+            "value BLOB NOT NULL, compressed INTEGER NOT NULL, "
+            "PRIMARY KEY (sheet, row_number, column_name))"
+        )
+        self._conn.commit()
+
+    def _encode(self, value):
+        data = str(value).encode("utf-8")
+        if len(data) > self.compress_threshold:
+            return zlib.compress(data), 1
+        return data, 0
+
+    @staticmethod
+    def _decode(value, compressed):
+        return (zlib.decompress(value) if compressed else bytes(value)).decode("utf-8")
+
+    def put_values(self, cells):
+        """
+        Store many cells in one transaction. Empty values delete the cell.
+        Args:
+            cells (iterable): (row_number, column, value) triples
+        Returns:
+            int: Number of cells written
+        """
+        upserts, deletes = [], []
+        for row_number, column, value in cells:
+            if value is None or value == "":
+                deletes.append((self.sheet_name, row_number, column))
+            else:
+                upserts.append((self.sheet_name, row_number, column) + self._encode(value))
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO cells (sheet, row_number, column_name, value, compressed) "
+                    "VALUES (?, ?, ?, ?, ?)", upserts
+                )
+                self._conn.executemany(
+                    "DELETE FROM cells WHERE sheet = ? AND row_number = ? AND column_name = ?", deletes
+                )
+        metrics.inc("storage_cells_written", len(upserts) + len(deletes), backend="sqlite")
+        return len(upserts) + len(deletes)
+
+    def last_row(self):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(row_number) FROM cells WHERE sheet = ?", (self.sheet_name,)).fetchone()
+        return row[0] or 1
+
+    def iter_rows(self, columns, first_row=2):
+        """Stream SheetRows of `columns` in row order, reading `read_window` rows per query"""
+        columns = list(columns)
+        positions = {column: i for i, column in enumerate(columns)}
+        placeholders = ",".join("?" for _ in columns)
+        start = first_row
+        last = self.last_row()
+        while start <= last:
+            end = start + self.read_window - 1
+            with self._lock:
+                cells = self._conn.execute(
+                    f"SELECT row_number, column_name, value, compressed FROM cells "
+                    f"WHERE sheet = ? AND row_number BETWEEN ? AND ? AND column_name IN ({placeholders}) "
+                    f"ORDER BY row_number",
+                    [self.sheet_name, start, end] + columns
+                ).fetchall()
+            current, values = None, None
+            for row_number, column, value, compressed in cells:
+                if row_number != current:
+                    if current is not None:
+                        yield SheetRow(current, tuple(values))
+                    current, values = row_number, [""] * len(columns)
+                values[positions[column]] = self._decode(value, compressed)
+            if current is not None:
+                yield SheetRow(current, tuple(values))
+            start = end + 1
+
+    def writer(self):
+        return LocalWriter(self)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LocalWriter:
+    """
+    SheetWriter-compatible writer for SQLiteStorage.
+    Updates are buffered and written with one executemany per `batch_size` ranges.
+    """
+
+    def __init__(self, storage, batch_size=DEFAULT_WRITE_BATCH):
+        self.storage = storage
+        self.batch_size = batch_size
+        self.failures = {}
+        self.updated_cells = 0
+        self._buffer = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def update(self, range_name, values, on_written=None):
+        with self._lock:
+            self._buffer.pop(range_name, None)
+            self._buffer[range_name] = (values, on_written)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """Write everything buffered. Returns the ranges that failed, mapped to their error message."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._buffer.items())
+                self._buffer.clear()
+            if not batch:
+                return {}
+            failed = {}
+            cells, written = [], []
+            for range_name, (values, on_written) in batch:
+                try:
+                    _, column, row_number = parse_cell_range(range_name, self.storage.sheet_name)
+                except ValueError as e:
+                    failed[range_name] = str(e)
+                    continue
+                for r, row in enumerate(values):
+                    for c, value in enumerate(row):
+                        cells.append((row_number + r, column_offset(column, c), value))
+                written.append((range_name, on_written))
+            try:
+                self.updated_cells += self.storage.put_values(cells)
+            except sqlite3.Error as e:
+                failed.update((range_name, str(e)) for range_name, _ in written)
+                written = []
+            for range_name, on_written in written:
+                if on_written is not None:
+                    try:
+                        on_written(range_name)
+                    except Exception as e:
+                        logging.error(f"on_written callback raised for {range_name}: {str(e)}")
+            for range_name, error in failed.items():
+                logging.error(f"Failed to update range {range_name}: {error}")
+            self.failures.update(failed)
+            return failed
+
+    def close(self):
+        self.flush()
+
+
+def export_csv(storage, columns, path=DEFAULT_CSV_PATH, header=None, first_row=2):
+    """
+    Write rows of `columns` to a CSV file, streaming from the storage.
+    Args:
+        storage: SheetsStorage or SQLiteStorage
+        columns (list): Column letters to export
+        path (str): Output file
+        header (list): Header row, defaults to the column letters
+    Returns:
+        int: Number of rows written
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        out = csv.writer(f)
+        out.writerow(["row"] + list(header or columns))
+        for row_number, values in storage.iter_rows(columns, first_row=first_row):
+            out.writerow([row_number] + list(values))
+            count += 1
+    logging.info(f"Exported {count} rows to {path}")
+    return count
+
+
+def sync_to_sheet(storage, writer, columns, sheet_name="Sheet1", first_row=2):
+    """
+    Push `columns` from a local storage to a sheet through a SheetWriter.
+    Runs of consecutive non-empty cells go out as one range each, so a column
+    of 10,000 results takes a handful of ranges instead of 10,000.
+    Returns:
+        int: Number of cells queued
+    """
+    runs = {column: [] for column in columns}
+    starts = {column: None for column in columns}
+    queued = 0
+
+    def push(column):
+        nonlocal queued
+        values = runs[column]
+        if values:
+            start = starts[column]
+            writer.update(f"{sheet_name}!{column}{start}:{column}{start + len(values) - 1}", [[value] for value in values])
+            queued += len(values)
+        runs[column] = []
+        starts[column] = None
+
+    for row_number, values in storage.iter_rows(columns, first_row=first_row):
+        for column, value in zip(columns, values):
+            run = runs[column]
+            contiguous = starts[column] is not None and starts[column] + len(run) == row_number
+            if not value or not contiguous or len(run) >= SYNC_RANGE_ROWS:
+                push(column)
+            if value:
+                if starts[column] is None:
+                    starts[column] = row_number
+                runs[column].append(value)
+    for column in columns:
+        push(column)
+    logging.info(f"Queued {queued} cells of columns {', '.join(columns)} for the sheet")
+    return queued
@@ -8,16 +8,6 @@ import time
 import random
 from dotenv import load_dotenv
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('linkedin_parser.log'),
-        logging.StreamHandler()
-    ]
-)
-
 
 connect_button_selectors = [
     # Most specific selector first
@@ -114,36 +104,36 @@ def send_connection_request(driver, profile_url, daily_requests_sent, max_daily_
 
         time.sleep(random.uniform(2, 4))
         
-        print("Looking for connect button...")
+        logging.debug("Looking for connect button...")
         connect_button = None
         for selector in connect_button_selectors:
             try:
-                print(f"Trying selector: {selector}")
+                logging.debug(f"Trying selector: {selector}")
                 if selector.startswith("//"):
                     elements = driver.find_elements(By.XPATH, selector)
                 else:
                     elements = driver.find_elements(By.CSS_SELECTOR, selector)
                 
-                # Print all found elements for debugging
-                print(f"Found {len(elements)} elements with selector {selector}")
+                # Log all found elements for debugging
+                logging.debug(f"Found {len(elements)} elements with selector {selector}")
                 for elem in elements:
-                    print(f"Element text: {elem.text}")
-                    print(f"Element aria-label: {elem.get_attribute('aria-label')}")
-                    print(f"Element class: {elem.get_attribute('class')}")
+                    logging.debug(f"Element text: {elem.text}")
+                    logging.debug(f"Element aria-label: {elem.get_attribute('aria-label')}")
+                    logging.debug(f"Element class: {elem.get_attribute('class')}")
                 
                 if elements:
                     connect_button = elements[0]
-                    print(f"Successfully found connect button with selector: {selector}")
+                    logging.info(f"Successfully found connect button with selector: {selector}")
                     break
             except Exception as e:
-                print(f"Error with selector {selector}: {str(e)}")
+                logging.warning(f"Error with selector {selector}: {str(e)}")
                 continue
 
         if not connect_button:
-            print("Connect button not found")
+            logging.warning("Connect button not found")
             return "Connect button not found"
 
-        print("Found connect button, attempting to click...")
+        logging.info("Found connect button, attempting to click...")
         
         # Ensure button is in view
         driver.execute_script("arguments[0].scrollIntoView(true);", connect_button)
@@ -151,21 +141,21 @@ def send_connection_request(driver, profile_url, daily_requests_sent, max_daily_
 
         # Try multiple click methods
         try:
-            print("Attempting regular click...")
+            logging.debug("Attempting regular click...")
             connect_button.click()
         except Exception as e1:
-            print(f"Regular click failed: {str(e1)}")
+            logging.warning(f"Regular click failed: {str(e1)}")
             try:
-                print("Attempting JavaScript click...")
+                logging.debug("Attempting JavaScript click...")
                 driver.execute_script("arguments[0].click();", connect_button)
             except Exception as e2:
-                print(f"JavaScript click failed: {str(e2)}")
+                logging.warning(f"JavaScript click failed: {str(e2)}")
                 try:
-                    print("Attempting ActionChains click...")
+                    logging.debug("Attempting ActionChains click...")
                     actions = ActionChains(driver)
                     actions.move_to_element(connect_button).click().perform()
                 except Exception as e3:
-                    print(f"ActionChains click failed: {str(e3)}")
+                    logging.warning(f"ActionChains click failed: {str(e3)}")
                     raise Exception("All click methods failed")
 
         time.sleep(1)
@@ -189,13 +179,13 @@ def send_connection_request(driver, profile_url, daily_requests_sent, max_daily_
                         EC.element_to_be_clickable((By.CSS_SELECTOR, selector))  # Changed to element_to_be_clickable
                     )
                 if send_button:
-                    print(f"Found 'Send without a note' button using selector: {selector}")
+                    logging.info(f"Found 'Send without a note' button using selector: {selector}")
                     break
             except:
                 continue
                 
         if not send_button:
-            print("Send without note button not found")
+            logging.warning("Send without note button not found")
             return "Send button not found"
             
         # Try multiple ways to click the send button
@@ -213,7 +203,7 @@ def send_connection_request(driver, profile_url, daily_requests_sent, max_daily_
         return "Request Sent"
         
     except Exception as e:
-        print(f"Error sending connection request: {str(e)}")
+        logging.error(f"Error sending connection request: {str(e)}")
         return f"Error: {str(e)}"
 
 
@@ -250,8 +240,8 @@ def validate_profile(driver, profile_url, first_name, last_name):
                 expected_first_name = first_name.strip().lower()
                 expected_last_name = last_name.strip().lower()
                 
-                print(f"Expected: First='{expected_first_name}', Last='{expected_last_name}'")
-                print(f"Found: First='{profile_first_name}', Last='{profile_last_name}'")
+                logging.debug(f"Expected: First='{expected_first_name}', Last='{expected_last_name}'")
+                logging.debug(f"Found: First='{profile_first_name}', Last='{profile_last_name}'")
                 
                 if (profile_first_name == expected_first_name and 
                     profile_last_name == expected_last_name):
@@ -263,5 +253,5 @@ def validate_profile(driver, profile_url, first_name, last_name):
                 return False, "Could not find matching profile name"
             
     except Exception as e:
-        print(f"Error in profile validation: {str(e)}")
+        logging.error(f"Error in profile validation: {str(e)}")
         return False, f"Error validating profile: {str(e)}"
\ No newline at end of file
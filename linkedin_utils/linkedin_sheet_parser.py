@@ -1,15 +1,5 @@
 import logging
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('linkedin_parser.log'),
-        logging.StreamHandler()
-    ]
-)
-
 def get_linkedin_profiles(service, spreadsheet_id):
     """
     Get LinkedIn profile data from the specified sheet
@@ -0,0 +1,214 @@
+import json
+import logging
+import os
+import time
+from llm_utils.gpt_connector import build_chat_request, get_openai_client
+from llm_utils.result_cache import cache_key
+from utils.resilience import retry_call, status_code, OPENAI_RETRY
+
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+DEFAULT_POLL_INTERVAL = 30
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+# Batch API limits for one input file
+MAX_BATCH_REQUESTS = 50000
+MAX_BATCH_FILE_BYTES = 200 * 1000 * 1000
+
+
+def custom_id_for_row(row):
+    return f"row-{row}"
+
+
+def row_from_custom_id(custom_id):
+    return int(custom_id.split("-", 1)[1])
+
+
+def _shard_path(request_path, index, shards):
+    """request_path itself for a single file, otherwise data/batch_requests-1.jsonl, -2, ..."""
+    if shards == 1:
+        return request_path
+    root, ext = os.path.splitext(request_path)
+    return f"{root}-{index}{ext}"
+
+
+def write_batch_files(pending, request_path, max_requests=MAX_BATCH_REQUESTS, max_bytes=MAX_BATCH_FILE_BYTES):
+    """
+    Write one Batch API request per pending row to JSONL files, starting a new
+    file before one would pass max_requests requests or max_bytes bytes.
+    Args:
+        pending (list): (row_number, content) pairs
+        request_path (str): Destination of the JSONL request file; with several files
+                            a -1, -2, ... suffix is added before the extension
+        max_requests (int): Requests allowed in one file
+        max_bytes (int): Size allowed for one file
+    Returns:
+        list: (path, row_numbers) per file written
+    """
+    shards = []
+    size = 0
+    for row, content in pending:
+        request = {
+            "custom_id": custom_id_for_row(row),
+            "method": "POST",
+            "url": CHAT_COMPLETIONS_ENDPOINT,
+            "body": build_chat_request(content)
+        }
+        line = (json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8")
+        if not shards or len(shards[-1][1]) >= max_requests or size + len(line) > max_bytes:
+            shards.append(([], []))
+            size = 0
+        lines, rows = shards[-1]
+        lines.append(line)
+        rows.append(row)
+        size += len(line)
+    written = []
+    for index, (lines, rows) in enumerate(shards, 1):
+        path = _shard_path(request_path, index, len(shards))
+        with open(path, "wb") as f:
+            f.writelines(lines)
+        written.append((path, rows))
+    return written
+
+
+def parse_batch_output(text):
+    """
+    Turn Batch API output (or error) JSONL into {row_number: result}.
+    Failed requests map to "Error: ..." like process_with_gpt does.
+    """
+    results = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        row = row_from_custom_id(item["custom_id"])
+        response = item.get("response") or {}
+        body = response.get("body") or {}
+        if item.get("error"):
+            error = item["error"]
+            results[row] = f"Error: {error.get('message', error) if isinstance(error, dict) else error}"
+        elif response.get("status_code") != 200:
+            message = (body.get("error") or {}).get("message", f"status {response.get('status_code')}")
+            results[row] = f"Error: {message}"
+        else:
+            results[row] = body["choices"][0]["message"]["content"].strip()
+    return results
+
+
+class OpenAIBatchTransport:
+    """
+    Batch API transport built on the OpenAI client.
+
+    Pass a client created with base_url pointing at a local fake endpoint to run
+    batches without the real provider.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def upload(self, path):
+        def attempt():
+            with open(path, "rb") as f:
+                return self.client.files.create(file=f, purpose="batch").id
+        return retry_call(attempt, "openai", policy=OPENAI_RETRY)
+
+    def create(self, input_file_id):
+        # Only retry rejected requests; a timed out create may have made a batch already
+        batch = retry_call(lambda: self.client.batches.create(
+            input_file_id=input_file_id,
+            endpoint=CHAT_COMPLETIONS_ENDPOINT,
+            completion_window=COMPLETION_WINDOW
+        ), "openai", policy=OPENAI_RETRY, transient=lambda e: status_code(e) == 429)
+        return batch.id
+
+    def retrieve(self, batch_id):
+        """Return (status, output_file_id, error_file_id) for a batch"""
+        batch = retry_call(lambda: self.client.batches.retrieve(batch_id), "openai", policy=OPENAI_RETRY)
+        return batch.status, batch.output_file_id, batch.error_file_id
+
+    def download(self, file_id):
+        return retry_call(lambda: self.client.files.content(file_id).text, "openai", policy=OPENAI_RETRY)
+
+
+def run_batch(pending, api_key, request_path, transport=None, poll_interval=DEFAULT_POLL_INTERVAL, timeout=None,
+              cache=None, refresh_cache=False, max_requests=MAX_BATCH_REQUESTS, max_bytes=MAX_BATCH_FILE_BYTES):
+    """
+    Submit pending rows as Batch API jobs and wait for the results.
+    Rows are split into as many request files and batches as the per-file limits
+    need; all of them are submitted before polling starts.
+    Args:
+        pending (list): (row_number, content) pairs
+        api_key (str): OpenAI API key, used when no transport is given
+        request_path (str): Where to write the JSONL request file(s)
+        transport: Object with upload/create/retrieve/download, defaults to OpenAIBatchTransport
+        poll_interval (float): Seconds between status checks
+        timeout (float): Give up after this many seconds, None waits for the batch window
+        cache (LLMResultCache): Optional result cache; cached rows are not submitted
+        refresh_cache (bool): Submit every row but store the fresh results
+        max_requests (int): Requests per batch file
+        max_bytes (int): Size of one batch file
+    Returns:
+        dict: {row_number: generated email or "Error: ..."}. Rows of a batch that failed,
+              expired or was cancelled have no entry, so a later run submits them again.
+    """
+    results = {}
+    keys = {}
+    if cache is not None:
+        uncached = []
+        for row, content in pending:
+            keys[row] = cache_key(build_chat_request(content))
+            cached = None if refresh_cache else cache.get(keys[row])
+            if cached is not None:
+                results[row] = cached
+            else:
+                uncached.append((row, content))
+        logging.info(f"{len(results)} rows answered from the LLM result cache")
+        pending = uncached
+    if not pending:
+        return results
+    transport = transport or OpenAIBatchTransport(get_openai_client(api_key))
+    batches = {}
+    for path, rows in write_batch_files(pending, request_path, max_requests, max_bytes):
+        logging.info(f"Wrote {len(rows)} batch requests to {path}")
+        batch_id = transport.create(transport.upload(path))
+        logging.info(f"Submitted batch {batch_id}")
+        batches[batch_id] = rows
+
+    started = time.monotonic()
+    running = dict.fromkeys(batches)
+    finished = {}
+    while running:
+        for batch_id in list(running):
+            status, output_file_id, error_file_id = transport.retrieve(batch_id)
+            if status in TERMINAL_STATUSES:
+                logging.info(f"Batch {batch_id} finished with status {status}")
+                finished[batch_id] = (status, output_file_id, error_file_id)
+                del running[batch_id]
+            else:
+                running[batch_id] = status
+        if not running:
+            break
+        if timeout is not None and time.monotonic() - started > timeout:
+            states = ", ".join(f"{batch_id} {status}" for batch_id, status in running.items())
+            raise TimeoutError(f"Batches still running after {timeout} seconds: {states}")
+        logging.info(f"{len(running)} of {len(batches)} batches still running, checking again in {poll_interval}s")
+        time.sleep(poll_interval)
+
+    for batch_id, (status, output_file_id, error_file_id) in finished.items():
+        batch_results = {}
+        if output_file_id:
+            batch_results.update(parse_batch_output(transport.download(output_file_id)))
+        if error_file_id:
+            batch_results.update(parse_batch_output(transport.download(error_file_id)))
+        missing = 0
+        for row in batches[batch_id]:
+            result = batch_results.get(row)
+            if result is None:
+                missing += 1
+                continue
+            if cache is not None and not result.startswith("Error"):
+                cache.put(keys[row], result)
+            results[row] = result
+        if missing:
+            logging.warning(f"Batch {batch_id} ({status}) returned no result for {missing} rows; "
+                            f"they stay pending for the next run")
+    return results
@@ -1,95 +1,249 @@
 from openai import OpenAI
 import logging
-from time import sleep
+import threading
+from llm_utils.result_cache import cache_key
+from utils import metrics
+from utils.resilience import retry_call, RetryPolicy, OPENAI_RETRY, deadline_after, remaining
 
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
-def create_prompt(cell_content):
-    """
-    Creates a formatted prompt by combining the template with cell content.
-    Args:
-        cell_content (str): The content from the cell
-    Returns:
-        str: Combined prompt ready for GPT processing
-    """
-    # Custom prompt for GPT
-    gpt_prompt = """
-    Custom GPT Bot Email Template Instructions
+MODEL = "gpt-4o-mini"
+SYSTEM_MESSAGE = "You are a helpful assistant that analyzes website content of non profit organisations and generates cold outreach emails."
+TEMPERATURE = 0.7
+MAX_TOKENS = 500
+# Scraped content beyond this many tokens is trimmed before the request is sent
+MAX_INPUT_TOKENS = 3000
+# Rough chars-per-token ratio for English text, used when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+# Longest a single chat completion request may take; the retry deadline can shorten it
+REQUEST_TIMEOUT = 60
+
+# Custom prompt for GPT. It never changes between rows, so it goes at the start of the
+# request where provider-side prompt caching can reuse it.
+EMAIL_TEMPLATE_INSTRUCTIONS = """
+Custom GPT Bot Email Template Instructions
+
+Objective: Generate initial cold emails for outreach, following the specific template provided below. Only modify the sections within brackets for personalization; all other content should remain fixed.
+
+Email Template:
 
-    Objective: Generate initial cold emails for outreach, following the specific template provided below. Only modify the sections within brackets for personalization; all other content should remain fixed.
+[Name of the Person] - really liked your organisation's mission towards the community." 
 
-    Email Template:
+[PERSONALISATION]
 
-    [Name of the Person] - really liked your organisation's mission towards the community." 
+Your story needs to reach more people because of the impact it has.
 
-    [PERSONALISATION]
+Assuming you could potentially tell your story to a greater audience.
+Would you be interested to know how?
 
-    Your story needs to reach more people because of the impact it has.
+Thanks,
+Utkarsh KR
 
-    Assuming you could potentially tell your story to a greater audience.
-    Would you be interested to know how?
+Example Email:
 
-    Thanks,
-    Utkarsh KR
+Alyssia - really liked your organisation's mission towards the community." 
 
-    Example Email:
+The advice on "starting the clock" with investments was very helpful.
 
-    Alyssia - really liked your organisation's mission towards the community." 
+Advice like this needs to reach more people. 
 
-    The advice on "starting the clock" with investments was very helpful.
+Your story needs to reach more people because of the impact it has.
 
-    Advice like this needs to reach more people. 
+Assuming you could potentially tell your story to a greater audience.
+Would you be interested to know how?
 
-    Your story needs to reach more people because of the impact it has.
+Thanks,
+Utkarsh KR
 
-    Assuming you could potentially tell your story to a greater audience.
-    Would you be interested to know how?
+Instructions:
 
-    Thanks,
-    Utkarsh KR
+1. Personalization Fields:
+- Replace [Name of the Person] with the name of the person given in the prompt.
+- Replace [PERSONALISATION] with a short, specific comment about a particular insight or segment of the about us content.
+- While personalizing: Write the personalization in 3rd Grade level. The sentence should not be too long and complex. Use shorter sentences and simpler words.
 
-    Instructions:
+2. Fixed Content:
+- Do not change any other text in the template. All non-bracketed content should remain exactly as written, preserving the wording, tone, and format. Be very very strict on this, I don't want anything else apart from the bracketed  content to change. 
 
-    1. Personalization Fields:
-    - Replace [Name of the Person] with the name of the person given in the prompt.
-    - Replace [PERSONALISATION] with a short, specific comment about a particular insight or segment of the about us content.
-    - While personalizing: Write the personalization in 3rd Grade level. The sentence should not be too long and complex. Use shorter sentences and simpler words.
+3. Tone and Language:
+- Keep the tone friendly and professional.
+- Ensure the language is simple, conversational, and concise to stay within a ~150-word limit.
+""".strip()
 
-    2. Fixed Content:
-    - Do not change any other text in the template. All non-bracketed content should remain exactly as written, preserving the wording, tone, and format. Be very very strict on this, I don't want anything else apart from the bracketed  content to change. 
+_clients = {}
+_clients_lock = threading.Lock()
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
 
-    3. Tone and Language:
-    - Keep the tone friendly and professional.
-    - Ensure the language is simple, conversational, and concise to stay within a ~150-word limit.
+
+def get_openai_client(api_key):
+    """
+    Return a shared OpenAI client for an API key, creating it on first use.
+    The SDK's own retries are off; calls retry through utils.resilience instead.
     """
-    cleaned_content = str(cell_content).strip() if cell_content else ""
-    full_prompt = f"{gpt_prompt.strip()}\n\nContent to personalize from:\n{cleaned_content}"
-    return full_prompt
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _clients[api_key] = OpenAI(api_key=api_key, max_retries=0)
+        return client
+
+
+def estimate_tokens(text):
+    """Cheap upper-bound style estimate of the tokens in a piece of text"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _get_encoding():
+    """Return the tiktoken encoding for MODEL, or None if tiktoken can't provide it"""
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            _encoding_loaded = True
+            if tiktoken is not None:
+                try:
+                    _encoding = tiktoken.encoding_for_model(MODEL)
+                except Exception as e:
+                    logging.warning(f"tiktoken encoding unavailable, estimating tokens from length: {str(e)}")
+        return _encoding
 
 
-def process_with_gpt(content, api_key, max_retries=3, delay=1):
-    """Process content with GPT API with retry logic"""
-    client = OpenAI(api_key=api_key)
+def count_tokens(text):
+    """Count the tokens in text with the model's tokenizer, estimating if it is unavailable"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_token_budget(text, max_tokens):
+    """
+    Trim text to at most max_tokens tokens, keeping the beginning.
+    Returns the text unchanged when it already fits or max_tokens is None.
+    """
+    if max_tokens is None:
+        return text
+    encoding = _get_encoding()
+    if encoding is None:
+        limit = max_tokens * CHARS_PER_TOKEN
+        return text if len(text) <= limit else text[:limit]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def build_chat_request(content, max_input_tokens=MAX_INPUT_TOKENS):
+    """
+    Build the chat completions request body for a piece of content.
+
+    The fixed template instructions live in the system message so every request
+    starts with the same prefix, which lets provider-side prompt caching apply
+    across rows. Only the per-row content goes in the user message, trimmed to
+    max_input_tokens. Shared by the realtime and batch paths so both send
+    identical requests.
+    """
+    cleaned_content = str(content).strip() if content else ""
+    cleaned_content = truncate_to_token_budget(cleaned_content, max_input_tokens)
+    return {
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": f"{SYSTEM_MESSAGE}\n\n{EMAIL_TEMPLATE_INSTRUCTIONS}"},
+            {"role": "user", "content": f"Content to personalize from:\n{cleaned_content}"}
+        ],
+        "temperature": TEMPERATURE,
+        "max_tokens": MAX_TOKENS
+    }
+
+
+def complete_with_gpt(content, api_key, max_retries=3, delay=1, client=None, rate_limiter=None,
+                      cache=None, refresh_cache=False, max_input_tokens=MAX_INPUT_TOKENS):
+    """
+    Process content with GPT API with retry logic and report token usage
+    Args:
+        content (str): Content to build the prompt from
+        api_key (str): OpenAI API key, used when no client is given
+        max_retries (int): Attempts made on rate limits, 5xx responses and connection errors
+        delay (float): Base backoff in seconds, doubled per attempt with jitter; Retry-After takes precedence
+        client (OpenAI): Client to reuse, defaults to the shared client for api_key
+        rate_limiter: Optional limiter with acquire(tokens)/settle(reserved, used)
+        cache (LLMResultCache): Optional result cache, pass None to bypass it
+        refresh_cache (bool): Skip the cache lookup but store the fresh result
+        max_input_tokens (int): Token budget for the scraped content
+    Returns:
+        dict: "text" (the email or "Error: ..."), "prompt_tokens", "completion_tokens",
+              "cached_prompt_tokens" and "from_cache"
+    """
+    outcome = {"text": None, "prompt_tokens": 0, "completion_tokens": 0,
+               "cached_prompt_tokens": 0, "from_cache": False}
+    request = build_chat_request(content, max_input_tokens=max_input_tokens)
+    key = None
+    if cache is not None:
+        key = cache_key(request)
+        if not refresh_cache:
+            cached = cache.get(key)
+            if cached is not None:
+                outcome.update(text=cached, from_cache=True)
+                metrics.inc("gpt_requests", result="cached")
+                return outcome
+    client = client or get_openai_client(api_key)
+    policy = RetryPolicy(attempts=max_retries, base_delay=delay, max_delay=OPENAI_RETRY.max_delay,
+                         deadline=OPENAI_RETRY.deadline)
+    deadline = deadline_after(policy.deadline)
+
+    reserved = 0
+    if rate_limiter is not None:
+        reserved = sum(count_tokens(m["content"]) for m in request["messages"]) + MAX_TOKENS
+
+    def attempt():
+        if rate_limiter is not None:
+            rate_limiter.acquire(reserved)
+        try:
+            with metrics.timed("gpt_request_seconds", "Chat completion round trip"):
+                response = client.chat.completions.create(**request, timeout=remaining(deadline, REQUEST_TIMEOUT))
+        except Exception:
+            if rate_limiter is not None:
+                # A failed attempt has no usage to charge, so retries don't spend the token budget twice
+                rate_limiter.settle(reserved, 0)
+            raise
+        if rate_limiter is not None and response.usage is not None:
+            rate_limiter.settle(reserved, response.usage.total_tokens)
+        return response
+
     try:
-        for attempt in range(max_retries):
-            try:
-                full_prompt = create_prompt(content)
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant that analyzes website content of non profit organisations and generates cold outreach emails."},
-                        {"role": "user", "content": full_prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=500
-                )
-                return response.choices[0].message.content.strip()
-            except Exception as e:
-                if "rate_limit" in str(e).lower() and attempt < max_retries - 1:
-                    sleep_time = delay * (attempt + 1)
-                    logging.warning(f"Rate limit reached. Retrying in {sleep_time} seconds...")
-                    sleep(sleep_time)
-                else:
-                    raise        
+        response = retry_call(attempt, "openai", policy=policy, deadline=deadline)
+        usage = response.usage
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            outcome.update(
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                cached_prompt_tokens=getattr(details, "cached_tokens", 0) or 0
+            )
+            metrics.inc("gpt_tokens", outcome["prompt_tokens"], kind="prompt")
+            metrics.inc("gpt_tokens", outcome["completion_tokens"], kind="completion")
+            metrics.inc("gpt_tokens", outcome["cached_prompt_tokens"], kind="cached_prompt")
+        result = response.choices[0].message.content.strip()
+        if key is not None:
+            cache.put(key, result)
+        outcome["text"] = result
+        metrics.inc("gpt_requests", result="ok")
+        return outcome
     except Exception as e:
         logging.error(f"Failed to process content with GPT: {str(e)}")
-        return f"Error: {str(e)}"
\ No newline at end of file
+        metrics.inc("gpt_requests", result="error")
+        outcome["text"] = f"Error: {str(e)}"
+        return outcome
+
+
+def process_with_gpt(content, api_key, max_retries=3, delay=1, client=None, rate_limiter=None,
+                     cache=None, refresh_cache=False, max_input_tokens=MAX_INPUT_TOKENS):
+    """Process content with GPT API with retry logic. Returns the email text, or "Error: ..." on failure."""
+    return complete_with_gpt(
+        content, api_key, max_retries=max_retries, delay=delay, client=client,
+        rate_limiter=rate_limiter, cache=cache, refresh_cache=refresh_cache,
+        max_input_tokens=max_input_tokens
+    )["text"]
@@ -0,0 +1,102 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from llm_utils.gpt_connector import complete_with_gpt, get_openai_client, MAX_INPUT_TOKENS
+from utils.rate_limit import TokenBucket
+
+# gpt-4o-mini usage tier 1 limits; raise these to match the account's tier
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 200000
+DEFAULT_MAX_WORKERS = 16
+
+
+class OpenAIRateLimiter:
+    """
+    Paces requests against both the requests-per-minute and tokens-per-minute limits.
+
+    acquire() reserves one request and an estimate of the tokens a call will use.
+    settle() corrects the token bucket once the real usage is known.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def acquire(self, tokens):
+        self.requests.acquire()
+        self.tokens.acquire(tokens)
+
+    def settle(self, reserved, used):
+        self.tokens.refund(reserved - used)
+
+
+class LLMExecutor:
+    """
+    Runs process_with_gpt calls concurrently on a thread pool with one shared client.
+
+    Usage:
+        with LLMExecutor(api_key) as executor:
+            emails = executor.map(contents)
+    """
+
+    def __init__(self, api_key, max_workers=DEFAULT_MAX_WORKERS,
+                 requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 cache=None, refresh_cache=False, max_input_tokens=MAX_INPUT_TOKENS):
+        self.api_key = api_key
+        self.max_input_tokens = max_input_tokens
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_prompt_tokens = 0
+        self._usage_lock = threading.Lock()
+        self.cache = cache
+        self.refresh_cache = refresh_cache
+        self.client = get_openai_client(api_key)
+        self.rate_limiter = OpenAIRateLimiter(requests_per_minute, tokens_per_minute)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def submit(self, content, detailed=False):
+        """
+        Schedule one completion and return a Future.
+        The Future resolves to process_with_gpt's text, or to complete_with_gpt's
+        result dict (text plus token counts) when detailed is True.
+        """
+        return self._pool.submit(self._run, content, detailed)
+
+    def _run(self, content, detailed):
+        outcome = complete_with_gpt(
+            content, self.api_key,
+            client=self.client, rate_limiter=self.rate_limiter,
+            cache=self.cache, refresh_cache=self.refresh_cache,
+            max_input_tokens=self.max_input_tokens
+        )
+        with self._usage_lock:
+            self.prompt_tokens += outcome["prompt_tokens"]
+            self.completion_tokens += outcome["completion_tokens"]
+            self.cached_prompt_tokens += outcome["cached_prompt_tokens"]
+        return outcome if detailed else outcome["text"]
+
+    def map(self, contents):
+        """Process many contents concurrently and return the results in input order"""
+        futures = [self.submit(content) for content in contents]
+        results = []
+        for i, future in enumerate(futures, 1):
+            results.append(future.result())
+            if i % 50 == 0 or i == len(futures):
+                logging.info(f"GPT processed {i}/{len(futures)} rows")
+        return results
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        logging.info(
+            f"GPT token usage: {self.prompt_tokens} prompt ({self.cached_prompt_tokens} cached), "
+            f"{self.completion_tokens} completion"
+        )
+        if self.cache is not None:
+            stats = self.cache.stats()
+            logging.info(f"LLM result cache: {stats['hits']} hits, {stats['misses']} misses")
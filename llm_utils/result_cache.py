@@ -0,0 +1,93 @@
+import hashlib
+import json
+import threading
+import time
+from utils.sqlite import open_sqlite
+
+DEFAULT_CACHE_PATH = ".cache/llm_results.sqlite"
+DEFAULT_MAX_ENTRIES = 100000
+
+
+def cache_key(request):
+    """
+    Content address of a chat completions request.
+    Hashes the full messages (prompt and system message), model, temperature
+    and max_tokens, so any change to what would be sent produces a new key.
+    """
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResultCache:
+    """
+    Persistent SQLite-backed cache of GPT results keyed by cache_key().
+
+    Holds at most `max_entries` results, evicting the least recently used.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = open_sqlite(path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def get(self, key):
+        """Return the cached result for a key, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, result):
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM results WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, result, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, result, now, now)
+            )
+            if not exists:
+                self._count += 1
+            if self._count > self.max_entries:
+                excess = self._count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM results WHERE key IN "
+                    "(SELECT key FROM results ORDER BY last_access LIMIT ?)",
+                    (excess,)
+                )
+                self._count -= excess
+                self.evictions += excess
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": self._count
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,99 +1,361 @@
-from data.google_sheet_parser import get_sheet_data, setup_google_sheets_service, update_sheet_values
-from llm_utils.gpt_connector import process_with_gpt
-from utils.helpers import process_url
-from linkedin_utils.linkedin_parser import setup_driver, login_to_linkedin, check_connection_status, validate_profile, send_connection_request
-from linkedin_utils.linkedin_sheet_parser import get_linkedin_profiles, update_linkedin_status
+"""
+Command line entry point.
+
+    python main.py [--config config.json] scrape      # Phase 1: scrape websites into the scraped column
+    python main.py generate [--batch]                 # Phase 2: GPT emails from the scraped column
+    python main.py pipeline                           # Scrape, generate and write row by row
+    python main.py linkedin                           # Send LinkedIn connection requests
+    python main.py import                             # Copy names and websites from the sheet into local storage
+    python main.py export [--csv PATH] [--sheet]      # Write the output column to a CSV file and/or the sheet
+    python main.py queue enqueue|work|collect|status  # Split a run across workers through a lease-based queue
+
+Spreadsheet IDs, columns, the credentials path, the storage backend and tuning
+knobs come from the config file. Each subcommand imports only the modules it needs.
+"""
+import argparse
+import importlib
 import logging
-import sys
 import os
 import random
+import sys
 import time
-from dotenv import load_dotenv
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('scraper.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
-load_dotenv()
-
-def website_to_llm():
-    credentials_file = "data/url-to-email-445616-cebe4868914f.json"
-    spreadsheet_id = "1gySRQsDX4J-v7QBM4YiCymU7EEyEj8BmKaVpOVsFXiY"
-    urls_range = "Sheet1!F:F"
-    openai_api_key = os.getenv('OPENAI_API_KEY')
+from utils import metrics
+from utils.config import load_config, require, ConfigError, DEFAULT_CONFIG_PATH
+
+# Modules each subcommand needs, imported up front so their load time can be measured.
+# utils.helpers and data.storage are light; the scraper and Google client are listed only where used.
+COMMAND_MODULES = {
+    "scrape": ("data.storage", "utils.scrape_engine", "scraper.homepage_scraper", "scraper.parse_pool"),
+    "generate": ("data.storage", "llm_utils.llm_executor", "llm_utils.result_cache", "utils.helpers"),
+    "generate_batch": ("data.storage", "llm_utils.batch_runner", "llm_utils.result_cache", "utils.helpers"),
+    "pipeline": ("data.storage", "utils.pipeline", "utils.checkpoint", "llm_utils.result_cache",
+                 "scraper.homepage_scraper", "scraper.parse_pool"),
+    "linkedin": ("data.google_sheet_parser", "linkedin_utils.linkedin_parser", "linkedin_utils.linkedin_sheet_parser"),
+    "import": ("data.storage", "data.google_sheet_parser"),
+    "export": ("data.storage", "data.google_sheet_parser", "data.sheet_writer"),
+    "queue": ("data.storage", "utils.work_queue"),
+    "queue_work": ("utils.work_queue", "utils.helpers", "llm_utils.gpt_connector", "llm_utils.llm_executor",
+                   "llm_utils.result_cache", "scraper.homepage_scraper", "scraper.parse_pool"),
+}
+
+
+def setup_logging(log_file, level="INFO"):
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    logging.basicConfig(
+        level=getattr(logging, str(level).upper(), logging.INFO),
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=handlers
+    )
+
+
+def load_command_modules(command):
+    """Import the modules a subcommand needs and record how long that took"""
+    started = time.perf_counter()
+    for module in COMMAND_MODULES[command]:
+        importlib.import_module(module)
+    elapsed = time.perf_counter() - started
+    metrics.observe("startup_import_seconds", elapsed, "Time to import a subcommand's modules", command=command)
+    logging.info(f"Loaded {command} modules in {elapsed * 1000:.0f} ms")
+
+
+def report_metrics(summary_path=None):
+    """Log the run's metrics summary and also write it to `summary_path` (or $METRICS_SUMMARY_PATH)"""
+    metrics.log_summary()
+    path = summary_path or os.getenv('METRICS_SUMMARY_PATH')
+    if path:
+        metrics.write_summary(path)
+
+
+def open_sheet(config):
+    """Google Sheets storage for the configured spreadsheet"""
+    from data.google_sheet_parser import setup_google_sheets_service
+    from data.storage import SheetsStorage
+    service = setup_google_sheets_service(require(config, "credentials_file"))
+    return SheetsStorage(service, require(config, "spreadsheet_id"), sheet_name=config["sheet_name"],
+                         read_window=config["sheets"]["read_window"])
+
+
+def open_storage(config):
+    """Storage for campaign rows: the Google Sheet, or a local SQLite file when storage.backend is sqlite"""
+    from data.storage import SQLiteStorage
+    settings = config["storage"]
+    if settings["backend"] == "sheets":
+        return open_sheet(config)
+    if settings["backend"] == "sqlite":
+        return SQLiteStorage(settings["path"], sheet_name=config["sheet_name"],
+                             read_window=config["sheets"]["read_window"])
+    raise ConfigError(f"Unknown storage backend: {settings['backend']}")
+
+
+def read_rows(config, storage, *columns):
+    """Stream (row_number, values) records of the configured columns, e.g. read_rows(config, storage, "name", "url")"""
+    return storage.iter_rows([config["columns"][column] for column in columns])
+
+
+def cell_range(config, column, row):
+    letter = config["columns"][column]
+    return f"{config['sheet_name']}!{letter}{row}:{letter}{row}"
+
+
+def configure_scraper(config):
+    """Apply the scraper settings to the shared fetch layer and parse pool before scraping starts"""
+    from scraper.dns_cache import configure_host_health
+    from scraper.http_client import configure_fetch, configure_response_cache
+    from scraper.parse_pool import configure_parse_pool
+    from scraper.politeness import configure_politeness
+    settings = config["scraper"]
+    configure_parse_pool(settings["parse_workers"])
+    configure_fetch(max_bytes=settings["fetch"]["max_bytes"], connect_timeout=settings["fetch"]["connect_timeout"])
+    politeness = settings["politeness"]
+    configure_politeness(min_interval=politeness["min_interval"], robots_ttl=politeness["robots_ttl"],
+                         enabled=politeness["enabled"])
+    health = settings["host_health"]
+    configure_host_health(ttl=health["ttl"], path=health["path"] or None, enabled=health["enabled"])
+    cache = settings["response_cache"]
+    configure_response_cache(path=cache["path"], ttl=cache["ttl"], max_bytes=cache["max_bytes"],
+                             enabled=cache["enabled"])
+
 
+def collect_gpt_rows(rows, writer, config):
+    """
+    Pick the rows of (name, scraped content) that should go to GPT.
+    Rows with an invalid URL get "No valid content to analyze" queued on the writer; rows
+    whose scrape failed are left empty so the next scrape can fill them.
+    Args:
+        rows (iterable): SheetRow records of the name and scraped columns
+    Returns:
+        list: (row_number, combined_content) pairs
+    """
+    from utils.helpers import build_gpt_input
+    pending = []
+    for current_row, (name, scraped) in rows:
+        try:
+            status, combined_content = build_gpt_input(name, scraped)
+            if status == "no_content":
+                logging.info(f"Skipping row {current_row} due to 'No content found'")
+            elif status == "error":
+                logging.warning(f"Skipping row {current_row}: its scrape failed, run scrape again to retry it")
+            elif status == "invalid":
+                logging.warning(f"Skipping GPT processing for row {current_row} due to invalid content")
+                writer.update(cell_range(config, "output", current_row), [["No valid content to analyze"]])
+            else:
+                pending.append((current_row, combined_content))
+        except Exception as e:
+            logging.error(f"Error preparing row {current_row} for GPT: {str(e)}")
+    return pending
+
+
+def scrape_websites(config):
+    """Phase 1: scrape every row's website and write the content to the scraped column"""
+    from utils.scrape_engine import process_urls
+    settings = config["scraper"]
+
+    storage = open_storage(config)
     try:
-        service = setup_google_sheets_service(credentials_file)
-        logging.info("Fetching data from Google Sheets...")
-        urls_df = get_sheet_data(spreadsheet_id, urls_range, credentials_file)
-        if urls_df.empty:
+        rows = list(read_rows(config, storage, "url"))
+        if not rows:
             logging.warning("No data found in the spreadsheet.")
             return
-
-        # PHASE 1: Scrape URLs and write content immediately
+        configure_scraper(config)
         logging.info("Phase 1: Starting URL scraping...")
-        # total_urls = len(urls_df['Website'])
-        # for idx, url in enumerate(urls_df['Website'], 1):
-        #     try:
-        #         logging.info(f"Scraping URL {idx}/{total_urls}: {url}")
-        #         content_result = process_url(url)
-        #         content_to_write = [[str(content_result) if content_result is not None else ""]]
-        #         update_sheet_values(service, spreadsheet_id, f"Sheet1!K{idx+1}:K{idx+1}", content_to_write)
-        #         logging.info(f"Successfully scraped and stored content for URL {idx}")
-        #     except Exception as e:
-        #         error_message = f"Error: {str(e)}"
-        #         logging.error(f"Error scraping URL at row {idx+1}: {error_message}")
-        #         update_sheet_values(service, spreadsheet_id, f"Sheet1!K{idx+1}", [[error_message]])
+        scraped = process_urls([url for _, (url,) in rows], concurrency=settings["concurrency"],
+                               per_host=settings["per_host"], dedupe=settings["dedupe"])
+        with storage.writer() as writer:
+            for (current_row, _), content_result in zip(rows, scraped):
+                content_to_write = [[str(content_result) if content_result is not None else ""]]
+                writer.update(cell_range(config, "scraped", current_row), content_to_write)
+        if writer.failures:
+            logging.warning(f"{len(writer.failures)} scraped results could not be written: {', '.join(writer.failures)}")
         logging.info("Phase 1 completed: All URLs scraped and content stored.")
+    except Exception as e:
+        logging.error(f"Scraping failed: {str(e)}")
+        raise
+    finally:
+        storage.close()
+
+
+def website_to_llm(config, use_llm_cache=True, refresh_llm_cache=False):
+    """Phase 2: generate GPT emails from the scraped column and write them to the output column"""
+    from llm_utils.llm_executor import LLMExecutor
+    from llm_utils.result_cache import LLMResultCache
+    openai_api_key = os.getenv('OPENAI_API_KEY')
+    settings = config["llm"]
 
-        # PHASE 2: Process with GPT
+    storage = open_storage(config)
+    try:
         logging.info("Phase 2: Starting GPT processing...")
-        data_a = get_sheet_data(spreadsheet_id, "Sheet1!A1:A", credentials_file)
-        data_j = get_sheet_data(spreadsheet_id, "Sheet1!K1:K", credentials_file)
-        for i in range(len(data_a.values)):
-            try:
-                current_row = i + 2
-                content_a = data_a.values[i][0] if data_a.values[i] else "No content"
-                content_j = data_j.values[i][0] if data_j.values[i] else "No content"
-                if isinstance(content_j, list):
-                    if any("No content found" in str(item) for item in content_j):
-                        logging.info(f"Skipping row {current_row} due to 'No content found'")
-                        continue
-                elif "No content found" in str(content_j):
-                    logging.info(f"Skipping row {current_row} due to 'No content found'")
-                    continue
-                if (content_j and not content_j.startswith("Error")):
-                    logging.info(f"Processing content with GPT for row {current_row}")
-                    combined_content = f"Person Name: {content_a}\n\nWebsite Content: {content_j}"
-                    gpt_result = process_with_gpt(combined_content, openai_api_key)
-                    update_sheet_values(service, spreadsheet_id, f"Sheet1!N{current_row}:N{current_row}", [[str(gpt_result)]])
-                    logging.info(f"Successfully processed and stored GPT result for row {current_row}")
-                else:
-                    logging.warning(f"Skipping GPT processing for row {current_row} due to invalid content")
-                    update_sheet_values(service, spreadsheet_id, f"Sheet1!N{current_row}:N{current_row}", [["No valid content to analyze"]])
-            except Exception as e:
-                error_message = f"GPT Error: {str(e)}"
-                logging.error(f"Error in GPT processing for row {current_row}: {error_message}")
-                # update_sheet_values(service, spreadsheet_id, f"Sheet1!L{current_row}:L{current_row}", [[error_message]])
+        # Output column writes are buffered and sent in batches
+        with storage.writer() as writer:
+            # Names and scraped content stream in row-aligned windows
+            pending = collect_gpt_rows(read_rows(config, storage, "name", "scraped"), writer, config)
+
+            # GPT calls run concurrently under the account's RPM/TPM limits
+            logging.info(f"Processing {len(pending)} rows with GPT")
+            llm_cache = LLMResultCache() if use_llm_cache else None
+            with LLMExecutor(openai_api_key, max_workers=settings["workers"],
+                             requests_per_minute=settings["requests_per_minute"],
+                             tokens_per_minute=settings["tokens_per_minute"],
+                             cache=llm_cache, refresh_cache=refresh_llm_cache) as executor:
+                futures = [(current_row, executor.submit(content, detailed=True)) for current_row, content in pending]
+                for current_row, future in futures:
+                    try:
+                        outcome = future.result()
+                        if str(outcome['text']).startswith("Error"):
+                            # Left empty so the next generate run retries the row
+                            logging.error(f"GPT processing failed for row {current_row}: {outcome['text']}")
+                            continue
+                        writer.update(cell_range(config, "output", current_row), [[str(outcome['text'])]])
+                        logging.info(
+                            f"Successfully processed and queued GPT result for row {current_row} "
+                            f"({outcome['prompt_tokens']} prompt / {outcome['completion_tokens']} completion tokens"
+                            f"{', cached result' if outcome['from_cache'] else ''})"
+                        )
+                    except Exception as e:
+                        error_message = f"GPT Error: {str(e)}"
+                        logging.error(f"Error in GPT processing for row {current_row}: {error_message}")
+        if writer.failures:
+            logging.warning(f"{len(writer.failures)} GPT results could not be written: {', '.join(writer.failures)}")
         logging.info("Phase 2 completed: All content processed with GPT.")
         logging.info("Script completed successfully")
     except Exception as e:
         logging.error(f"Script failed: {str(e)}")
         raise
+    finally:
+        storage.close()
 
 
-def process_linkedin_profiles():
+def website_to_llm_pipeline(config, use_llm_cache=True, refresh_llm_cache=False):
+    """Scrape, generate and write each row as soon as it is ready instead of running two phases"""
+    from llm_utils.result_cache import LLMResultCache
+    from utils.checkpoint import CheckpointStore
+    from utils.pipeline import run_pipeline
+    openai_api_key = os.getenv('OPENAI_API_KEY')
+    settings = config["pipeline"]
+
+    storage = open_storage(config)
+    llm_cache = checkpoint = None
+    try:
+        configure_scraper(config)
+        # Names and websites stream in row-aligned windows while earlier rows are processed
+        pipeline_rows = ((row_number, name, url) for row_number, (name, url) in read_rows(config, storage, "name", "url"))
+        llm_cache = LLMResultCache() if use_llm_cache else None
+        # Completed rows are skipped on restart; SIGINT/SIGTERM drain and checkpoint in-flight rows
+        checkpoint = CheckpointStore(run_key=storage.run_key) if settings["resume"] else None
+        with storage.writer() as writer:
+            run_pipeline(pipeline_rows, openai_api_key, writer,
+                         scrape_workers=settings["scrape_workers"], per_host=config["scraper"]["per_host"],
+                         llm_workers=settings["llm_workers"], write_scraped=settings["write_scraped"],
+                         scraped_column=config["columns"]["scraped"], output_column=config["columns"]["output"],
+                         sheet_name=config["sheet_name"], dedupe=config["scraper"]["dedupe"],
+                         llm_cache=llm_cache, refresh_llm_cache=refresh_llm_cache, checkpoint=checkpoint,
+                         requests_per_minute=config["llm"]["requests_per_minute"],
+                         tokens_per_minute=config["llm"]["tokens_per_minute"])
+        if checkpoint is not None:
+            logging.info(f"Checkpoint state: {checkpoint.summary()}")
+        if writer.failures:
+            logging.warning(f"{len(writer.failures)} results could not be written: {', '.join(writer.failures)}")
+        logging.info("Pipeline completed")
+    except Exception as e:
+        logging.error(f"Pipeline failed: {str(e)}")
+        raise
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        if llm_cache is not None:
+            llm_cache.close()
+        storage.close()
+
+
+def website_to_llm_batch(config, transport=None, use_llm_cache=True, refresh_llm_cache=False):
+    """
+    Phase 2 through the OpenAI Batch API: submit all pending rows as batch jobs and write results to the
+    output column. Rows whose request failed, or whose batch failed or expired, are left empty for a rerun.
+    """
+    from llm_utils.batch_runner import run_batch
+    from llm_utils.result_cache import LLMResultCache
+    openai_api_key = os.getenv('OPENAI_API_KEY')
+
+    storage = open_storage(config)
+    try:
+        with storage.writer() as writer:
+            pending = collect_gpt_rows(read_rows(config, storage, "name", "scraped"), writer, config)
+            logging.info(f"Submitting {len(pending)} rows as a batch job")
+            llm_cache = LLMResultCache() if use_llm_cache else None
+            settings = config["batch"]
+            results = run_batch(pending, openai_api_key, settings["request_path"], transport=transport,
+                                cache=llm_cache, refresh_cache=refresh_llm_cache,
+                                max_requests=settings["max_requests"], max_bytes=settings["max_file_bytes"])
+            for current_row, gpt_result in sorted(results.items()):
+                if str(gpt_result).startswith("Error"):
+                    logging.error(f"GPT processing failed for row {current_row}: {gpt_result}")
+                    continue
+                writer.update(cell_range(config, "output", current_row), [[str(gpt_result)]])
+            missing = len(pending) - len(results)
+            if missing:
+                logging.warning(f"{missing} rows got no batch result and were left for the next run")
+        if writer.failures:
+            logging.warning(f"{len(writer.failures)} GPT results could not be written: {', '.join(writer.failures)}")
+        logging.info("Batch processing completed")
+    except Exception as e:
+        logging.error(f"Batch processing failed: {str(e)}")
+        raise
+    finally:
+        storage.close()
+
+
+def import_rows(config):
+    """Copy the name and website columns from the Google Sheet into the local storage file"""
+    from data.storage import SQLiteStorage
+    columns = [config["columns"]["name"], config["columns"]["url"]]
+    sheet = open_sheet(config)
+    local = SQLiteStorage(config["storage"]["path"], sheet_name=config["sheet_name"])
+    try:
+        batch, count = [], 0
+        for row_number, values in sheet.iter_rows(columns):
+            batch.extend((row_number, column, value) for column, value in zip(columns, values))
+            count += 1
+            if len(batch) >= 10000:
+                local.put_values(batch)
+                batch = []
+        local.put_values(batch)
+        logging.info(f"Imported {count} rows into {config['storage']['path']}")
+    finally:
+        local.close()
+
+
+def export_results(config, csv_path=None, to_sheet=False):
+    """Write the name, website and output columns to a CSV file and/or push the output column to the Google Sheet"""
+    from data.storage import export_csv, sync_to_sheet
+    columns = config["columns"]
+    storage = open_storage(config)
+    try:
+        if csv_path:
+            export_csv(storage, [columns["name"], columns["url"], columns["output"]], csv_path,
+                       header=["name", "url", "email"])
+        if to_sheet:
+            if config["storage"]["backend"] == "sheets":
+                logging.info("Storage is the Google Sheet already, nothing to sync")
+                return
+            sheet = open_sheet(config)
+            with sheet.writer() as writer:
+                sync_to_sheet(storage, writer, [columns["output"]], sheet_name=config["sheet_name"])
+            if writer.failures:
+                logging.warning(f"{len(writer.failures)} ranges could not be synced: {', '.join(writer.failures)}")
+    finally:
+        storage.close()
+
+
+def process_linkedin_profiles(config):
     """Process LinkedIn profiles from the Google Sheet"""
-    credentials_file = "data/url-to-email-445616-cebe4868914f.json"
-    spreadsheet_id = "1D7vcjKF-x05bnr_UBa6LwsyNNl2hdM7K5eFtXOd25ZQ"
+    from data.google_sheet_parser import setup_google_sheets_service
+    from linkedin_utils.linkedin_parser import setup_driver, login_to_linkedin, check_connection_status, send_connection_request
+    from linkedin_utils.linkedin_sheet_parser import get_linkedin_profiles, update_linkedin_status
+    credentials_file = require(config, "credentials_file")
+    spreadsheet_id = require(config, "linkedin", "spreadsheet_id")
     daily_requests_sent = 0
-    MAX_DAILY_REQUESTS = 15
+    MAX_DAILY_REQUESTS = config["linkedin"]["max_daily_requests"]
 
     driver = None
 
@@ -102,29 +364,29 @@ def process_linkedin_profiles():
         driver = setup_driver()
         if not driver:
             raise Exception("Failed to initialize web driver")
-        
+
         # Login to Linkedin
         if not login_to_linkedin(driver, os.getenv('LINKEDIN_EMAIL'), os.getenv('LINKEDIN_PASSWORD')):
             raise Exception("Failed to login to LinkedIn")
 
         # Initialize Google Sheets service
         service = setup_google_sheets_service(credentials_file)
-        
+
         # Get LinkedIn profile data from sheet
         profiles = get_linkedin_profiles(
             service,
             spreadsheet_id
         )
-        
+
         if not profiles:
             logging.warning("No profiles found to process")
-            return  
+            return
 
         for profile in profiles:
             try:
                 # Random delay between profiles
                 sleep_duration = random.uniform(30, 60)
-                print(f"Waiting {sleep_duration:.2f}s before next profile")
+                logging.info(f"Waiting {sleep_duration:.2f}s before next profile")
                 time.sleep(sleep_duration)
 
                 # Check current status
@@ -160,12 +422,218 @@ def process_linkedin_profiles():
             except Exception as e:
                 logging.error(f"Error processing profile {profile['url']}: {str(e)}")
                 update_linkedin_status(service, spreadsheet_id, profile['row_index'], f"Error: {str(e)}")
-        
+
     except Exception as e:
         logging.error(f"LinkedIn profile processing failed: {str(e)}")
-    finally: 
+    finally:
         if driver:
             driver.quit()
 
+
+def open_work_queue(config, run_key):
+    from utils.work_queue import WorkQueue
+    settings = config["queue"]
+    return WorkQueue(settings["path"], run_key=run_key, lease_seconds=settings["lease_seconds"],
+                     max_attempts=settings["max_attempts"])
+
+
+def run_queue_command(config, action, worker=None, use_llm_cache=True, retry_failed=False):
+    """
+    Work-queue mode. The coordinator runs `enqueue` to shard the sheet's rows
+    into leased work items, any number of `work` processes claim and process
+    them, and `collect` writes reported results to the output column.
+    """
+    from utils.work_queue import run_worker, collect_results
+    settings = config["queue"]
+    # Every node must use the same run key; the spreadsheet id is shared by all of them
+    run_key = settings["run_key"] or config["spreadsheet_id"] or "default"
+    work_queue = open_work_queue(config, run_key)
+    try:
+        if action == "enqueue":
+            storage = open_storage(config)
+            try:
+                if retry_failed:
+                    logging.info(f"Requeued {work_queue.requeue_failed()} failed items")
+                rows = ((row_number, name, url) for row_number, (name, url) in read_rows(config, storage, "name", "url"))
+                work_queue.enqueue(rows, shard_size=settings["shard_size"])
+            finally:
+                storage.close()
+        elif action == "work":
+            from llm_utils.result_cache import LLMResultCache
+            configure_scraper(config)
+            run_worker(work_queue, os.getenv('OPENAI_API_KEY'), worker=worker, threads=settings["workers"],
+                       llm_cache=LLMResultCache() if use_llm_cache else None,
+                       requests_per_minute=config["llm"]["requests_per_minute"],
+                       tokens_per_minute=config["llm"]["tokens_per_minute"])
+        elif action == "collect":
+            storage = open_storage(config)
+            try:
+                with storage.writer() as writer:
+                    collect_results(work_queue, writer, output_column=config["columns"]["output"],
+                                    sheet_name=config["sheet_name"])
+                if writer.failures:
+                    logging.warning(f"{len(writer.failures)} results could not be written: {', '.join(writer.failures)}")
+            finally:
+                storage.close()
+        logging.info(f"Work queue state: {work_queue.summary()}")
+    finally:
+        work_queue.close()
+
+
+def add_scraper_options(command):
+    """Options shared by the subcommands that scrape websites"""
+    command.add_argument("--no-response-cache", action="store_true", help="Download every page instead of reusing cached responses")
+    command.add_argument("--connect-timeout", type=float, help="Seconds allowed to connect to a website")
+    command.add_argument("--max-page-bytes", type=int, help="Stop reading a page after this many bytes")
+    command.add_argument("--retry-dead-hosts", action="store_true",
+                         help="Try every website again, ignoring hosts recently found unreachable")
+    command.add_argument("--min-host-interval", type=float,
+                         help="Minimum seconds between requests to one website (robots.txt Crawl-delay can raise it)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Scrape organisation websites and generate outreach emails with GPT")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help=f"JSON config file (default: {DEFAULT_CONFIG_PATH})")
+    parser.add_argument("--log-level", help="Overrides logging.level from the config")
+    parser.add_argument("--log-file", help="Overrides logging.file from the config; pass an empty string to log to stdout only")
+    parser.add_argument("--metrics-port", type=int, help="Serve /metrics (OpenMetrics) on this port during the run")
+    parser.add_argument("--metrics-summary", help="Write the end-of-run metrics summary to this JSON file")
+    parser.add_argument("--storage", choices=["sheets", "sqlite"], help="Overrides storage.backend from the config")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scrape = commands.add_parser("scrape", help="Scrape websites into the scraped column")
+    scrape.add_argument("--concurrency", type=int, help="Concurrent scrapes")
+    scrape.add_argument("--per-host", type=int, help="Concurrent scrapes of one host")
+    scrape.add_argument("--parse-workers", type=int, help="Parse pool processes, 0 parses in the scraper threads")
+    scrape.add_argument("--no-dedupe", action="store_true", help="Scrape repeated sites once per row")
+    add_scraper_options(scrape)
+
+    generate = commands.add_parser("generate", help="Generate GPT emails from the scraped column")
+    generate.add_argument("--batch", action="store_true", help="Use the OpenAI Batch API")
+    generate.add_argument("--workers", type=int, help="Concurrent GPT requests")
+    generate.add_argument("--no-llm-cache", action="store_true", help="Don't read or write the GPT result cache")
+    generate.add_argument("--refresh-llm-cache", action="store_true", help="Ignore cached GPT results but store new ones")
+
+    pipeline = commands.add_parser("pipeline", help="Scrape, generate and write row by row")
+    pipeline.add_argument("--scrape-workers", type=int)
+    pipeline.add_argument("--llm-workers", type=int)
+    pipeline.add_argument("--parse-workers", type=int, help="Parse pool processes, 0 parses in the scraper threads")
+    pipeline.add_argument("--write-scraped", action="store_true", help="Also write scraped content to the scraped column")
+    pipeline.add_argument("--no-resume", action="store_true", help="Ignore and don't record checkpoints")
+    pipeline.add_argument("--no-llm-cache", action="store_true", help="Don't read or write the GPT result cache")
+    pipeline.add_argument("--refresh-llm-cache", action="store_true", help="Ignore cached GPT results but store new ones")
+    add_scraper_options(pipeline)
+
+    commands.add_parser("linkedin", help="Send LinkedIn connection requests from the LinkedIn sheet")
+
+    commands.add_parser("import", help="Copy names and websites from the Google Sheet into the local storage file")
+
+    export = commands.add_parser("export", help="Write results to a CSV file and/or the Google Sheet")
+    export.add_argument("--csv", nargs="?", const="", help="CSV file to write (default: storage.csv_path from the config)")
+    export.add_argument("--sheet", action="store_true", help="Push the output column from local storage to the Google Sheet")
+
+    work_queue = commands.add_parser("queue", help="Split a run across processes and machines with a lease-based queue")
+    work_queue.add_argument("action", choices=["enqueue", "work", "collect", "status"],
+                            help="enqueue rows, work through items, collect results into the output column, or show status")
+    work_queue.add_argument("--worker-id", help="Worker name recorded on leases (default: host-pid)")
+    work_queue.add_argument("--workers", type=int, dest="queue_workers", help="Rows processed concurrently by one worker")
+    work_queue.add_argument("--shard-size", type=int, help="Rows per work item")
+    work_queue.add_argument("--retry-failed", action="store_true", help="With enqueue, give failed items new attempts")
+    work_queue.add_argument("--no-llm-cache", action="store_true", help="Don't read or write the GPT result cache")
+    add_scraper_options(work_queue)
+    return parser
+
+
+def apply_overrides(config, args):
+    """Fold command line options into the config"""
+    overrides = {
+        ("scraper", "concurrency"): getattr(args, "concurrency", None),
+        ("scraper", "per_host"): getattr(args, "per_host", None),
+        ("scraper", "parse_workers"): getattr(args, "parse_workers", None),
+        ("llm", "workers"): getattr(args, "workers", None),
+        ("pipeline", "scrape_workers"): getattr(args, "scrape_workers", None),
+        ("pipeline", "llm_workers"): getattr(args, "llm_workers", None),
+        ("logging", "level"): args.log_level,
+        ("logging", "file"): args.log_file,
+        ("storage", "backend"): args.storage,
+        ("queue", "shard_size"): getattr(args, "shard_size", None),
+        ("queue", "workers"): getattr(args, "queue_workers", None),
+    }
+    for (section, key), value in overrides.items():
+        if value is not None:
+            config[section][key] = value
+    if getattr(args, "no_dedupe", False):
+        config["scraper"]["dedupe"] = False
+    for key, value in (("connect_timeout", getattr(args, "connect_timeout", None)),
+                       ("max_bytes", getattr(args, "max_page_bytes", None))):
+        if value is not None:
+            config["scraper"]["fetch"][key] = value
+    if getattr(args, "min_host_interval", None) is not None:
+        config["scraper"]["politeness"]["min_interval"] = args.min_host_interval
+    if getattr(args, "retry_dead_hosts", False):
+        config["scraper"]["host_health"]["enabled"] = False
+    if getattr(args, "no_response_cache", False):
+        config["scraper"]["response_cache"]["enabled"] = False
+    if getattr(args, "write_scraped", False):
+        config["pipeline"]["write_scraped"] = True
+    if getattr(args, "no_resume", False):
+        config["pipeline"]["resume"] = False
+    return config
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        config = apply_overrides(load_config(args.config), args)
+    except ConfigError as e:
+        sys.exit(str(e))
+    log_file = config["logging"]["file"]
+    if args.command == "linkedin" and args.log_file is None:
+        log_file = config["linkedin"]["log_file"]
+    setup_logging(log_file, config["logging"]["level"])
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    if args.metrics_port is not None:
+        metrics.start_metrics_server(args.metrics_port)
+
+    use_llm_cache = config["llm"]["cache"] and not getattr(args, "no_llm_cache", False)
+    refresh_llm_cache = getattr(args, "refresh_llm_cache", False)
+    try:
+        if args.command == "scrape":
+            load_command_modules("scrape")
+            scrape_websites(config)
+        elif args.command == "generate" and args.batch:
+            load_command_modules("generate_batch")
+            website_to_llm_batch(config, use_llm_cache=use_llm_cache, refresh_llm_cache=refresh_llm_cache)
+        elif args.command == "generate":
+            load_command_modules("generate")
+            website_to_llm(config, use_llm_cache=use_llm_cache, refresh_llm_cache=refresh_llm_cache)
+        elif args.command == "pipeline":
+            load_command_modules("pipeline")
+            website_to_llm_pipeline(config, use_llm_cache=use_llm_cache, refresh_llm_cache=refresh_llm_cache)
+        elif args.command == "linkedin":
+            load_command_modules("linkedin")
+            process_linkedin_profiles(config)
+        elif args.command == "import":
+            load_command_modules("import")
+            import_rows(config)
+        elif args.command == "queue":
+            load_command_modules("queue_work" if args.action == "work" else "queue")
+            run_queue_command(config, args.action, worker=args.worker_id, use_llm_cache=use_llm_cache,
+                              retry_failed=args.retry_failed)
+        elif args.command == "export":
+            load_command_modules("export")
+            # Plain "export" writes the CSV; "--csv" without a path uses the configured one
+            csv_path = (args.csv or config["storage"]["csv_path"]) if args.csv is not None or not args.sheet else None
+            export_results(config, csv_path=csv_path, to_sheet=args.sheet)
+    except ConfigError as e:
+        logging.error(str(e))
+        sys.exit(1)
+    finally:
+        if args.command != "linkedin":
+            report_metrics(args.metrics_summary)
+
+
 if __name__ == "__main__":
-    process_linkedin_profiles()
\ No newline at end of file
+    main()
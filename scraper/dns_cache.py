@@ -0,0 +1,226 @@
+import logging
+import socket
+import threading
+import time
+from utils import metrics
+from utils.sqlite import open_sqlite
+
+DEFAULT_DNS_TTL = 5 * 60
+DEFAULT_DNS_NEGATIVE_TTL = 60
+DEFAULT_DEAD_HOST_TTL = 6 * 60 * 60
+DEFAULT_DEAD_HOSTS_PATH = ".cache/dead_hosts.sqlite"
+# Consecutive connect timeouts before a host is treated as dead
+TIMEOUTS_BEFORE_DEAD = 2
+# getaddrinfo errors meaning the name does not exist; EAI_AGAIN and friends are resolver hiccups
+NXDOMAIN_ERRNOS = frozenset(
+    getattr(socket, name) for name in ("EAI_NONAME", "EAI_NODATA", "EAI_ADDRFAMILY") if hasattr(socket, name)
+)
+
+FAILURE_NXDOMAIN = "nxdomain"
+FAILURE_REFUSED = "refused"
+FAILURE_TIMEOUT = "timeout"
+
+_original_getaddrinfo = socket.getaddrinfo
+_install_lock = threading.Lock()
+_resolver = None
+_health = None
+_health_lock = threading.Lock()
+_health_enabled = True
+_health_settings = {"ttl": DEFAULT_DEAD_HOST_TTL, "path": DEFAULT_DEAD_HOSTS_PATH}
+
+
+class CachingResolver:
+    """
+    TTL cache in front of socket.getaddrinfo, shared by every thread in the process.
+    Lookups that found no such name (NXDOMAIN_ERRNOS) are cached for
+    `negative_ttl` seconds and re-raised without touching the network. Temporary
+    resolver failures such as EAI_AGAIN are not cached, so the next lookup retries.
+    """
+
+    def __init__(self, ttl=DEFAULT_DNS_TTL, negative_ttl=DEFAULT_DNS_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                result = entry[1]
+            else:
+                result = None
+                self.misses += 1
+        if result is not None:
+            if isinstance(result, socket.gaierror):
+                metrics.inc("dns_lookups", result="negative_hit")
+                raise result
+            metrics.inc("dns_lookups", result="hit")
+            return list(result)
+        try:
+            with metrics.timed("dns_lookup_seconds", "Uncached getaddrinfo time"):
+                result = _original_getaddrinfo(host, port, family, type, proto, flags)
+        except socket.gaierror as e:
+            metrics.inc("dns_lookups", result="failed")
+            if e.errno in NXDOMAIN_ERRNOS:
+                with self._lock:
+                    self._entries[key] = (now + self.negative_ttl, e)
+            raise
+        metrics.inc("dns_lookups", result="miss")
+        with self._lock:
+            self._entries[key] = (now + self.ttl, result)
+        return list(result)
+
+
+def install_dns_cache(ttl=DEFAULT_DNS_TTL, negative_ttl=DEFAULT_DNS_NEGATIVE_TTL):
+    """Route socket.getaddrinfo through a process-wide CachingResolver. Safe to call repeatedly."""
+    global _resolver
+    with _install_lock:
+        if _resolver is None:
+            _resolver = CachingResolver(ttl=ttl, negative_ttl=negative_ttl)
+            socket.getaddrinfo = _resolver.getaddrinfo
+        return _resolver
+
+
+def uninstall_dns_cache():
+    global _resolver
+    with _install_lock:
+        socket.getaddrinfo = _original_getaddrinfo
+        _resolver = None
+
+
+class HostUnavailable(Exception):
+    """Raised for hosts recently found dead, without making a request"""
+
+
+class HostHealth:
+    """
+    Negative cache of unreachable hosts.
+
+    NXDOMAIN and refused connections mark a host dead at once; connect timeouts
+    do so after TIMEOUTS_BEFORE_DEAD in a row. Dead hosts fail fast for `ttl` seconds.
+    With a `path`, dead hosts are also kept in SQLite so re-runs skip them too.
+    """
+
+    def __init__(self, ttl=DEFAULT_DEAD_HOST_TTL, path=DEFAULT_DEAD_HOSTS_PATH):
+        self.ttl = ttl
+        self.path = path
+        self.fast_failures = 0
+        self._dead = {}
+        self._timeouts = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = open_sqlite(path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS dead_hosts ("
+                "host TEXT PRIMARY KEY, reason TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute("DELETE FROM dead_hosts WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+            for host, reason, expires_at in self._conn.execute("SELECT host, reason, expires_at FROM dead_hosts"):
+                self._dead[host] = (expires_at, reason)
+
+    def check(self, host):
+        """Raise HostUnavailable if the host was recently found dead"""
+        with self._lock:
+            entry = self._dead.get(host)
+            if entry is None:
+                return
+            expires_at, reason = entry
+            if expires_at <= time.time():
+                del self._dead[host]
+                return
+            self.fast_failures += 1
+        raise HostUnavailable(f"{host} is unreachable ({reason}), skipping")
+
+    def record_success(self, host):
+        with self._lock:
+            self._timeouts.pop(host, None)
+
+    def record_failure(self, host, kind):
+        with self._lock:
+            if kind == FAILURE_TIMEOUT:
+                self._timeouts[host] = self._timeouts.get(host, 0) + 1
+                if self._timeouts[host] < TIMEOUTS_BEFORE_DEAD:
+                    return
+            self._timeouts.pop(host, None)
+            expires_at = time.time() + self.ttl
+            self._dead[host] = (expires_at, kind)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO dead_hosts (host, reason, expires_at) VALUES (?, ?, ?)",
+                    (host, kind, expires_at)
+                )
+                self._conn.commit()
+        logging.info(f"Marking {host} as unreachable ({kind}) for {self.ttl}s")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def classify_failure(error):
+    """
+    Map a connection error to FAILURE_NXDOMAIN, FAILURE_REFUSED or FAILURE_TIMEOUT.
+    Only connect-phase failures count: names that don't exist, refused
+    connections and connect timeouts. Returns None for errors that say nothing
+    about the host being down, such as read or pool timeouts and temporary
+    resolver failures (EAI_AGAIN).
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, socket.gaierror):
+            return FAILURE_NXDOMAIN if error.errno in NXDOMAIN_ERRNOS else None
+        if isinstance(error, ConnectionRefusedError):
+            return FAILURE_REFUSED
+        name = type(error).__name__
+        if name == "ConnectTimeout":
+            return FAILURE_TIMEOUT
+        if name in ("ReadTimeout", "WriteTimeout", "PoolTimeout"):
+            # The host answered, or our own connection pool was exhausted
+            return None
+        message = str(error).lower()
+        if "temporary failure in name resolution" in message:
+            return None
+        if "name or service not known" in message or "nodename nor servname" in message \
+                or "no address associated" in message:
+            return FAILURE_NXDOMAIN
+        if "connection refused" in message:
+            return FAILURE_REFUSED
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def configure_host_health(ttl=DEFAULT_DEAD_HOST_TTL, path=DEFAULT_DEAD_HOSTS_PATH, enabled=True):
+    """
+    Configure the shared HostHealth negative cache used by fetch().
+    Args:
+        ttl (float): Seconds a dead host is skipped
+        path (str): SQLite file that keeps dead hosts between runs, or None for memory only
+        enabled (bool): Set to False to always try every host
+    """
+    global _health, _health_enabled
+    with _health_lock:
+        if _health is not None:
+            _health.close()
+            _health = None
+        _health_enabled = enabled
+        _health_settings.update(ttl=ttl, path=path)
+
+
+def get_host_health():
+    """Return the shared HostHealth, or None if the negative cache is disabled"""
+    global _health
+    with _health_lock:
+        if _health is None and _health_enabled:
+            _health = HostHealth(**_health_settings)
+        return _health
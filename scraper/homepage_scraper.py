@@ -1,19 +1,160 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urljoin, urlparse
+from scraper.http_client import fetch, DEFAULT_TIMEOUT, HTML_CONTENT_TYPES, XML_CONTENT_TYPES
+from scraper.parse_pool import parse_fetched
+from utils.resilience import remaining
 
-def get_about_us_link(homepage_url):
+# Words that mark an About page, with how strongly they do
+ABOUT_KEYWORDS = {
+    "about": 10,
+    "who-we-are": 10,
+    "who we are": 10,
+    "our-story": 9,
+    "our story": 9,
+    "mission": 8,
+    "our-work": 4,
+    "history": 3,
+    "team": 2,
+}
+# Words in a link's text or path segments that mark it as something other than the About page.
+# Matched as whole words, so /newsletter or /impressum don't count as news or press.
+EXCLUDED_LINK_WORDS = frozenset({"cookie", "cookies", "privacy", "terms", "blog", "blogs", "news", "press", "login",
+                                 "signin", "cart", "feed"})
+WORD_RE = re.compile(r"[a-z0-9]+")
+DEFAULT_CANDIDATES = 3
+DEFAULT_TIME_BUDGET = 15
+CANDIDATE_FETCH_WORKERS = 32
+SITEMAP_LOC_RE = re.compile(r"<loc>\s*([^<]+?)\s*</loc>", re.IGNORECASE)
+
+_candidate_pool = None
+_candidate_pool_lock = threading.Lock()
+
+
+def _site_host(url):
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def score_about_link(text, href):
+    """
+    Score how likely a link leads to the organisation's About page.
+    Returns 0 for links that are clearly something else (cookies, blog posts, ...).
+    """
+    haystack = f"{text} {urlparse(href).path}".lower().replace("_", "-")
+    if not EXCLUDED_LINK_WORDS.isdisjoint(WORD_RE.findall(haystack)):
+        return 0
+    score = sum(weight for keyword, weight in ABOUT_KEYWORDS.items() if keyword in haystack)
+    if score:
+        # Short, shallow paths like /about are better than /blog/2021/about-our-gala
+        depth = len([part for part in urlparse(href).path.split("/") if part])
+        score -= max(depth - 1, 0) * 2
+    return max(score, 0)
+
+
+def rank_about_candidates(links, homepage_url, limit=DEFAULT_CANDIDATES):
+    """
+    Rank same-site (text, href) links by score_about_link.
+    Returns:
+        list: Up to `limit` absolute URLs, best first
+    """
+    site = _site_host(homepage_url)
+    scored = {}
+    for position, (text, href) in enumerate(links):
+        url = urljoin(homepage_url, href).split("#")[0]
+        if urlparse(url).scheme not in ("http", "https") or _site_host(url) != site:
+            continue
+        if url.rstrip("/") == homepage_url.rstrip("/"):
+            continue
+        score = score_about_link(text, href)
+        if score and (url not in scored or scored[url][0] < score):
+            scored[url] = (score, -position)
+    ranked = sorted(scored, key=lambda url: scored[url], reverse=True)
+    return ranked[:limit]
+
+
+def sitemap_candidates(homepage_url, limit=DEFAULT_CANDIDATES, timeout=DEFAULT_TIMEOUT, deadline=None):
+    """Probe /sitemap.xml for About-like URLs on the same site"""
     try:
-        response = requests.get(homepage_url, timeout=10)
-        response.raise_for_status()
+        page = fetch(urljoin(homepage_url, "/sitemap.xml"), timeout=timeout,
+                     content_types=HTML_CONTENT_TYPES + XML_CONTENT_TYPES, deadline=deadline)
+    except Exception as e:
+        logging.debug(f"No usable sitemap for {homepage_url}: {e}")
+        return []
+    locations = SITEMAP_LOC_RE.findall(page.text)
+    return rank_about_candidates([("", location.strip()) for location in locations], homepage_url, limit)
 
-        soup = BeautifulSoup(response.text, 'html.parser')
 
-        # Look for an "About Us" link
-        for a_tag in soup.find_all('a', href=True):
-            if "about" in a_tag.text.lower() or "about" in a_tag['href'].lower():
-                return urljoin(homepage_url, a_tag['href'])
-        return None
+def _get_candidate_pool():
+    global _candidate_pool
+    with _candidate_pool_lock:
+        if _candidate_pool is None:
+            _candidate_pool = ThreadPoolExecutor(max_workers=CANDIDATE_FETCH_WORKERS, thread_name_prefix="about")
+        return _candidate_pool
+
+
+def _fetch_paragraphs(url, deadline):
+    # Candidates that only get a pool thread after the budget ran out raise DeadlineExceeded here
+    page = fetch(url, timeout=remaining(deadline, DEFAULT_TIMEOUT), deadline=deadline)
+    return parse_fetched(page, links=False).text
+
+
+def discover_about_content(homepage_url, candidates=DEFAULT_CANDIDATES, time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Find the best About page of a site and return its text.
+
+    The homepage is fetched once. Its same-site links are ranked by About-like
+    words ("about", "mission", "who-we-are", "our-story", ...), and /sitemap.xml
+    is probed when the homepage has none. The top `candidates` pages are then
+    fetched concurrently within `time_budget` seconds for the whole site, and the
+    page with the most paragraph text wins.
+    Args:
+        homepage_url (str): URL of the homepage
+        candidates (int): How many candidate pages to fetch
+        time_budget (float): Seconds allowed for the whole site
+    Returns:
+        tuple: (about_link, about_content, homepage_content), each possibly None
+    """
+    deadline = time.monotonic() + time_budget
+    try:
+        page = fetch(homepage_url, timeout=min(DEFAULT_TIMEOUT, time_budget), deadline=deadline)
+        parsed = parse_fetched(page)
     except Exception as e:
-        print(f"Error scraping homepage {homepage_url}: {e}")
-        return None
+        logging.error(f"Error scraping homepage {homepage_url}: {e}")
+        return None, None, None
+    homepage_content = parsed.text
+
+    ranked = rank_about_candidates(parsed.links, homepage_url, candidates)
+    if not ranked and time.monotonic() < deadline:
+        ranked = sitemap_candidates(homepage_url, candidates, timeout=max(deadline - time.monotonic(), 0.1),
+                                    deadline=deadline)
+    if not ranked:
+        return None, None, homepage_content
+
+    pool = _get_candidate_pool()
+    futures = {
+        pool.submit(_fetch_paragraphs, url, deadline): url
+        for url in ranked
+    }
+    done, not_done = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+    for future in not_done:
+        future.cancel()
+
+    best_link, best_content, best_key = None, None, None
+    for future in done:
+        url = futures[future]
+        try:
+            content = future.result()
+        except Exception as e:
+            logging.debug(f"Candidate About page {url} failed: {e}")
+            continue
+        if not content or content == homepage_content:
+            continue
+        # More text wins; on a tie the higher ranked candidate wins
+        key = (len(content), -ranked.index(url))
+        if best_key is None or key > best_key:
+            best_link, best_content, best_key = url, content, key
+    return best_link, best_content, homepage_content
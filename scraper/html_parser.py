@@ -0,0 +1,126 @@
+import logging
+import re
+from bs4 import BeautifulSoup
+from utils import metrics
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# Elements whose text is code or fallback markup, never page copy
+NON_TEXT_TAGS = ("script", "style", "noscript")
+# A <p> inside <noscript> closes an open <p> around it, and the HTML5 tree builder then closes the
+# <noscript> too, leaving the fallback text outside it. Such blocks are cut from the markup first.
+NOSCRIPT_RE = re.compile(r"<noscript\b.*?</noscript\s*>", re.IGNORECASE | re.DOTALL)
+
+
+def available_backends():
+    """
+    Return the parser backends usable in this environment, fastest first.
+    The first one is used unless set_backend() picks another.
+    """
+    available = []
+    if LexborHTMLParser is not None:
+        available.append("selectolax")
+    if lxml is not None:
+        available.append("lxml")
+    available.append("html.parser")
+    return available
+
+
+_backend = available_backends()[0]
+
+
+def get_backend():
+    return _backend
+
+
+def set_backend(name):
+    """Select the parser backend used by parse_page()"""
+    global _backend
+    if name not in available_backends():
+        raise ValueError(f"HTML parser backend '{name}' is not available, choose from {available_backends()}")
+    _backend = name
+
+
+class ParsedPage:
+    """
+    The parts of a page the scraper uses.
+    links: (anchor text, href) for every <a href>
+    paragraphs: stripped, non-empty text of every <p>
+    Text inside NON_TEXT_TAGS is left out of both.
+    """
+
+    def __init__(self, links, paragraphs):
+        self.links = links
+        self.paragraphs = paragraphs
+
+
+def _parse_selectolax(html, want_links, want_paragraphs):
+    tree = LexborHTMLParser(NOSCRIPT_RE.sub("", html))
+    tree.strip_tags(list(NON_TEXT_TAGS))
+    links = [(node.text(), node.attributes.get("href") or "") for node in tree.css("a[href]")] if want_links else []
+    paragraphs = [node.text().strip() for node in tree.css("p")] if want_paragraphs else []
+    return links, paragraphs
+
+
+def _parse_lxml(html, want_links, want_paragraphs):
+    # lxml rejects str input that carries an XML encoding declaration, so hand it UTF-8 bytes
+    document = lxml.html.document_fromstring(html.encode("utf-8"), parser=lxml.html.HTMLParser(encoding="utf-8"))
+    for element in list(document.iter(*NON_TEXT_TAGS)):
+        # drop_tree keeps the text that follows the element
+        element.drop_tree()
+    links = [(a.text_content(), a.get("href")) for a in document.iter("a") if a.get("href") is not None] if want_links else []
+    paragraphs = [p.text_content().strip() for p in document.iter("p")] if want_paragraphs else []
+    return links, paragraphs
+
+
+def _parse_html_parser(html, want_links, want_paragraphs):
+    # The whole tree is built: with a SoupStrainer the closing tags of unbuilt elements are lost,
+    # so an unclosed <a> or <p> runs on to the end of the document
+    soup = BeautifulSoup(html, "html.parser")
+    # html.parser already leaves script and style strings out of .text
+    for element in soup.find_all(NON_TEXT_TAGS):
+        element.decompose()
+    links = [(a.text, a["href"]) for a in soup.find_all("a", href=True)] if want_links else []
+    paragraphs = [p.text.strip() for p in soup.find_all("p")] if want_paragraphs else []
+    return links, paragraphs
+
+
+_PARSERS = {
+    "selectolax": _parse_selectolax,
+    "lxml": _parse_lxml,
+    "html.parser": _parse_html_parser,
+}
+
+
+def parse_page(html, links=True, paragraphs=True, backend=None):
+    """
+    Extract links and/or paragraph text from an HTML document.
+    Args:
+        html (str): Document to parse
+        links (bool): Collect <a href> anchors
+        paragraphs (bool): Collect <p> text
+        backend (str): Override the configured backend
+    Returns:
+        ParsedPage: Empty paragraphs are dropped
+    """
+    backend = backend or _backend
+    if not html or not html.strip():
+        return ParsedPage([], [])
+    with metrics.timed("scraper_parse_seconds", "HTML parse and extraction time", backend=backend):
+        try:
+            found_links, found_paragraphs = _PARSERS[backend](html, links, paragraphs)
+        except Exception as e:
+            if backend == "html.parser":
+                raise
+            logging.warning(f"{backend} failed to parse document, falling back to html.parser: {str(e)}")
+            metrics.inc("scraper_parse_fallbacks", backend=backend)
+            found_links, found_paragraphs = _parse_html_parser(html, links, paragraphs)
+    return ParsedPage(found_links, [text for text in found_paragraphs if text])
@@ -0,0 +1,326 @@
+import codecs
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+import httpx
+from scraper.dns_cache import install_dns_cache, get_host_health, classify_failure, FAILURE_TIMEOUT
+from scraper.response_cache import ResponseCache, DEFAULT_CACHE_PATH, DEFAULT_TTL, DEFAULT_MAX_BYTES
+from scraper.politeness import get_scheduler
+from utils import metrics
+from utils.resilience import retry_call, deadline_after, remaining, DeadlineExceeded, SCRAPER_RETRY
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    from charset_normalizer import from_bytes
+except ImportError:
+    from_bytes = None
+
+DEFAULT_TIMEOUT = 10
+# Dead hosts usually fail to connect, so connecting gets far less time than reading
+DEFAULT_CONNECT_TIMEOUT = 3
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+# Bodies are cut off after this many bytes; About/home page text is near the top
+MAX_BODY_BYTES = 2 * 1024 * 1024
+# Only this much of the body is searched for <meta charset> or fed to charset detection
+ENCODING_SNIFF_BYTES = 64 * 1024
+# Responses worth another try; other 4xx/5xx statuses fail at once
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+XML_CONTENT_TYPES = ("application/xml", "text/xml")
+
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_.:-]+)""", re.IGNORECASE)
+
+_client = None
+_client_lock = threading.Lock()
+_cache = None
+_cache_enabled = True
+_cache_settings = {"path": DEFAULT_CACHE_PATH, "ttl": DEFAULT_TTL, "max_bytes": DEFAULT_MAX_BYTES}
+_fetch_settings = {"max_bytes": MAX_BODY_BYTES, "connect_timeout": DEFAULT_CONNECT_TIMEOUT}
+
+
+class UnsupportedContentType(Exception):
+    """Raised when a URL serves something other than HTML (PDF, video, images, ...)"""
+
+
+def _valid_codec(name):
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name.strip().strip("'\"")).name
+    except LookupError:
+        return None
+
+
+def choose_encoding(content_type, content):
+    """
+    Pick the encoding of an HTML body without scanning all of it.
+    Uses the Content-Type charset, then an early <meta charset>, then charset
+    detection over the first ENCODING_SNIFF_BYTES, then UTF-8.
+    """
+    if content_type and "charset=" in content_type.lower():
+        encoding = _valid_codec(content_type.lower().split("charset=", 1)[1].split(";")[0])
+        if encoding:
+            return encoding
+    head = content[:ENCODING_SNIFF_BYTES]
+    match = META_CHARSET_RE.search(head)
+    if match:
+        encoding = _valid_codec(match.group(1).decode("ascii", errors="ignore"))
+        if encoding:
+            return encoding
+    if from_bytes is not None and head:
+        guess = from_bytes(head).best()
+        if guess is not None:
+            return guess.encoding
+    return "utf-8"
+
+
+def is_allowed_content_type(content_type, allowed=HTML_CONTENT_TYPES):
+    """True for the allowed content types, and for a missing header (sniffed later by the parser)"""
+    if not content_type:
+        return True
+    return content_type.split(";")[0].strip().lower() in allowed
+
+
+class FetchedPage:
+    """Body and metadata of a successful fetch"""
+
+    def __init__(self, url, status_code, headers, content, encoding):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+def get_client():
+    """
+    Return the process-wide HTTP client shared by all scraper modules.
+
+    The client keeps connections alive between requests, negotiates HTTP/2 when
+    the h2 package is installed and decodes gzip/deflate (and brotli when the
+    brotli package is installed) transparently. httpx clients are thread-safe,
+    so the same client is used by every scraper worker thread. Creating it also
+    installs the process-wide DNS cache, so each host is resolved once.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            install_dns_cache()
+            _client = httpx.Client(
+                http2=HTTP2_AVAILABLE,
+                follow_redirects=True,
+                timeout=request_timeout(DEFAULT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+                ),
+            )
+        return _client
+
+
+def close_client():
+    """Close the shared HTTP client and its pooled connections"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def request_timeout(timeout):
+    """httpx timeout with the connect phase capped at the configured connect timeout"""
+    return httpx.Timeout(timeout, connect=min(_fetch_settings["connect_timeout"], timeout))
+
+
+def configure_fetch(max_bytes=MAX_BODY_BYTES, connect_timeout=DEFAULT_CONNECT_TIMEOUT):
+    """
+    Configure fetch() limits.
+    Args:
+        max_bytes (int): Stop reading a response body after this many bytes
+        connect_timeout (float): Seconds allowed to connect; the timeout passed to fetch() applies to reads
+    """
+    _fetch_settings.update(max_bytes=max_bytes, connect_timeout=connect_timeout)
+
+
+def configure_response_cache(path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+    """
+    Configure the on-disk response cache used by fetch().
+    Args:
+        path (str): SQLite file holding the cached bodies
+        ttl (float): Seconds an entry is reused before it is revalidated
+        max_bytes (int): Upper bound on stored body bytes before LRU eviction
+        enabled (bool): Set to False to always download
+    """
+    global _cache, _cache_enabled
+    with _client_lock:
+        if _cache is not None:
+            _cache.close()
+            _cache = None
+        _cache_enabled = enabled
+        _cache_settings.update(path=path, ttl=ttl, max_bytes=max_bytes)
+
+
+def get_response_cache():
+    """Return the shared ResponseCache, or None if caching is disabled"""
+    global _cache
+    with _client_lock:
+        if _cache is None and _cache_enabled:
+            _cache = ResponseCache(**_cache_settings)
+        return _cache
+
+
+def cache_stats():
+    """Return the response cache hit/miss counters, or None if caching is disabled"""
+    cache = get_response_cache()
+    return cache.stats() if cache is not None else None
+
+
+def _page_from_cache(entry):
+    return FetchedPage(
+        url=entry.url,
+        status_code=entry.status_code,
+        headers=httpx.Headers(entry.headers),
+        content=entry.content,
+        encoding=entry.encoding
+    )
+
+
+def _read_capped(response, max_bytes, deadline=None):
+    """
+    Read a streamed body, stopping once max_bytes have arrived.
+    Raises:
+        DeadlineExceeded: When the deadline passes before the body is complete
+    """
+    chunks = []
+    received = 0
+    for chunk in response.iter_bytes():
+        chunks.append(chunk)
+        received += len(chunk)
+        if received >= max_bytes:
+            break
+        if deadline is not None and time.monotonic() > deadline:
+            raise DeadlineExceeded(f"Deadline passed while reading {response.url}")
+    return b"".join(chunks)[:max_bytes]
+
+
+def is_transient_fetch_error(error):
+    """
+    Retry transient statuses and dropped or reset connections. Refused
+    connections, DNS failures and timeouts are left to the dead-host cache
+    instead, since retrying them mostly waits on hosts that are gone.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRY_STATUSES
+    return isinstance(error, (httpx.ReadError, httpx.WriteError, httpx.RemoteProtocolError))
+
+
+def fetch(url, timeout=DEFAULT_TIMEOUT, content_types=HTML_CONTENT_TYPES, deadline=None):
+    """
+    Fetch a URL through the shared client and the response cache.
+
+    Fresh cache entries are returned without a request. Stale entries are
+    revalidated with If-None-Match/If-Modified-Since and reused on a 304.
+    Hosts recently found dead (NXDOMAIN, connection refused, repeated timeouts)
+    fail at once. Network requests first pass the politeness scheduler, which
+    enforces robots.txt and per-host pacing. Bodies are streamed: non-HTML content types
+    are rejected before the body is read, and reading stops after the
+    configured byte cap. Transient failures (429/5xx, reset connections) are
+    retried with backoff within SCRAPER_RETRY's attempts and deadline.
+    Args:
+        url (str): URL to fetch
+        timeout (float): Read timeout in seconds; connecting gets at most the configured connect timeout
+        content_types (tuple): Accepted media types, HTML by default
+        deadline (float): time.monotonic() value by which the fetch, retries and body included,
+                          must be done; SCRAPER_RETRY's deadline applies when it is sooner
+    Returns:
+        FetchedPage: The response body and metadata
+    Raises:
+        httpx.HTTPError: On connection errors and 4xx/5xx responses
+        DeadlineExceeded: When the deadline passes before the page is complete
+        UnsupportedContentType: When the response has another content type
+        DisallowedByRobots: When robots.txt disallows the URL
+        HostUnavailable: When the host was recently found dead
+    """
+    cache = get_response_cache()
+    entry = cache.get(url) if cache is not None else None
+    if entry is not None and entry.is_fresh(cache.ttl):
+        cache.record_hit()
+        metrics.inc("scraper_fetches", result="cache_hit")
+        return _page_from_cache(entry)
+
+    host = urlsplit(url).netloc.lower()
+    health = get_host_health()
+    if health is not None:
+        try:
+            health.check(host)
+        except Exception:
+            metrics.inc("scraper_fetches", result="dead_host")
+            raise
+    policy_deadline = deadline_after(SCRAPER_RETRY.deadline)
+    deadline = policy_deadline if deadline is None else min(deadline, policy_deadline)
+    attempt_timeouts = []
+
+    def attempt():
+        attempt_timeouts.append(remaining(deadline, timeout))
+        return _fetch_from_network(url, entry, cache, attempt_timeouts[-1], content_types, deadline)
+
+    try:
+        with metrics.timed("scraper_fetch_seconds", "Network fetch time, including robots.txt and pacing"):
+            # Dead hosts are tracked per host above, so there is no scraper-wide circuit breaker
+            page = retry_call(attempt, "scraper", policy=SCRAPER_RETRY, transient=is_transient_fetch_error,
+                              deadline=deadline, use_breaker=False)
+    except httpx.TransportError as e:
+        failure = classify_failure(e)
+        if failure == FAILURE_TIMEOUT and attempt_timeouts \
+                and attempt_timeouts[-1] < _fetch_settings["connect_timeout"]:
+            # The caller's time budget cut the connect short, which says nothing about the host
+            failure = None
+        metrics.inc("scraper_fetches", result=failure or "transport_error")
+        if health is not None and failure is not None:
+            health.record_failure(host, failure)
+        raise
+    if health is not None:
+        health.record_success(host)
+    return page
+
+
+def _fetch_from_network(url, entry, cache, timeout, content_types, deadline=None):
+    scheduler = get_scheduler()
+    if scheduler is not None:
+        scheduler.check(url, deadline)
+    headers = entry.conditional_headers() if entry is not None else None
+    with get_client().stream("GET", url, headers=headers, timeout=request_timeout(timeout)) as response:
+        if entry is not None and response.status_code == 304:
+            cache.record_revalidation()
+            cache.mark_revalidated(url)
+            metrics.inc("scraper_fetches", result="revalidated")
+            return _page_from_cache(entry)
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "")
+        if not is_allowed_content_type(content_type, content_types):
+            raise UnsupportedContentType(f"{url} is {content_type.split(';')[0]}, expected one of {', '.join(content_types)}")
+        content = _read_capped(response, _fetch_settings["max_bytes"], deadline)
+        metrics.inc("scraper_fetches", result="downloaded")
+        metrics.inc("scraper_downloaded_bytes", len(content), "Body bytes read from the network")
+        page = FetchedPage(
+            url=str(response.url),
+            status_code=response.status_code,
+            headers=response.headers,
+            content=content,
+            encoding=choose_encoding(content_type, content)
+        )
+    if cache is not None:
+        cache.record_miss()
+        cache.put(url, page)
+    return page
@@ -0,0 +1,93 @@
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from scraper.html_parser import parse_page, get_backend
+from utils import metrics
+
+_pool = None
+_pool_lock = threading.Lock()
+_workers = 0
+
+
+class PageExtract:
+    """What the scraper keeps of a parsed page: its links and its joined paragraph text"""
+
+    def __init__(self, links, text):
+        self.links = links
+        self.text = text
+
+
+def extract_page(content, encoding, links=True, paragraphs=True, backend=None):
+    """
+    Decode and parse a raw body, keeping only the small extracted results.
+    Runs in parse pool workers, so it takes bytes and returns plain data.
+    """
+    html = content.decode(encoding or "utf-8", errors="replace")
+    parsed = parse_page(html, links=links, paragraphs=paragraphs, backend=backend)
+    return PageExtract(parsed.links, " ".join(parsed.paragraphs))
+
+
+def _context():
+    # Forking a process that already runs scraper threads is unsafe; start workers from a clean interpreter
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def configure_parse_pool(workers=0):
+    """
+    Configure where HTML is parsed.
+    Args:
+        workers (int): Worker processes for parsing and text extraction; 0 parses in
+                       the calling thread. Use the number of cores to scale parsing
+                       past the GIL once fetching is concurrent.
+    """
+    global _workers
+    shutdown_parse_pool()
+    with _pool_lock:
+        _workers = max(int(workers or 0), 0)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None and _workers:
+            _pool = ProcessPoolExecutor(max_workers=_workers, mp_context=_context())
+        return _pool
+
+
+def shutdown_parse_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown_parse_pool)
+
+
+def parse_fetched(page, links=True, paragraphs=True):
+    """
+    Parse a FetchedPage in the parse pool, or inline when no pool is configured.
+    Only the raw bytes and encoding are sent to the worker, and only the links
+    and paragraph text come back.
+    Returns:
+        PageExtract: links as (text, href) pairs and paragraph text joined by spaces
+    """
+    global _pool
+    backend = get_backend()
+    pool = _get_pool()
+    if pool is None:
+        return extract_page(page.content, page.encoding, links, paragraphs, backend)
+    try:
+        with metrics.timed("scraper_parse_pool_seconds", "Parse time in the process pool, including queueing"):
+            return pool.submit(extract_page, page.content, page.encoding, links, paragraphs, backend).result()
+    except BrokenProcessPool as e:
+        logging.warning(f"Parse pool failed, restarting it and parsing inline: {str(e)}")
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        return extract_page(page.content, page.encoding, links, paragraphs, backend)
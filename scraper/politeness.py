@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+import httpx
+from utils.resilience import remaining, DeadlineExceeded
+
+DEFAULT_MIN_INTERVAL = 0.5
+DEFAULT_ROBOTS_TTL = 60 * 60
+# Crawl-delay values above this are clamped so one host can't stall a worker for minutes
+MAX_CRAWL_DELAY = 10
+# Read timeout for robots.txt; connecting gets at most the configured fetch connect timeout
+ROBOTS_TIMEOUT = 5
+ROBOTS_USER_AGENT = "*"
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+_enabled = True
+_settings = {"min_interval": DEFAULT_MIN_INTERVAL, "robots_ttl": DEFAULT_ROBOTS_TTL}
+
+
+class DisallowedByRobots(Exception):
+    """Raised when robots.txt disallows fetching a URL"""
+
+
+class _HostState:
+    def __init__(self):
+        # Held while a request waits for its turn, which queues requests per host
+        self.turn_lock = threading.Lock()
+        self.robots_lock = threading.Lock()
+        self.next_allowed = 0.0
+        self.robots = None
+        self.robots_loaded_at = None
+
+
+class PolitenessScheduler:
+    """
+    Per-host request pacing in front of the scraper fetch layer.
+
+    Requests to the same host take turns and are spaced by at least
+    `min_interval` seconds, or the host's robots.txt Crawl-delay when larger.
+    robots.txt is fetched once per host and cached for `robots_ttl` seconds.
+    Different hosts never wait on each other, so throughput grows with the
+    number of distinct hosts.
+    """
+
+    def __init__(self, min_interval=DEFAULT_MIN_INTERVAL, robots_ttl=DEFAULT_ROBOTS_TTL, user_agent=ROBOTS_USER_AGENT):
+        self.min_interval = min_interval
+        self.robots_ttl = robots_ttl
+        self.user_agent = user_agent
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+
+    def _state(self, host):
+        with self._hosts_lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _HostState()
+            return state
+
+    def _load_robots(self, scheme, host, deadline=None):
+        """
+        Fetch and parse robots.txt. Like urllib.robotparser, a 401 or 403 disallows
+        the whole site; other missing or unreadable files allow everything.
+        Connection failures are raised so fetch() can record the host as dead.
+        """
+        # Imported here because http_client imports this module
+        from scraper.http_client import get_client, request_timeout
+        parser = RobotFileParser()
+        timeout = request_timeout(remaining(deadline, ROBOTS_TIMEOUT))
+        try:
+            response = get_client().get(f"{scheme}://{host}/robots.txt", timeout=timeout)
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.text.splitlines())
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            raise
+        except Exception as e:
+            logging.debug(f"Could not load robots.txt for {host}: {e}")
+            parser.allow_all = True
+        return parser
+
+    def _robots(self, scheme, host, state, deadline=None):
+        _acquire(state.robots_lock, deadline, f"robots.txt of {host}")
+        try:
+            now = time.monotonic()
+            if state.robots is None or now - state.robots_loaded_at > self.robots_ttl:
+                state.robots = self._load_robots(scheme, host, deadline)
+                state.robots_loaded_at = now
+            return state.robots
+        finally:
+            state.robots_lock.release()
+
+    def check(self, url, deadline=None):
+        """
+        Wait for this host's turn and confirm robots.txt allows the URL.
+        Args:
+            url (str): URL about to be fetched
+            deadline (float): time.monotonic() value by which the request must be made
+        Raises:
+            DisallowedByRobots: When the URL may not be fetched; no request should be made
+            DeadlineExceeded: When the host's next turn comes after the deadline; raised
+                              without waiting for it
+        """
+        parts = urlsplit(url)
+        host = (parts.netloc or "").lower()
+        if not host:
+            return
+        state = self._state(host)
+        robots = self._robots(parts.scheme or "http", host, state, deadline)
+        if not robots.can_fetch(self.user_agent, url):
+            raise DisallowedByRobots(f"robots.txt disallows {url}")
+        crawl_delay = robots.crawl_delay(self.user_agent) or 0
+        interval = max(self.min_interval, min(float(crawl_delay), MAX_CRAWL_DELAY))
+        _acquire(state.turn_lock, deadline, f"a turn on {host}")
+        try:
+            if deadline is not None and state.next_allowed > deadline:
+                raise DeadlineExceeded(f"Next turn on {host} comes after the deadline")
+            wait = state.next_allowed - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            state.next_allowed = time.monotonic() + interval
+        finally:
+            state.turn_lock.release()
+
+
+def _acquire(lock, deadline, what):
+    """Take a per-host lock, giving up with DeadlineExceeded when the deadline passes first"""
+    timeout = -1 if deadline is None else max(deadline - time.monotonic(), 0)
+    if not lock.acquire(timeout=timeout):
+        raise DeadlineExceeded(f"Deadline passed while waiting for {what}")
+
+
+def configure_politeness(min_interval=DEFAULT_MIN_INTERVAL, robots_ttl=DEFAULT_ROBOTS_TTL, enabled=True):
+    """
+    Configure the shared PolitenessScheduler used by fetch().
+    Args:
+        min_interval (float): Minimum seconds between requests to one host
+        robots_ttl (float): Seconds a parsed robots.txt is reused
+        enabled (bool): Set to False to skip robots.txt and pacing entirely
+    """
+    global _scheduler, _enabled
+    with _scheduler_lock:
+        _scheduler = None
+        _enabled = enabled
+        _settings.update(min_interval=min_interval, robots_ttl=robots_ttl)
+
+
+def get_scheduler():
+    """Return the shared PolitenessScheduler, or None if politeness is disabled"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None and _enabled:
+            _scheduler = PolitenessScheduler(**_settings)
+        return _scheduler
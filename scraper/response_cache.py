@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from utils.sqlite import open_sqlite
+
+DEFAULT_CACHE_PATH = ".cache/scraper_responses.sqlite"
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_cache_key(url):
+    """
+    Normalize a URL so equivalent spellings share one cache entry.
+    Lowercases scheme and host, drops default ports and fragments, sorts the
+    query string and uses "/" for an empty path. Path case is preserved.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class CachedResponse:
+    """A stored response body with the validators needed to revalidate it"""
+
+    def __init__(self, url, status_code, headers, content, encoding, etag, last_modified, fetched_at):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def is_fresh(self, ttl):
+        return time.time() - self.fetched_at < ttl
+
+    def conditional_headers(self):
+        """Headers for a conditional request that lets the server answer 304"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    Persistent SQLite-backed cache of scraped response bodies.
+
+    Entries are keyed by normalized URL. Once an entry is older than `ttl` seconds
+    it should be revalidated with a conditional request before it is reused.
+    The total stored body size is kept under `max_bytes` by evicting the least
+    recently used entries. Safe to share between scraper threads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = open_sqlite(path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status_code INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                content BLOB NOT NULL,
+                encoding TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url):
+        """Return the stored CachedResponse for a URL, or None"""
+        key = normalize_cache_key(url)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, status_code, headers, content, encoding, etag, last_modified, fetched_at "
+                "FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return CachedResponse(
+            url=row[0],
+            status_code=row[1],
+            headers=json.loads(row[2]),
+            content=row[3],
+            encoding=row[4],
+            etag=row[5],
+            last_modified=row[6],
+            fetched_at=row[7]
+        )
+
+    def put(self, url, page):
+        """Store a fetched page together with its ETag/Last-Modified validators"""
+        key = normalize_cache_key(url)
+        headers = dict(page.headers)
+        size = len(page.content)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, url, status_code, headers, content, encoding, etag, last_modified, fetched_at, last_access, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, page.url, page.status_code, json.dumps(headers), page.content, page.encoding,
+                 headers.get("etag"), headers.get("last-modified"), now, now, size)
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self.stores += 1
+            self._evict()
+            self._conn.commit()
+
+    def mark_revalidated(self, url):
+        """Restart the TTL of an entry after the server confirmed it with a 304"""
+        key = normalize_cache_key(url)
+        with self._lock:
+            self._conn.execute("UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def record_revalidation(self):
+        with self._lock:
+            self.revalidations += 1
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes. Caller holds the lock."""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.evictions += 1
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "bytes": self._total_bytes
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
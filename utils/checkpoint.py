@@ -0,0 +1,95 @@
+import hashlib
+import threading
+import time
+from utils.sqlite import open_sqlite
+
+DEFAULT_CHECKPOINT_PATH = ".cache/checkpoints.sqlite"
+
+# Pipeline stages in the order a row passes through them
+STAGE_PENDING = "pending"
+STAGE_SCRAPED = "scraped"
+STAGE_GENERATED = "generated"
+STAGE_WRITTEN = "written"
+STAGE_FAILED = "failed"
+
+
+def content_hash(*values):
+    """Hash a row's inputs so a changed row is processed again"""
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(str(value if value is not None else "").encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class CheckpointStore:
+    """
+    Local SQLite record of each row's pipeline progress.
+
+    Every row is stored per run key (usually the spreadsheet id) with its stage,
+    the hash of its inputs and the last error. A restarted run asks
+    should_process() to skip rows already written with unchanged inputs.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path=DEFAULT_CHECKPOINT_PATH, run_key="default"):
+        self.path = path
+        self.run_key = run_key
+        self._lock = threading.Lock()
+        self._conn = open_sqlite(path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS row_state (
+                run_key TEXT NOT NULL,
+                row_number INTEGER NOT NULL,
+                stage TEXT NOT NULL,
+                content_hash TEXT,
+                last_error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (run_key, row_number)
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, row_number):
+        """Return (stage, content_hash, last_error) for a row, or None if it was never seen"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT stage, content_hash, last_error FROM row_state WHERE run_key = ? AND row_number = ?",
+                (self.run_key, row_number)
+            ).fetchone()
+
+    def should_process(self, row_number, row_hash):
+        """True unless the row was already written with the same input hash"""
+        state = self.get(row_number)
+        if state is None:
+            return True
+        stage, stored_hash, _ = state
+        return stage != STAGE_WRITTEN or stored_hash != row_hash
+
+    def mark(self, row_number, stage, row_hash=None, error=None):
+        """Record that a row reached `stage`. The stored hash is kept when row_hash is None."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO row_state (run_key, row_number, stage, content_hash, last_error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (run_key, row_number) DO UPDATE SET "
+                "stage = excluded.stage, "
+                "content_hash = COALESCE(excluded.content_hash, row_state.content_hash), "
+                "last_error = excluded.last_error, "
+                "updated_at = excluded.updated_at",
+                (self.run_key, row_number, stage, row_hash, error, time.time())
+            )
+            self._conn.commit()
+
+    def summary(self):
+        """Return {stage: row count} for this run key"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, COUNT(*) FROM row_state WHERE run_key = ? GROUP BY stage",
+                (self.run_key,)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
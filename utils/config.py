@@ -0,0 +1,84 @@
+import copy
+import json
+import os
+
+DEFAULT_CONFIG_PATH = "config.json"
+
+# Settings used when the config file leaves them out
+DEFAULTS = {
+    "credentials_file": None,
+    "spreadsheet_id": None,
+    "sheet_name": "Sheet1",
+    "columns": {"name": "A", "url": "F", "scraped": "K", "output": "N"},
+    "sheets": {"read_window": 5000},
+    "storage": {"backend": "sheets", "path": "data/campaign.sqlite", "csv_path": "data/output_emails.csv"},
+    "scraper": {
+        "concurrency": 20, "per_host": 2, "parse_workers": 0, "dedupe": True,
+        "fetch": {"max_bytes": 2 * 1024 * 1024, "connect_timeout": 3},
+        "politeness": {"enabled": True, "min_interval": 0.5, "robots_ttl": 60 * 60},
+        # A null path keeps dead hosts in memory for the current run only
+        "host_health": {"enabled": True, "ttl": 6 * 60 * 60, "path": ".cache/dead_hosts.sqlite"},
+        "response_cache": {"enabled": True, "path": ".cache/scraper_responses.sqlite", "ttl": 24 * 60 * 60,
+                           "max_bytes": 512 * 1024 * 1024},
+    },
+    "llm": {"workers": 16, "requests_per_minute": 500, "tokens_per_minute": 200000, "cache": True},
+    "pipeline": {"scrape_workers": 20, "llm_workers": 8, "resume": True, "write_scraped": False},
+    "queue": {"path": ".cache/work_queue.sqlite", "run_key": None, "shard_size": 50, "lease_seconds": 300,
+              "max_attempts": 3, "workers": 8},
+    # Rows past the Batch API's per-file limits go into further request files and batches
+    "batch": {"request_path": "data/batch_requests.jsonl", "max_requests": 50000, "max_file_bytes": 200 * 1000 * 1000},
+    "linkedin": {"spreadsheet_id": None, "max_daily_requests": 15, "log_file": "linkedin_parser.log"},
+    "logging": {"file": "scraper.log", "level": "INFO"},
+}
+
+
+class ConfigError(Exception):
+    """Raised when the config file is missing, malformed or lacks a required setting"""
+
+
+def _merge(base, override):
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+
+def load_config(path=DEFAULT_CONFIG_PATH):
+    """
+    Load a JSON config file on top of DEFAULTS.
+    Args:
+        path (str): Config file, or None for the defaults alone
+    Returns:
+        dict: The merged settings
+    Raises:
+        ConfigError: When the file can't be read or isn't a JSON object
+    """
+    config = copy.deepcopy(DEFAULTS)
+    if path is None:
+        return config
+    if not os.path.exists(path):
+        raise ConfigError(f"Config file not found: {path}")
+    try:
+        with open(path) as f:
+            overrides = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"Could not read config file {path}: {str(e)}")
+    if not isinstance(overrides, dict):
+        raise ConfigError(f"Config file {path} must contain a JSON object")
+    return _merge(config, overrides)
+
+
+def require(config, *keys):
+    """
+    Return a nested setting, e.g. require(config, "linkedin", "spreadsheet_id").
+    Raises:
+        ConfigError: When the setting is missing or empty
+    """
+    value = config
+    for key in keys:
+        value = value.get(key) if isinstance(value, dict) else None
+    if value in (None, ""):
+        raise ConfigError(f"Missing required setting: {'.'.join(keys)}")
+    return value
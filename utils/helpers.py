@@ -1,19 +1,22 @@
-import pandas as pd
 import logging
 import re
-from scraper.homepage_scraper import get_about_us_link 
-from scraper.about_us_scraper import scrape_about_us_content
+from utils import metrics
 
 def normalize_url(url):
-    """Ensure URL has proper protocol"""
-    if pd.isna(url) or not isinstance(url, str):
+    """Ensure URL has proper protocol. Scheme and host are lowercased; path case is kept."""
+    # Empty sheet cells arrive as None or NaN rather than strings
+    if not isinstance(url, str):
         return None
-    url = url.strip().lower()
+    url = url.strip()
     if not url:
         return None
-    # If URL already has a protocol, return it as is
-    if url.startswith(('http://', 'https://')):
-        return url
+    # If URL already has a protocol, only lowercase its scheme and host
+    if url.lower().startswith(('http://', 'https://')):
+        scheme, rest = url.split('://', 1)
+        host, sep, path = rest.partition('/')
+        return f"{scheme.lower()}://{host.lower()}{sep}{path}"
+    host, sep, path = url.partition('/')
+    url = f"{host.lower()}{sep}{path}"
     # Remove www. if present (only if no protocol)
     url = re.sub(r'^www\.', '', url)
     # Add http:// prefix if no protocol present
@@ -21,13 +24,14 @@ def normalize_url(url):
 
 def is_valid_url(url):
     """Check if URL is valid"""
-    if pd.isna(url) or not isinstance(url, str):
+    # Empty sheet cells arrive as None or NaN rather than strings
+    if not isinstance(url, str):
         return False
     url = url.strip()
     if not url:
         return False
     # Accept URLs with protocols
-    if url.startswith(('http://', 'https://')):
+    if url.lower().startswith(('http://', 'https://')):
         return True
     # For URLs without protocol, check basic domain format
     return bool(re.match(r'^[a-zA-Z0-9][-a-zA-Z0-9.]*\.[a-zA-Z]{2,}', url))
@@ -35,6 +39,22 @@ def is_valid_url(url):
 
 def process_url(url):
     """Process single URL with error handling"""
+    with metrics.timed("process_url_seconds", "Time to scrape one row's website"):
+        result = _process_url(url)
+    value = str(result[0])
+    if value == "No content found":
+        outcome = "no_content"
+    elif value.startswith("Invalid URL"):
+        outcome = "invalid"
+    elif value.startswith("Error:"):
+        outcome = "error"
+    else:
+        outcome = "content"
+    metrics.inc("process_url_results", outcome=outcome)
+    return result
+
+
+def _process_url(url):
     try:
         if not is_valid_url(url):
             logging.warning(f"Invalid URL format: {url}")
@@ -47,17 +67,54 @@ def process_url(url):
             logging.info(f"Processing {url}")
         if not normalized_url:
             return ["Invalid URL"]
-        about_link = get_about_us_link(normalized_url)
-        if about_link:
+        # Imported here so commands that only use the URL and GPT input helpers don't load the scraper stack
+        from scraper.homepage_scraper import discover_about_content
+        # The homepage is fetched and parsed once for link discovery and fallback text;
+        # the best of the top-ranked About candidates is fetched concurrently
+        about_link, about_content, homepage_content = discover_about_content(normalized_url)
+        if homepage_content is None:
+            # The homepage fetch failed (timeout, 5xx, unreachable host); worth another try later
+            return ["Error: Homepage could not be fetched"]
+        if about_link and about_content:
             logging.info(f"Found 'About Us' page: {about_link}")
-            about_content = scrape_about_us_content(about_link)
         else:
             logging.info(f"No 'About Us' page found for {normalized_url}. Falling back to homepage content.")
-            about_content = scrape_about_us_content(normalized_url)
+            about_content = homepage_content
         if not about_content:
             logging.warning(f"No content scraped for {normalized_url}")
             return ["No content found"]
         return [about_content]
     except Exception as e:
         logging.error(f"Error processing URL {url}: {str(e)}")
-        return [f"Error: {str(e)}"]
\ No newline at end of file
+        return [f"Error: {str(e)}"]
+
+
+def build_gpt_input(name, scraped):
+    """
+    Decide whether a row's scraped content should go to GPT and build its input.
+    Args:
+        name: Person name from column A
+        scraped: Scraped content, either the process_url result list or the column K text
+    Returns:
+        tuple: (status, content) where status is "ok", "no_content" (nothing scraped, may
+               change on a later run), "error" (the scrape failed, worth retrying) or
+               "invalid" (the URL itself is unusable); content is set only for "ok"
+    """
+    name = name or "No content"
+    scraped = scraped or "No content"
+    if isinstance(scraped, list):
+        if any("No content found" in str(item) for item in scraped):
+            return "no_content", None
+        if any(str(item).startswith("Invalid URL") for item in scraped):
+            return "invalid", None
+        if any(str(item).startswith("Error") for item in scraped):
+            return "error", None
+    elif "No content found" in str(scraped):
+        return "no_content", None
+    elif str(scraped).startswith("Invalid URL"):
+        return "invalid", None
+    elif str(scraped).startswith("Error"):
+        return "error", None
+    # Column K holds str(process_url(...)), so format list results the same way
+    return "ok", f"Person Name: {name}\n\nWebsite Content: {str(scraped)}"
+
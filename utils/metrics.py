@@ -0,0 +1,254 @@
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the duration histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    type_name = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}_total{_format_labels(key)} {value}"
+
+    def summary(self):
+        with self._lock:
+            values = dict(self._values)
+        return {_summary_key(key): value for key, value in sorted(values.items())}
+
+
+class _HistogramSeries:
+    def __init__(self, bucket_count):
+        self.buckets = [0] * bucket_count
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values (durations in seconds by default)"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.bounds = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.bounds) + 1)
+            series.buckets[index] += 1
+            series.count += 1
+            series.sum += value
+
+    def _snapshot(self):
+        with self._lock:
+            return {key: (list(series.buckets), series.count, series.sum) for key, series in self._series.items()}
+
+    def samples(self):
+        for key, (buckets, count, total) in sorted(self._snapshot().items()):
+            cumulative = 0
+            for bound, bucket in zip(self.bounds + (float("inf"),), buckets):
+                cumulative += bucket
+                upper = "+Inf" if bound == float("inf") else repr(float(bound))
+                yield f"{self.name}_bucket{_format_labels(key, [('le', upper)])} {cumulative}"
+            yield f"{self.name}_count{_format_labels(key)} {count}"
+            yield f"{self.name}_sum{_format_labels(key)} {total}"
+
+    def _quantile(self, buckets, count, q):
+        """Upper bound of the bucket holding the q-th observation"""
+        rank = q * count
+        cumulative = 0
+        for bound, bucket in zip(self.bounds, buckets):
+            cumulative += bucket
+            if cumulative >= rank:
+                return bound
+        # Beyond the largest bucket there is no upper bound to report
+        return None
+
+    def summary(self):
+        result = {}
+        for key, (buckets, count, total) in sorted(self._snapshot().items()):
+            if not count:
+                continue
+            result[_summary_key(key)] = {
+                "count": count,
+                "sum": round(total, 6),
+                "mean": round(total / count, 6),
+                "p50": self._quantile(buckets, count, 0.50),
+                "p90": self._quantile(buckets, count, 0.90),
+                "p99": self._quantile(buckets, count, 0.99),
+            }
+        return result
+
+
+def _summary_key(key):
+    return ",".join(f"{name}={value}" for name, value in key) or "all"
+
+
+class MetricsRegistry:
+    """Named counters and histograms shared by the whole process"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.type_name}")
+            return metric
+
+    def counter(self, name, help_text=""):
+        return self._get(Counter, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def render(self):
+        """All metrics in the OpenMetrics text format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            if metric.help_text:
+                lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.extend(metric.samples())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Counters and histogram percentiles as a JSON-friendly dict"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        return {metric.name: metric.summary() for metric in metrics}
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+
+def inc(name, amount=1, help_text="", **labels):
+    """Add to a counter of the shared registry"""
+    REGISTRY.counter(name, help_text).inc(amount, **labels)
+
+
+def observe(name, value, help_text="", **labels):
+    """Record a value in a histogram of the shared registry"""
+    REGISTRY.histogram(name, help_text).observe(value, **labels)
+
+
+@contextmanager
+def timed(name, help_text="", **labels):
+    """
+    Record how long the block takes in the `name` histogram.
+    Failed blocks are recorded too, with an extra outcome="error" label.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        observe(name, time.perf_counter() - started, help_text, outcome="error", **labels)
+        raise
+    observe(name, time.perf_counter() - started, help_text, outcome="ok", **labels)
+
+
+def summary():
+    return REGISTRY.summary()
+
+
+def log_summary():
+    """Log the metrics summary as one JSON line, typically at the end of a run"""
+    logging.info(f"Metrics summary: {json.dumps(summary(), sort_keys=True)}")
+
+
+def write_summary(path):
+    """Write the metrics summary to a JSON file"""
+    with open(path, "w") as f:
+        json.dump(summary(), f, indent=2, sort_keys=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body, content_type = REGISTRY.render().encode("utf-8"), OPENMETRICS_CONTENT_TYPE
+        elif self.path.split("?")[0] == "/summary":
+            body, content_type = json.dumps(summary()).encode("utf-8"), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """
+    Serve /metrics (OpenMetrics) and /summary (JSON) from a daemon thread.
+    Returns:
+        ThreadingHTTPServer: call shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    logging.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,238 @@
+import logging
+import queue
+import signal
+import threading
+from llm_utils.gpt_connector import complete_with_gpt, get_openai_client
+from llm_utils.llm_executor import OpenAIRateLimiter, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE
+from utils.helpers import process_url, build_gpt_input
+from utils.scrape_engine import host_for_url
+from utils.url_index import ScrapeDeduper
+from utils.checkpoint import content_hash, STAGE_SCRAPED, STAGE_GENERATED, STAGE_WRITTEN, STAGE_FAILED
+
+_DONE = object()
+# How often blocked producers re-check the stop flag
+STOP_POLL_INTERVAL = 0.5
+
+
+def install_stop_handlers(stop_event):
+    """
+    Make SIGINT/SIGTERM set stop_event instead of killing the process.
+    Returns the previous handlers so they can be restored. Only has an effect on the main thread.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return {}
+
+    def handle(signum, frame):
+        logging.warning(f"Received signal {signum}, draining in-flight rows before exiting")
+        stop_event.set()
+
+    previous = {}
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        previous[signum] = signal.signal(signum, handle)
+    return previous
+
+
+def restore_signal_handlers(previous):
+    for signum, handler in previous.items():
+        signal.signal(signum, handler)
+
+
+class PipelineStats:
+    """Thread-safe counters of how rows left the pipeline"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"skipped": 0, "scraped": 0, "generated": 0, "no_content": 0, "invalid": 0, "errors": 0}
+
+    def add(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+
+def run_pipeline(rows, api_key, writer, scrape_workers=20, per_host=2, llm_workers=8, queue_size=100,
+                 write_scraped=False, scraped_column="K", output_column="N", sheet_name="Sheet1", dedupe=True,
+                 llm_cache=None, refresh_llm_cache=False, checkpoint=None, stop_event=None,
+                 requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+    """
+    Scrape, generate and write rows as a streaming pipeline.
+
+    Scraping and GPT generation run as concurrent stages joined by bounded
+    queues, so a row goes to GPT as soon as its page is scraped and producers
+    block when a downstream stage falls behind. Results are written through
+    `writer` (a SheetWriter), which batches and paces the sheet writes.
+
+    With a `checkpoint` store, rows already written with unchanged inputs are
+    skipped and every row's stage is recorded as it advances. Setting
+    `stop_event` (SIGINT/SIGTERM do so when called from the main thread) stops
+    feeding new rows, lets rows already scraped finish and checkpoints them.
+
+    Args:
+        rows (iterable): (row_number, person_name, url) tuples, consumed lazily
+        api_key (str): OpenAI API key
+        writer (SheetWriter): Destination for column writes
+        scrape_workers (int): Concurrent scraping threads
+        per_host (int): Maximum concurrent scrapes of one host
+        llm_workers (int): Concurrent GPT threads
+        queue_size (int): Capacity of each inter-stage queue
+        write_scraped (bool): Also write the scraped content to `scraped_column`
+        dedupe (bool): Scrape each canonical site once and share the result between its rows
+        llm_cache (LLMResultCache): Optional GPT result cache
+        checkpoint (CheckpointStore): Optional per-row progress store for resumable runs
+        stop_event (threading.Event): Set to stop the run gracefully
+    Returns:
+        dict: Counts of scraped, generated, no_content, invalid and errored rows
+    """
+    scrape_queue = queue.Queue(maxsize=queue_size)
+    llm_queue = queue.Queue(maxsize=queue_size)
+    stats = PipelineStats()
+    client = get_openai_client(api_key)
+    rate_limiter = OpenAIRateLimiter(requests_per_minute, tokens_per_minute)
+    host_limits = {}
+    host_limits_lock = threading.Lock()
+    scrapers_left = [scrape_workers]
+    scrapers_left_lock = threading.Lock()
+    stop_event = stop_event or threading.Event()
+
+    def mark(row_number, stage, row_hash=None, error=None):
+        if checkpoint is not None:
+            checkpoint.mark(row_number, stage, row_hash=row_hash, error=error)
+
+    def write(column, row_number, value, final=False):
+        def mark_written(range_name):
+            checkpoint.mark(row_number, STAGE_WRITTEN)
+
+        # Only final values complete a row; the checkpoint advances once the write lands
+        on_written = mark_written if final and checkpoint is not None else None
+        writer.update(f"{sheet_name}!{column}{row_number}:{column}{row_number}", [[value]], on_written=on_written)
+
+    def put(target, item):
+        """Put with backpressure, giving up when the run is stopping"""
+        while not stop_event.is_set():
+            try:
+                target.put(item, timeout=STOP_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def host_limit(url):
+        host = host_for_url(url)
+        if host is None:
+            return None
+        with host_limits_lock:
+            return host_limits.setdefault(host, threading.Semaphore(per_host))
+
+    def scrape_url(url):
+        limit = host_limit(url)
+        if limit is None:
+            return process_url(url)
+        with limit:
+            return process_url(url)
+
+    deduper = ScrapeDeduper(scrape_url) if dedupe else None
+
+    def feed():
+        try:
+            for row_number, name, url in rows:
+                row_hash = content_hash(name, url)
+                if checkpoint is not None and not checkpoint.should_process(row_number, row_hash):
+                    stats.add("skipped")
+                    continue
+                if not put(scrape_queue, (row_number, name, url, row_hash)):
+                    break
+        except Exception as e:
+            logging.error(f"Pipeline input failed: {str(e)}")
+        finally:
+            for _ in range(scrape_workers):
+                scrape_queue.put(_DONE)
+
+    def scrape():
+        while True:
+            item = scrape_queue.get()
+            if item is _DONE:
+                break
+            if stop_event.is_set():
+                # Not started yet; left unrecorded so the next run picks it up
+                continue
+            row_number, name, url, row_hash = item
+            try:
+                scraped = deduper.scrape(url) if deduper is not None else scrape_url(url)
+                stats.add("scraped")
+                mark(row_number, STAGE_SCRAPED, row_hash=row_hash)
+                if write_scraped:
+                    write(scraped_column, row_number, str(scraped) if scraped is not None else "")
+                status, content = build_gpt_input(name, scraped)
+                if status == "ok":
+                    # Rows already scraped are drained through GPT even when stopping
+                    llm_queue.put((row_number, content))
+                elif status == "invalid":
+                    # Only an unusable URL is final; resumed runs skip it until the URL changes
+                    stats.add("invalid")
+                    write(output_column, row_number, "No valid content to analyze", final=True)
+                elif status == "error":
+                    stats.add("errors")
+                    mark(row_number, STAGE_FAILED, error=str(scraped[0]) if scraped else "Scrape failed")
+                    logging.warning(f"Scraping row {row_number} failed, a resumed run will retry it")
+                else:
+                    # Sites without text yet (or that served none this time) are retried on resume too
+                    stats.add("no_content")
+                    mark(row_number, STAGE_FAILED, error="No content found")
+                    logging.info(f"Skipping row {row_number} due to 'No content found'")
+            except Exception as e:
+                stats.add("errors")
+                mark(row_number, STAGE_FAILED, row_hash=row_hash, error=str(e))
+                logging.error(f"Error scraping row {row_number}: {str(e)}")
+        with scrapers_left_lock:
+            scrapers_left[0] -= 1
+            last = scrapers_left[0] == 0
+        if last:
+            for _ in range(llm_workers):
+                llm_queue.put(_DONE)
+
+    def generate():
+        while True:
+            item = llm_queue.get()
+            if item is _DONE:
+                break
+            row_number, content = item
+            try:
+                outcome = complete_with_gpt(
+                    content, api_key, client=client, rate_limiter=rate_limiter,
+                    cache=llm_cache, refresh_cache=refresh_llm_cache
+                )
+                if outcome["text"].startswith("Error"):
+                    # The error stays in the checkpoint; the output cell is left for the retry to fill
+                    stats.add("errors")
+                    mark(row_number, STAGE_FAILED, error=outcome["text"])
+                    logging.error(f"GPT processing for row {row_number} failed: {outcome['text']}")
+                else:
+                    stats.add("generated")
+                    mark(row_number, STAGE_GENERATED)
+                    write(output_column, row_number, str(outcome["text"]), final=True)
+                logging.info(
+                    f"Row {row_number}: {outcome['prompt_tokens']} prompt / "
+                    f"{outcome['completion_tokens']} completion tokens"
+                )
+            except Exception as e:
+                stats.add("errors")
+                mark(row_number, STAGE_FAILED, error=str(e))
+                logging.error(f"Error in GPT processing for row {row_number}: {str(e)}")
+
+    previous_handlers = install_stop_handlers(stop_event)
+    try:
+        threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+        threads += [threading.Thread(target=scrape, name=f"pipeline-scrape-{i}", daemon=True) for i in range(scrape_workers)]
+        threads += [threading.Thread(target=generate, name=f"pipeline-llm-{i}", daemon=True) for i in range(llm_workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            # Join in short slices so signal handlers get to run on the main thread
+            while thread.is_alive():
+                thread.join(STOP_POLL_INTERVAL)
+    finally:
+        restore_signal_handlers(previous_handlers)
+    if stop_event.is_set():
+        logging.warning(f"Pipeline stopped early: {stats.counts}")
+    else:
+        logging.info(f"Pipeline finished: {stats.counts}")
+    return dict(stats.counts)
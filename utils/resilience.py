@@ -0,0 +1,320 @@
+"""
+Retries, backoff and circuit breakers shared by the outbound clients (scraper, OpenAI, Sheets).
+
+    result = retry_call(lambda: client.chat.completions.create(**request), "openai", policy=OPENAI_RETRY)
+
+retry_call() retries transient failures (429, 5xx, connection resets and
+timeouts) with exponential backoff and full jitter. A Retry-After header
+sets the minimum wait and is honored in full when it fits before the
+deadline; otherwise the call gives up with the server's error. The loop stops at the policy's attempt limit or at
+the call's deadline, whichever comes first. Each dependency has a
+CircuitBreaker. After `failure_threshold` consecutive transient failures
+(429s excepted, throttling isn't an outage) it opens, and calls fail at once with CircuitOpen until `reset_timeout` has
+passed. Then a single trial call decides whether it closes again.
+"""
+import email.utils
+import logging
+import random
+import threading
+import time
+from utils import metrics
+
+TRANSIENT_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency whose breaker is open"""
+
+    def __init__(self, dependency, retry_after):
+        super().__init__(f"{dependency} circuit is open, retry in {retry_after:.1f}s")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a call's deadline passes before a retry could be made"""
+
+
+class RetryPolicy:
+    """
+    How often and how long to retry.
+    Args:
+        attempts (int): Total attempts, including the first
+        base_delay (float): Backoff before the first retry; doubles per attempt
+        max_delay (float): Cap on a single backoff wait; a longer Retry-After is only waited out before a deadline
+        deadline (float): Seconds the whole call may take across attempts, None for no limit
+    """
+
+    def __init__(self, attempts=3, base_delay=0.5, max_delay=30.0, deadline=None):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Seconds to wait before retry number `attempt` (0-based): full jitter over
+        an exponentially growing window, but never less than Retry-After. Retry-After
+        is not capped at max_delay; retry_call() decides whether it is worth waiting.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+DEFAULT_RETRY = RetryPolicy()
+# Scraped pages are optional; retry briefly and keep the row moving
+SCRAPER_RETRY = RetryPolicy(attempts=3, base_delay=0.5, max_delay=5.0, deadline=30.0)
+OPENAI_RETRY = RetryPolicy(attempts=5, base_delay=1.0, max_delay=60.0, deadline=180.0)
+SHEETS_RETRY = RetryPolicy(attempts=5, base_delay=1.0, max_delay=60.0, deadline=120.0)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one dependency. Thread-safe.
+
+    closed: calls pass; `failure_threshold` transient failures in a row open it.
+    open: calls raise CircuitOpen for `reset_timeout` seconds.
+    half_open: one trial call passes; success closes the breaker, failure reopens it.
+    """
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state):
+        if state != self.state:
+            level = logging.WARNING if state == STATE_OPEN else logging.INFO
+            logging.log(level, f"Circuit for {self.name} is now {state}")
+            metrics.inc("circuit_transitions", help_text="Circuit breaker state changes", dependency=self.name, state=state)
+            self.state = state
+
+    def before_call(self):
+        """
+        Raises:
+            CircuitOpen: While the breaker is open, or while another call is the half-open trial
+        """
+        with self._lock:
+            if self.state == STATE_OPEN:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpen(self.name, remaining)
+                self._transition(STATE_HALF_OPEN)
+            if self.state == STATE_HALF_OPEN:
+                if self._trial_running:
+                    raise CircuitOpen(self.name, self.reset_timeout)
+                self._trial_running = True
+
+    def cancel_trial(self):
+        """Give up a half-open trial without a verdict, e.g. when the call was never made"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            self._transition(STATE_CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self.state == STATE_HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._transition(STATE_OPEN)
+
+
+class _NoBreaker:
+    def before_call(self):
+        pass
+
+    def cancel_trial(self):
+        pass
+
+    def record_success(self):
+        pass
+
+    def record_failure(self):
+        pass
+
+
+_NO_BREAKER = _NoBreaker()
+_breakers = {}
+_breakers_lock = threading.Lock()
+_breaker_settings = {}
+
+
+def configure_breaker(dependency, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+    """Set the thresholds of a dependency's breaker, replacing any existing one"""
+    with _breakers_lock:
+        _breaker_settings[dependency] = {"failure_threshold": failure_threshold, "reset_timeout": reset_timeout}
+        _breakers.pop(dependency, None)
+
+
+def get_breaker(dependency):
+    """Return the process-wide CircuitBreaker for a dependency name, e.g. "openai" or "sheets\""""
+    with _breakers_lock:
+        breaker = _breakers.get(dependency)
+        if breaker is None:
+            breaker = _breakers[dependency] = CircuitBreaker(dependency, **_breaker_settings.get(dependency, {}))
+        return breaker
+
+
+def reset_breakers():
+    """Forget all breaker state"""
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def status_code(error):
+    """HTTP status of an httpx, OpenAI or googleapiclient error, or None"""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(error, "status_code", None)
+    if status is None:
+        resp = getattr(error, "resp", None)
+        status = getattr(resp, "status", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _headers(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        return headers
+    # googleapiclient's HttpError.resp is a dict of lowercased headers
+    resp = getattr(error, "resp", None)
+    return resp if isinstance(resp, dict) else {}
+
+
+def retry_after_seconds(error):
+    """Seconds from a Retry-After (or retry-after-ms) header on the error's response, or None"""
+    headers = _headers(error)
+    try:
+        milliseconds = headers.get("retry-after-ms")
+        if milliseconds is not None:
+            return float(milliseconds) / 1000.0
+        value = headers.get("retry-after") or headers.get("Retry-After")
+    except (AttributeError, ValueError):
+        return None
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def is_transient(error):
+    """
+    True for failures worth retrying: transient HTTP statuses, dropped or reset
+    connections and timeouts. Refused connections and DNS failures are not
+    retried; the scraper's dead-host cache handles those.
+    """
+    status = status_code(error)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    if isinstance(error, (ConnectionResetError, ConnectionAbortedError, BrokenPipeError, TimeoutError)):
+        return True
+    name = type(error).__name__
+    # httpx: ReadError/WriteError/RemoteProtocolError/*Timeout; openai: APIConnectionError/APITimeoutError
+    return name in ("ReadError", "WriteError", "RemoteProtocolError", "ReadTimeout", "WriteTimeout", "PoolTimeout",
+                    "APIConnectionError", "APITimeoutError")
+
+
+def retry_call(fn, dependency, policy=DEFAULT_RETRY, transient=is_transient, deadline=None, use_breaker=True):
+    """
+    Call fn() with retries and the dependency's circuit breaker.
+    Args:
+        fn (callable): The call to make, without arguments
+        dependency (str): Breaker and metrics name, e.g. "openai", "sheets" or "scraper"
+        policy (RetryPolicy): Attempts, backoff and default deadline
+        transient (callable): error -> bool, which errors to retry and count against the breaker
+        deadline (float): time.monotonic() value after which no retry is started, overrides policy.deadline
+        use_breaker (bool): Set to False to retry without the dependency's circuit breaker
+    Returns:
+        Whatever fn() returns
+    Raises:
+        CircuitOpen: When the breaker is open
+        The last error from fn() once retries are exhausted, or at once for non-transient errors
+    """
+    breaker = get_breaker(dependency) if use_breaker else _NO_BREAKER
+    if deadline is None and policy.deadline is not None:
+        deadline = time.monotonic() + policy.deadline
+    attempt = 0
+    while True:
+        try:
+            breaker.before_call()
+        except CircuitOpen:
+            metrics.inc("resilience_short_circuits", help_text="Calls rejected by an open circuit", dependency=dependency)
+            raise
+        try:
+            result = fn()
+        except DeadlineExceeded:
+            breaker.cancel_trial()
+            raise
+        except Exception as e:
+            if not transient(e):
+                # The dependency answered; the request itself was bad
+                breaker.record_success()
+                raise
+            if status_code(e) == 429:
+                # Throttled, not down: back off without counting towards an outage
+                breaker.cancel_trial()
+            else:
+                breaker.record_failure()
+            attempt += 1
+            if attempt >= policy.attempts:
+                raise
+            wait = policy.backoff(attempt - 1, retry_after_seconds(e))
+            if deadline is not None and time.monotonic() + wait > deadline:
+                metrics.inc("resilience_deadlines_exceeded", dependency=dependency)
+                raise
+            if deadline is None and wait > policy.max_delay:
+                # A Retry-After longer than we'd ever back off, with no deadline to bound the wait
+                metrics.inc("resilience_deadlines_exceeded", dependency=dependency)
+                logging.warning(f"{dependency} asked to retry in {wait:.1f}s, longer than {policy.max_delay}s, giving up")
+                raise
+            metrics.inc("resilience_retries", help_text="Retried outbound calls", dependency=dependency,
+                        status=status_code(e) or type(e).__name__)
+            logging.warning(f"{dependency} call failed ({str(e)}), retry {attempt} of {policy.attempts - 1} in {wait:.1f}s")
+            time.sleep(wait)
+            continue
+        breaker.record_success()
+        return result
+
+
+def deadline_after(seconds):
+    """time.monotonic() deadline `seconds` from now, or None for no limit"""
+    return None if seconds is None else time.monotonic() + seconds
+
+
+def remaining(deadline, default):
+    """Seconds left until a time.monotonic() deadline, capped at `default`; use as a per-request timeout"""
+    if deadline is None:
+        return default
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("Deadline passed before the call was made")
+    return min(default, left)
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from utils.helpers import process_url, normalize_url, is_valid_url
+from scraper.http_client import cache_stats
+from scraper.dns_cache import get_host_health
+from utils.url_index import canonicalize_urls
+
+
+def host_for_url(url):
+    """Return the host a URL will be fetched from, or None if it can't be determined"""
+    if not is_valid_url(url):
+        return None
+    normalized_url = normalize_url(url)
+    if not normalized_url:
+        return None
+    host = urlparse(normalized_url).hostname
+    return host.lower() if host else None
+
+
+async def process_urls_async(urls, concurrency=20, per_host=2, dedupe=True):
+    """
+    Scrape many URLs concurrently and return the results in input order.
+
+    Each URL goes through process_url in a worker thread, so the results are the
+    same lists process_url returns (["No content found"], ["Error: ..."], ...).
+    With dedupe, URLs are grouped by canonical site first and each site is
+    scraped once, its result copied to every row that points at it.
+
+    Args:
+        urls (iterable): URLs to scrape
+        concurrency (int): Maximum number of URLs scraped at the same time
+        per_host (int): Maximum number of URLs scraped at the same time for one host
+        dedupe (bool): Scrape each canonical site only once
+    Returns:
+        list: One process_url result per input URL, in input order
+    """
+    urls = list(urls)
+    if not urls:
+        return []
+    if dedupe:
+        keys = canonicalize_urls(urls)
+        first_index = {}
+        unique_positions = []
+        for i, key in enumerate(keys):
+            if key is None or key not in first_index:
+                if key is not None:
+                    first_index[key] = len(unique_positions)
+                unique_positions.append(i)
+        if len(unique_positions) < len(urls):
+            logging.info(f"Scraping {len(unique_positions)} distinct sites for {len(urls)} URLs")
+            unique_results = await process_urls_async(
+                [urls[i] for i in unique_positions], concurrency=concurrency, per_host=per_host, dedupe=False
+            )
+            by_position = dict(zip(unique_positions, unique_results))
+            return [
+                by_position[i] if i in by_position else unique_results[first_index[key]]
+                for i, key in enumerate(keys)
+            ]
+    loop = asyncio.get_running_loop()
+    global_limit = asyncio.Semaphore(concurrency)
+    host_limits = {}
+    completed = 0
+
+    async def scrape_one(url):
+        nonlocal completed
+        host = host_for_url(url)
+        host_limit = host_limits.setdefault(host, asyncio.Semaphore(per_host)) if host else None
+        try:
+            if host_limit is not None:
+                async with host_limit, global_limit:
+                    result = await loop.run_in_executor(executor, process_url, url)
+            else:
+                async with global_limit:
+                    result = await loop.run_in_executor(executor, process_url, url)
+        except Exception as e:
+            logging.error(f"Error processing URL {url}: {str(e)}")
+            result = [f"Error: {str(e)}"]
+        completed += 1
+        logging.info(f"Scraped {completed}/{len(urls)} URLs")
+        return result
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="scraper") as executor:
+        results = await asyncio.gather(*(scrape_one(url) for url in urls))
+    stats = cache_stats()
+    if stats is not None:
+        logging.info(f"Response cache: {stats['hits']} hits, {stats['revalidations']} revalidated, {stats['misses']} misses")
+    health = get_host_health()
+    if health is not None and health.fast_failures:
+        logging.info(f"Skipped {health.fast_failures} requests to unreachable hosts")
+    return results
+
+
+def process_urls(urls, concurrency=20, per_host=2, dedupe=True):
+    """Synchronous entry point for process_urls_async"""
+    return asyncio.run(process_urls_async(urls, concurrency=concurrency, per_host=per_host, dedupe=dedupe))
@@ -0,0 +1,23 @@
+import os
+import sqlite3
+
+
+def open_sqlite(path, synchronous=None, **connect_kwargs):
+    """
+    Open a SQLite database shared by the run's threads, creating its directory if needed.
+    The connection uses WAL so readers don't block the writer.
+    Args:
+        path (str): Database file
+        synchronous (str): PRAGMA synchronous value, e.g. "NORMAL"; SQLite's default when None
+        connect_kwargs: Passed on to sqlite3.connect, e.g. timeout or isolation_level
+    Returns:
+        sqlite3.Connection: Callers still serialize access with their own lock
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, **connect_kwargs)
+    conn.execute("PRAGMA journal_mode=WAL")
+    if synchronous:
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+    return conn
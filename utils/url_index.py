@@ -0,0 +1,129 @@
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from utils.helpers import is_valid_url
+
+# Query parameters set by ad and email platforms to track a click. Generic names such
+# as ref or source are kept, since some sites route on them.
+TRACKING_PARAMS = ("gclid", "fbclid", "msclkid", "dclid", "mc_cid", "mc_eid", "_ga")
+TRACKING_PREFIXES = ("utm_",)
+# Finished scrapes kept for later rows of the same site; older ones are evicted first
+DEFAULT_DEDUPE_ENTRIES = 2048
+# Paths that are just another name for a site's homepage
+HOMEPAGE_PATHS = ("/home", "/index", "/index.html", "/index.htm", "/index.php", "/default.aspx", "/default.asp")
+DEFAULT_PORTS = (80, 443)
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url):
+    """
+    Canonical site key for a URL, used to scrape each site only once.
+
+    Lowercases the host and drops "www.", default ports, the scheme, fragments,
+    tracking parameters and trailing slashes. Homepage aliases such as /home or
+    /index.html collapse to the root. Path case is preserved.
+    Returns None for values that are not URLs.
+    """
+    if not is_valid_url(url):
+        return None
+    url = url.strip()
+    if "://" not in url:
+        url = f"http://{url}"
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower().rstrip(".")
+    if not host:
+        return None
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in DEFAULT_PORTS:
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/")
+    if path.lower() in HOMEPAGE_PATHS:
+        path = ""
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(name)
+    ))
+    return urlunsplit(("", host, path, query, "")).lstrip("/")
+
+
+def canonicalize_urls(urls):
+    """
+    Canonicalize a whole input column.
+    Each distinct raw value is parsed once, so the heavy duplication typical of
+    org lists costs one dictionary lookup per repeated row.
+    Returns:
+        list: canonical key (or None) per input value, in input order
+    """
+    memo = {}
+    keys = []
+    for url in urls:
+        memo_key = url if isinstance(url, str) else None
+        if memo_key not in memo:
+            memo[memo_key] = canonicalize_url(url)
+        keys.append(memo[memo_key])
+    return keys
+
+
+class _PendingScrape:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class ScrapeDeduper:
+    """
+    Runs scrape_fn once per canonical site across threads.
+    Later callers for the same site wait for the first call and share its result.
+    At most `max_entries` finished results are kept, least recently used out
+    first; scrapes still running are never evicted. A site whose result was
+    evicted is scraped again, which the response cache usually makes cheap.
+    """
+
+    def __init__(self, scrape_fn, max_entries=DEFAULT_DEDUPE_ENTRIES):
+        self.scrape_fn = scrape_fn
+        self.max_entries = max_entries
+        self.duplicates = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        """Drop the least recently used finished entries over max_entries. Call with the lock held."""
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        finished = []
+        for key, entry in self._entries.items():
+            if len(finished) == excess:
+                break
+            if entry.done.is_set():
+                finished.append(key)
+        for key in finished:
+            del self._entries[key]
+
+    def scrape(self, url):
+        key = canonicalize_url(url)
+        if key is None:
+            return self.scrape_fn(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = _PendingScrape()
+            else:
+                self._entries.move_to_end(key)
+                self.duplicates += 1
+        if owner:
+            try:
+                entry.result = self.scrape_fn(url)
+            finally:
+                entry.done.set()
+                with self._lock:
+                    self._evict()
+        else:
+            entry.done.wait()
+        return entry.result
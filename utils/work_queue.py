@@ -0,0 +1,469 @@
+"""
+Lease-based work queue for spreading one campaign across processes and machines.
+
+A coordinator splits pending rows into work items of `shard_size` rows.
+Workers claim an item under a lease, heartbeat while they scrape and generate
+its rows, and report a result per row. A lease that isn't renewed expires and
+its item goes back to pending (or to failed after `max_attempts` claims), so a
+crashed or partitioned worker delays its rows instead of losing them. An item
+whose rows didn't all produce an output goes back the same way, and the next
+claim only hands out the rows still missing one. Reports
+and heartbeats carry the lease id, so a worker whose lease was taken over
+can't overwrite the new holder's results.
+
+WorkQueue keeps the queue in a SQLite file. Every worker on one machine can
+share it directly; across machines it needs a filesystem with working locks
+(SQLite over NFS usually doesn't qualify), otherwise run the workers where the
+file lives.
+"""
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from utils import metrics
+from utils.sqlite import open_sqlite
+
+DEFAULT_QUEUE_PATH = ".cache/work_queue.sqlite"
+DEFAULT_SHARD_SIZE = 50
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+# How long an idle worker waits before asking for work again while other workers hold leases
+IDLE_POLL_INTERVAL = 5
+
+ITEM_PENDING = "pending"
+ITEM_LEASED = "leased"
+ITEM_DONE = "done"
+ITEM_FAILED = "failed"
+
+WorkItem = namedtuple("WorkItem", ["item_id", "lease_id", "rows"])
+RowResult = namedtuple("RowResult", ["row_number", "output", "error"])
+
+
+class LeaseLost(Exception):
+    """Raised when a worker's lease expired and the item was handed to another worker"""
+
+
+class WorkQueue:
+    """
+    SQLite-backed queue of leased work items for one run key (usually the spreadsheet id).
+    Each process opens its own WorkQueue on the shared file. Safe to share between threads.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, run_key="default", lease_seconds=DEFAULT_LEASE_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.run_key = run_key
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Autocommit mode so claims can take the write lock up front with BEGIN IMMEDIATE
+        self._conn = open_sqlite(path, timeout=30, isolation_level=None)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS work_items (
+                run_key TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                lease_id TEXT,
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (run_key, item_id)
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS work_rows (
+                run_key TEXT NOT NULL,
+                row_number INTEGER NOT NULL,
+                item_id INTEGER NOT NULL,
+                name TEXT,
+                url TEXT,
+                output TEXT,
+                error TEXT,
+                written INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (run_key, row_number)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS work_rows_item ON work_rows (run_key, item_id)")
+
+    def _transaction(self):
+        return _Transaction(self._conn)
+
+    def enqueue(self, rows, shard_size=DEFAULT_SHARD_SIZE):
+        """
+        Coordinator side: add rows that aren't queued yet, `shard_size` rows per work item.
+        Args:
+            rows (iterable): (row_number, name, url) tuples
+        Returns:
+            int: Number of rows added
+        """
+        added = 0
+        shard = []
+
+        def flush():
+            nonlocal added
+            now = time.time()
+            with self._lock, self._transaction():
+                known = {row_number for (row_number,) in self._conn.execute(
+                    f"SELECT row_number FROM work_rows WHERE run_key = ? AND row_number IN ({','.join('?' * len(shard))})",
+                    [self.run_key] + [row[0] for row in shard]
+                )}
+                fresh = [row for row in shard if row[0] not in known]
+                if not fresh:
+                    return
+                (item_id,) = self._conn.execute(
+                    "SELECT COALESCE(MAX(item_id), 0) + 1 FROM work_items WHERE run_key = ?", (self.run_key,)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT INTO work_items (run_key, item_id, state, updated_at) VALUES (?, ?, ?, ?)",
+                    (self.run_key, item_id, ITEM_PENDING, now)
+                )
+                self._conn.executemany(
+                    "INSERT INTO work_rows (run_key, row_number, item_id, name, url) VALUES (?, ?, ?, ?, ?)",
+                    [(self.run_key, row_number, item_id, name, url) for row_number, name, url in fresh]
+                )
+                added += len(fresh)
+
+        for row in rows:
+            shard.append(row)
+            if len(shard) >= shard_size:
+                flush()
+                shard = []
+        if shard:
+            flush()
+        metrics.inc("work_queue_rows_enqueued", added)
+        logging.info(f"Queued {added} rows for {self.run_key}")
+        return added
+
+    def _expire_leases(self, now):
+        """Put items with lapsed leases back to pending, or fail them once out of attempts. Call inside a transaction."""
+        expired = self._conn.execute(
+            "SELECT item_id, attempts, worker FROM work_items WHERE run_key = ? AND state = ? AND lease_expires < ?",
+            (self.run_key, ITEM_LEASED, now)
+        ).fetchall()
+        for item_id, attempts, worker in expired:
+            state = ITEM_FAILED if attempts >= self.max_attempts else ITEM_PENDING
+            self._conn.execute(
+                "UPDATE work_items SET state = ?, lease_id = NULL, lease_expires = NULL, last_error = ?, updated_at = ? "
+                "WHERE run_key = ? AND item_id = ?",
+                (state, f"Lease held by {worker} expired", now, self.run_key, item_id)
+            )
+            metrics.inc("work_queue_leases_expired")
+            logging.warning(f"Lease on item {item_id} held by {worker} expired, item is now {state}")
+        return len(expired)
+
+    def claim(self, worker):
+        """
+        Lease the oldest pending item to `worker`. Only rows without an output are handed out,
+        so a retried item skips the rows that already succeeded.
+        Returns:
+            WorkItem: (item_id, lease_id, rows of (row_number, name, url)), or None when nothing is pending
+        """
+        now = time.time()
+        with self._lock, self._transaction():
+            self._expire_leases(now)
+            row = self._conn.execute(
+                "SELECT item_id FROM work_items WHERE run_key = ? AND state = ? ORDER BY item_id LIMIT 1",
+                (self.run_key, ITEM_PENDING)
+            ).fetchone()
+            if row is None:
+                return None
+            item_id = row[0]
+            lease_id = uuid.uuid4().hex
+            self._conn.execute(
+                "UPDATE work_items SET state = ?, lease_id = ?, worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE run_key = ? AND item_id = ?",
+                (ITEM_LEASED, lease_id, worker, now + self.lease_seconds, now, self.run_key, item_id)
+            )
+            rows = self._conn.execute(
+                "SELECT row_number, name, url FROM work_rows "
+                "WHERE run_key = ? AND item_id = ? AND output IS NULL ORDER BY row_number",
+                (self.run_key, item_id)
+            ).fetchall()
+        metrics.inc("work_queue_claims")
+        return WorkItem(item_id, lease_id, [tuple(r) for r in rows])
+
+    def _holds_lease(self, item):
+        row = self._conn.execute(
+            "SELECT lease_id, state FROM work_items WHERE run_key = ? AND item_id = ?", (self.run_key, item.item_id)
+        ).fetchone()
+        return row is not None and row[0] == item.lease_id and row[1] == ITEM_LEASED
+
+    def heartbeat(self, item):
+        """
+        Extend the lease on `item`.
+        Raises:
+            LeaseLost: When the lease already expired and the item was requeued
+        """
+        now = time.time()
+        with self._lock, self._transaction():
+            updated = self._conn.execute(
+                "UPDATE work_items SET lease_expires = ?, updated_at = ? "
+                "WHERE run_key = ? AND item_id = ? AND lease_id = ? AND state = ? AND lease_expires >= ?",
+                (now + self.lease_seconds, now, self.run_key, item.item_id, item.lease_id, ITEM_LEASED, now)
+            ).rowcount
+        if not updated:
+            raise LeaseLost(f"Lease on item {item.item_id} was lost")
+
+    def complete(self, item, results):
+        """
+        Record the results of a leased item. The item is done once every row has an output;
+        rows that ended with an error (scrape failure, no content, GPT error) send it back
+        to pending, or to failed once it is out of attempts, like release().
+        Args:
+            results (iterable): RowResult records
+        Returns:
+            str: The item's new state
+        Raises:
+            LeaseLost: When the lease is no longer held, in which case nothing is recorded
+        """
+        now = time.time()
+        with self._lock, self._transaction():
+            if not self._holds_lease(item):
+                raise LeaseLost(f"Lease on item {item.item_id} was lost before its results were reported")
+            self._conn.executemany(
+                "UPDATE work_rows SET output = ?, error = ?, written = 0 WHERE run_key = ? AND row_number = ?",
+                [(result.output, result.error, self.run_key, result.row_number) for result in results]
+            )
+            (unfinished,) = self._conn.execute(
+                "SELECT COUNT(*) FROM work_rows WHERE run_key = ? AND item_id = ? AND output IS NULL",
+                (self.run_key, item.item_id)
+            ).fetchone()
+            if unfinished:
+                (attempts,) = self._conn.execute(
+                    "SELECT attempts FROM work_items WHERE run_key = ? AND item_id = ?", (self.run_key, item.item_id)
+                ).fetchone()
+                state = ITEM_FAILED if attempts >= self.max_attempts else ITEM_PENDING
+                last_error = f"{unfinished} rows without output"
+            else:
+                state, last_error = ITEM_DONE, None
+            self._conn.execute(
+                "UPDATE work_items SET state = ?, lease_id = NULL, lease_expires = NULL, last_error = ?, updated_at = ? "
+                "WHERE run_key = ? AND item_id = ?",
+                (state, last_error, now, self.run_key, item.item_id)
+            )
+        if state == ITEM_DONE:
+            metrics.inc("work_queue_items_completed")
+        else:
+            metrics.inc("work_queue_items_released", state=state)
+            logging.info(f"Item {item.item_id} has {unfinished} rows without output, item is now {state}")
+        return state
+
+    def release(self, item, error):
+        """Give a leased item back after a failure; it is retried until it runs out of attempts"""
+        now = time.time()
+        with self._lock, self._transaction():
+            if not self._holds_lease(item):
+                return
+            (attempts,) = self._conn.execute(
+                "SELECT attempts FROM work_items WHERE run_key = ? AND item_id = ?", (self.run_key, item.item_id)
+            ).fetchone()
+            state = ITEM_FAILED if attempts >= self.max_attempts else ITEM_PENDING
+            self._conn.execute(
+                "UPDATE work_items SET state = ?, lease_id = NULL, lease_expires = NULL, last_error = ?, updated_at = ? "
+                "WHERE run_key = ? AND item_id = ?",
+                (state, error, now, self.run_key, item.item_id)
+            )
+        metrics.inc("work_queue_items_released", state=state)
+
+    def requeue_failed(self):
+        """
+        Give failed items a fresh set of attempts; only their rows without an output run again.
+        Returns the number of items requeued.
+        """
+        now = time.time()
+        with self._lock, self._transaction():
+            return self._conn.execute(
+                "UPDATE work_items SET state = ?, attempts = 0, updated_at = ? WHERE run_key = ? AND state = ?",
+                (ITEM_PENDING, now, self.run_key, ITEM_FAILED)
+            ).rowcount
+
+    def has_open_items(self):
+        """True while any item is pending or leased"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM work_items WHERE run_key = ? AND state IN (?, ?) LIMIT 1",
+                (self.run_key, ITEM_PENDING, ITEM_LEASED)
+            ).fetchone()
+        return row is not None
+
+    def unwritten_results(self):
+        """Return RowResults reported since the last mark_written(), in row order"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT row_number, output, error FROM work_rows "
+                "WHERE run_key = ? AND written = 0 AND (output IS NOT NULL OR error IS NOT NULL) ORDER BY row_number",
+                (self.run_key,)
+            ).fetchall()
+        return [RowResult(*row) for row in rows]
+
+    def mark_written(self, row_number):
+        with self._lock, self._transaction():
+            self._conn.execute(
+                "UPDATE work_rows SET written = 1 WHERE run_key = ? AND row_number = ?", (self.run_key, row_number)
+            )
+
+    def summary(self):
+        """Return {state: item count} for this run key"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM work_items WHERE run_key = ? GROUP BY state", (self.run_key,)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on error"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def process_row(name, url, api_key, client=None, rate_limiter=None, llm_cache=None):
+    """
+    Scrape one row's website and generate its email.
+    Returns:
+        RowResult: with row_number None; output is None when the site had no usable content
+    """
+    from llm_utils.gpt_connector import process_with_gpt
+    from utils.helpers import process_url, build_gpt_input
+    scraped = process_url(url)
+    status, content = build_gpt_input(name, scraped)
+    if status == "no_content":
+        return RowResult(None, None, "No content found")
+    if status == "error":
+        return RowResult(None, None, str(scraped[0]))
+    if status == "invalid":
+        return RowResult(None, "No valid content to analyze", None)
+    text = process_with_gpt(content, api_key, client=client, rate_limiter=rate_limiter, cache=llm_cache)
+    if text.startswith("Error"):
+        return RowResult(None, None, text)
+    return RowResult(None, text, None)
+
+
+def run_worker(work_queue, api_key, worker=None, threads=8, heartbeat_interval=None, llm_cache=None,
+               requests_per_minute=None, tokens_per_minute=None, stop_event=None, wait=True):
+    """
+    Claim items from `work_queue` until none are left and process their rows.
+
+    The rows of an item run on `threads` threads while a background thread
+    renews the lease every `heartbeat_interval` seconds (a third of the lease by
+    default). If the lease is lost, the item's results are dropped, because
+    another worker now owns those rows.
+    Args:
+        work_queue (WorkQueue): Queue to claim from
+        api_key (str): OpenAI API key
+        worker (str): Worker id recorded on leases, defaults to host-pid
+        wait (bool): Keep polling while other workers hold leases, so their expired items get picked up
+    Returns:
+        dict: Counts of completed, lost and released items; items with failed rows count as released
+    """
+    from llm_utils.gpt_connector import get_openai_client
+    from llm_utils.llm_executor import OpenAIRateLimiter, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE
+    worker = worker or default_worker_id()
+    heartbeat_interval = heartbeat_interval or work_queue.lease_seconds / 3
+    stop_event = stop_event or threading.Event()
+    client = get_openai_client(api_key)
+    rate_limiter = OpenAIRateLimiter(requests_per_minute or DEFAULT_REQUESTS_PER_MINUTE,
+                                     tokens_per_minute or DEFAULT_TOKENS_PER_MINUTE)
+    counts = {"completed": 0, "lost": 0, "released": 0}
+
+    def run_row(row):
+        row_number, name, url = row
+        try:
+            result = process_row(name, url, api_key, client=client, rate_limiter=rate_limiter, llm_cache=llm_cache)
+            return result._replace(row_number=row_number)
+        except Exception as e:
+            logging.error(f"Error processing row {row_number}: {str(e)}")
+            return RowResult(row_number, None, str(e))
+
+    def keep_alive(item, done, lost):
+        while not done.wait(heartbeat_interval):
+            try:
+                work_queue.heartbeat(item)
+            except LeaseLost as e:
+                logging.warning(str(e))
+                lost.set()
+                return
+            except sqlite3.Error as e:
+                logging.error(f"Heartbeat for item {item.item_id} failed: {str(e)}")
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="queue-worker") as executor:
+        while not stop_event.is_set():
+            item = work_queue.claim(worker)
+            if item is None:
+                if wait and work_queue.has_open_items():
+                    stop_event.wait(IDLE_POLL_INTERVAL)
+                    continue
+                break
+            logging.info(f"{worker} claimed item {item.item_id} ({len(item.rows)} rows)")
+            done, lost = threading.Event(), threading.Event()
+            heartbeat = threading.Thread(target=keep_alive, args=(item, done, lost), daemon=True)
+            heartbeat.start()
+            try:
+                with metrics.timed("work_queue_item_seconds", "Time to process one work item"):
+                    results = list(executor.map(run_row, item.rows))
+                done.set()
+                heartbeat.join()
+                if lost.is_set():
+                    raise LeaseLost(f"Lease on item {item.item_id} was lost while processing")
+                if work_queue.complete(item, results) == ITEM_DONE:
+                    counts["completed"] += 1
+                else:
+                    counts["released"] += 1
+            except LeaseLost as e:
+                logging.warning(f"Dropping results: {str(e)}")
+                counts["lost"] += 1
+            except Exception as e:
+                logging.error(f"Item {item.item_id} failed: {str(e)}")
+                work_queue.release(item, str(e))
+                counts["released"] += 1
+            finally:
+                done.set()
+    logging.info(f"Worker {worker} finished: {counts}")
+    return counts
+
+
+def collect_results(work_queue, writer, output_column="N", sheet_name="Sheet1"):
+    """
+    Coordinator side: write newly reported outputs through `writer` (a SheetWriter or storage writer).
+    Rows are marked written once the writer confirms them, so collect can run repeatedly while workers run.
+    Returns:
+        int: Number of outputs queued on the writer
+    """
+    queued = 0
+    for result in work_queue.unwritten_results():
+        if result.output is None:
+            # Nothing to write (no content or a failed row); the error stays in the queue for `status`
+            work_queue.mark_written(result.row_number)
+            continue
+
+        def on_written(range_name, row_number=result.row_number):
+            work_queue.mark_written(row_number)
+
+        writer.update(f"{sheet_name}!{output_column}{result.row_number}:{output_column}{result.row_number}",
+                      [[result.output]], on_written=on_written)
+        queued += 1
+    logging.info(f"Queued {queued} results for writing")
+    return queued